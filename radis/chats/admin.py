@@ -1,5 +1,12 @@
 from django.contrib import admin
 
-from .models import ChatsAppSettings
+from .models import CachedAnswer, ChatsAppSettings
 
 admin.site.register(ChatsAppSettings, admin.ModelAdmin)
+
+
+class CachedAnswerAdmin(admin.ModelAdmin):
+    list_display = ("key", "hits", "created_at", "last_used_at")
+
+
+admin.site.register(CachedAnswer, CachedAnswerAdmin)
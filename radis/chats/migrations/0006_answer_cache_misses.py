@@ -0,0 +1,18 @@
+from django.db import migrations
+
+# The misses of the answer cache (see chats/utils/answer_cache.py). They are counted by a
+# sequence in the database, as (unlike the hits) they can't be counted by the cached answers.
+CREATE_SEQUENCE_SQL = "CREATE SEQUENCE answer_cache_misses"
+
+DROP_SEQUENCE_SQL = "DROP SEQUENCE answer_cache_misses"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0005_cachedanswer"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEQUENCE_SQL, reverse_sql=DROP_SEQUENCE_SQL),
+    ]
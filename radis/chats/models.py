@@ -4,6 +4,7 @@ from typing import Callable
 from adit_radis_shared.common.models import AppSettings
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
@@ -44,3 +45,16 @@ class ChatMessage(models.Model):
 
     def __str__(self):
         return f"ChatMessage {self.pk}"
+
+
+class CachedAnswer(models.Model):
+    """An answer of the LLM (see chats/utils/answer_cache.py)."""
+
+    key = models.CharField(max_length=64, unique=True)
+    answer = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"CachedAnswer {self.pk}"
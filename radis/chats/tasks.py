@@ -0,0 +1,15 @@
+import logging
+
+from django.conf import settings
+from procrastinate.contrib.django import app
+
+from .utils.answer_cache import evict_cached_answers
+
+logger = logging.getLogger(__name__)
+
+
+@app.periodic(cron=settings.LLM_ANSWER_CACHE_EVICTION_CRON)
+@app.task
+def evict_llm_answer_cache(timestamp: int) -> None:
+    num_evicted = evict_cached_answers()
+    logger.info("Evicted %d cached LLM answers.", num_evicted)
@@ -0,0 +1,77 @@
+import time
+
+from django.test import override_settings
+
+from radis.chats.utils.adaptive_limiter import BASELINE_WINDOW, AdaptiveLimiter
+
+
+@override_settings(
+    LLM_CONCURRENCY_LIMIT=8,
+    LLM_ADAPTIVE_CONCURRENCY_INITIAL=2,
+    LLM_ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE=1.5,
+)
+def test_window_grows_while_latency_is_flat():
+    limiter = AdaptiveLimiter()
+
+    for _ in range(100):
+        limiter.record_success(1.0)
+
+    assert limiter.window == 8
+
+
+@override_settings(
+    LLM_CONCURRENCY_LIMIT=8,
+    LLM_ADAPTIVE_CONCURRENCY_INITIAL=4,
+    LLM_ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE=1.5,
+)
+def test_window_does_not_grow_while_latency_rises():
+    limiter = AdaptiveLimiter()
+
+    limiter.record_success(1.0)
+    window = limiter.window
+    for _ in range(10):
+        limiter.record_success(3.0)
+
+    assert limiter.window == window
+
+
+@override_settings(
+    LLM_CONCURRENCY_LIMIT=64,
+    LLM_ADAPTIVE_CONCURRENCY_INITIAL=2,
+    LLM_ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE=1.5,
+)
+def test_baseline_does_not_drift_away_from_observed_latencies():
+    limiter = AdaptiveLimiter()
+
+    limiter.record_success(1.0)
+    for _ in range(BASELINE_WINDOW - 1):
+        limiter.record_success(1.2)
+    assert limiter.baseline_latency == 1.0
+
+    # The fast request dropped out of the window, so the baseline follows the latencies
+    # (without growing beyond them) and a rising latency still stops the growth
+    limiter.record_success(1.2)
+    assert limiter.baseline_latency == 1.2
+    window = limiter.window
+    for _ in range(10):
+        limiter.record_success(3.0)
+    assert limiter.baseline_latency == 1.2
+    assert limiter.window == window
+
+
+@override_settings(
+    LLM_CONCURRENCY_LIMIT=8,
+    LLM_ADAPTIVE_CONCURRENCY_INITIAL=8,
+    LLM_ADAPTIVE_CONCURRENCY_BACKOFF=0.5,
+)
+def test_window_backs_off_once_on_overload():
+    limiter = AdaptiveLimiter()
+
+    started = time.monotonic()
+    limiter.record_overload(started)
+    # Requests that were in flight before the backoff don't shrink the window again
+    limiter.record_overload(started)
+    assert limiter.window == 4
+
+    limiter.record_overload(time.monotonic() + 1)
+    assert limiter.window == 2
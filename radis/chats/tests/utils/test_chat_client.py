@@ -1,7 +1,12 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
+import openai
 import pytest
+from asgiref.sync import sync_to_async
+from pytest_mock import MockerFixture
 
+from radis.chats.models import CachedAnswer
+from radis.chats.utils.answer_cache import get_answer_cache_stats
 from radis.chats.utils.chat_client import AsyncChatClient
 from radis.chats.utils.testing_helpers import (
     create_async_openai_client_mock,
@@ -43,3 +48,67 @@ async def test_ask_yes_no_question():
 
         assert answer == "no"
         assert openai_no_mock.chat.completions.create.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_ask_yes_no_questions(mocker: MockerFixture):
+    openai_mock = create_async_openai_client_mock('{"1": "Yes", "2": "No"}')
+    create_mock = mocker.patch.object(
+        openai_mock.chat.completions, "create", wraps=openai_mock.chat.completions.create
+    )
+
+    with patch("openai.AsyncOpenAI", return_value=openai_mock):
+        answers = await AsyncChatClient().ask_report_yes_no_questions(
+            create_report_body(), [create_question_body(), create_question_body()]
+        )
+
+        assert answers == ["yes", "no"]
+        assert create_mock.call_count == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_ask_yes_no_question_with_answer_cache(mocker: MockerFixture):
+    openai_mock = create_async_openai_client_mock("Yes")
+    create_mock = mocker.patch.object(
+        openai_mock.chat.completions, "create", wraps=openai_mock.chat.completions.create
+    )
+    report_body = create_report_body()
+    question_body = create_question_body()
+
+    with patch("openai.AsyncOpenAI", return_value=openai_mock):
+        client = AsyncChatClient(use_answer_cache=True)
+        assert await client.ask_report_yes_no_question(report_body, question_body) == "yes"
+        assert await client.ask_report_yes_no_question(report_body, question_body) == "yes"
+
+        assert create_mock.call_count == 1
+        assert await CachedAnswer.objects.acount() == 1
+        assert (await CachedAnswer.objects.aget()).hits == 1
+
+        stats = await sync_to_async(get_answer_cache_stats)()
+        assert (stats.hits, stats.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_answers_are_not_cached_if_the_model_is_unknown(mocker: MockerFixture):
+    openai_mock = create_async_openai_client_mock("Yes")
+    create_mock = mocker.patch.object(
+        openai_mock.chat.completions, "create", wraps=openai_mock.chat.completions.create
+    )
+    mocker.patch.object(
+        openai_mock.models, "list", side_effect=openai.APIConnectionError(request=MagicMock())
+    )
+    report_body = create_report_body()
+    question_body = create_question_body()
+
+    with (
+        patch("openai.AsyncOpenAI", return_value=openai_mock),
+        patch("radis.chats.utils.llm_router._backends", {}),
+    ):
+        client = AsyncChatClient(use_answer_cache=True)
+        assert await client.ask_report_yes_no_question(report_body, question_body) == "yes"
+        assert await client.ask_report_yes_no_question(report_body, question_body) == "yes"
+
+        assert create_mock.call_count == 2
+        assert await CachedAnswer.objects.acount() == 0
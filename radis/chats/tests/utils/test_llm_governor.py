@@ -0,0 +1,66 @@
+import pytest
+from channels.db import database_sync_to_async
+from django.test import override_settings
+
+from radis.chats.utils.llm_governor import (
+    LlmGovernor,
+    close_llm_governors,
+    get_llm_governor,
+    get_llm_utilization,
+    get_share_slots,
+)
+
+
+@override_settings(LLM_CONCURRENCY_LIMIT=7, LLM_CONCURRENCY_SHARES={"rag": 2, "subscriptions": 1})
+def test_get_share_slots():
+    slots = get_share_slots()
+
+    assert slots["rag"] == range(0, 5)
+    assert slots["subscriptions"] == range(5, 7)
+
+
+@override_settings(LLM_CONCURRENCY_LIMIT=1, LLM_CONCURRENCY_SHARES={"rag": 9, "subscriptions": 1})
+def test_get_share_slots_at_least_one_slot():
+    slots = get_share_slots()
+
+    assert len(slots["rag"]) == 1
+    assert len(slots["subscriptions"]) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    LLM_CONCURRENCY_LIMIT=3,
+    LLM_CONCURRENCY_SHARES={"rag": 2, "subscriptions": 1},
+    LLM_ADAPTIVE_CONCURRENCY_INITIAL=3,
+)
+async def test_idle_slots_of_other_shares_are_borrowed():
+    async with LlmGovernor("subscriptions") as governor:
+        async with governor.slot():
+            # The only slot of the share is in use, so a slot of the idle RAG share is used
+            async with governor.slot():
+                utilization = await database_sync_to_async(get_llm_utilization)()
+                assert {share.share: share.in_use for share in utilization} == {
+                    "rag": 1,
+                    "subscriptions": 1,
+                }
+
+    utilization = await database_sync_to_async(get_llm_utilization)()
+    assert all(share.in_use == 0 for share in utilization)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_governor_is_shared_within_the_event_loop():
+    governor = get_llm_governor("rag")
+    assert get_llm_governor("rag") is governor
+    assert get_llm_governor("subscriptions") is not governor
+
+    # The connections are opened by the first request
+    assert governor.closed
+    async with governor.slot():
+        assert not governor.closed
+
+    await close_llm_governors()
+    assert governor.closed
+    assert get_llm_governor("rag") is not governor
@@ -0,0 +1,148 @@
+from unittest.mock import patch
+
+import httpx
+import openai
+import pytest
+from django.test import override_settings
+from pytest_mock import MockerFixture
+
+from radis.chats.utils.llm_router import LlmRouter, get_backend_stats
+from radis.chats.utils.testing_helpers import create_async_openai_client_mock
+
+FAILING_URL = "http://failing.local:8080"
+WORKING_URL = "http://working.local:8080"
+
+
+@pytest.mark.asyncio
+@override_settings(LLAMACPP_URLS=[FAILING_URL, WORKING_URL])
+async def test_failing_backend_is_ejected(mocker: MockerFixture):
+    failing_mock = create_async_openai_client_mock("Yes")
+    failing_create = mocker.patch.object(
+        failing_mock.chat.completions,
+        "create",
+        side_effect=openai.APIConnectionError(request=httpx.Request("POST", FAILING_URL)),
+    )
+    working_mock = create_async_openai_client_mock("Yes")
+    working_create = mocker.patch.object(
+        working_mock.chat.completions, "create", wraps=working_mock.chat.completions.create
+    )
+
+    def create_client(base_url: str, **kwargs):
+        return failing_mock if base_url.startswith(FAILING_URL) else working_mock
+
+    with patch("openai.AsyncOpenAI", side_effect=create_client):
+        router = LlmRouter()
+        for _ in range(3):
+            completion = await router.create_completion(messages=[])
+            assert completion.choices[0].message.content == "Yes"
+
+    # The failing backend was only tried once (at most) and then ejected
+    assert failing_create.call_count <= 1
+    assert working_create.call_count == 3
+
+    stats = {backend.url: backend for backend in get_backend_stats()}
+    assert stats[WORKING_URL].outstanding == 0
+    assert stats[WORKING_URL].latency is not None
+    assert not stats[WORKING_URL].ejected
+
+
+@pytest.mark.asyncio
+@override_settings(
+    LLAMACPP_URLS=["http://first.local:8080", "http://second.local:8080"],
+    LLAMACPP_SLOTS_PER_INSTANCE=4,
+)
+async def test_requests_with_same_affinity_use_same_slot(mocker: MockerFixture):
+    mocks = {}
+    create_mocks = {}
+
+    def create_client(base_url: str, **kwargs):
+        if base_url not in mocks:
+            mock = create_async_openai_client_mock("Yes")
+            create_mocks[base_url] = mocker.patch.object(
+                mock.chat.completions, "create", wraps=mock.chat.completions.create
+            )
+            mocks[base_url] = mock
+        return mocks[base_url]
+
+    with patch("openai.AsyncOpenAI", side_effect=create_client):
+        router = LlmRouter()
+        for _ in range(3):
+            await router.create_completion(affinity="report", messages=[], extra_body={})
+
+    # All requests went to a single backend and slot
+    calls = [call for create_mock in create_mocks.values() for call in create_mock.call_args_list]
+    assert len(mocks) == 1
+    assert len(calls) == 3
+    assert len({call.kwargs["extra_body"]["id_slot"] for call in calls}) == 1
+
+
+def create_status_error(url: str, status_code: int) -> openai.InternalServerError:
+    response = httpx.Response(status_code, request=httpx.Request("POST", url))
+    return openai.InternalServerError("Server error", response=response, body=None)
+
+
+@pytest.mark.asyncio
+@override_settings(
+    LLAMACPP_URLS=["http://busy.local:8080", "http://idle.local:8080"],
+    LLAMACPP_EJECTION_FAILURES=1,
+)
+async def test_busy_backend_is_not_ejected(mocker: MockerFixture):
+    busy_mock = create_async_openai_client_mock("Yes")
+    busy_create = mocker.patch.object(
+        busy_mock.chat.completions,
+        "create",
+        side_effect=create_status_error("http://busy.local:8080", 503),
+    )
+    idle_mock = create_async_openai_client_mock("Yes")
+    idle_create = mocker.patch.object(
+        idle_mock.chat.completions, "create", wraps=idle_mock.chat.completions.create
+    )
+
+    def create_client(base_url: str, **kwargs):
+        return busy_mock if base_url.startswith("http://busy.local:8080") else idle_mock
+
+    # Always select the busy backend first (if it is not ejected)
+    with (
+        patch("openai.AsyncOpenAI", side_effect=create_client),
+        patch("radis.chats.utils.llm_router.random.choice", side_effect=lambda items: items[0]),
+    ):
+        router = LlmRouter()
+        for _ in range(3):
+            completion = await router.create_completion(messages=[])
+            assert completion.choices[0].message.content == "Yes"
+
+    stats = {backend.url: backend for backend in get_backend_stats()}
+    assert not stats["http://busy.local:8080"].ejected
+    assert busy_create.call_count == 3
+    assert idle_create.call_count == 3
+
+
+@pytest.mark.asyncio
+@override_settings(
+    LLAMACPP_URLS=["http://broken.local:8080", "http://healthy.local:8080"],
+    LLAMACPP_EJECTION_FAILURES=2,
+)
+async def test_backend_is_ejected_after_repeated_server_errors(mocker: MockerFixture):
+    broken_mock = create_async_openai_client_mock("Yes")
+    broken_create = mocker.patch.object(
+        broken_mock.chat.completions,
+        "create",
+        side_effect=create_status_error("http://broken.local:8080", 500),
+    )
+    healthy_mock = create_async_openai_client_mock("Yes")
+
+    def create_client(base_url: str, **kwargs):
+        return broken_mock if base_url.startswith("http://broken.local:8080") else healthy_mock
+
+    # Always select the broken backend first (if it is not ejected)
+    with (
+        patch("openai.AsyncOpenAI", side_effect=create_client),
+        patch("radis.chats.utils.llm_router.random.choice", side_effect=lambda items: items[0]),
+    ):
+        router = LlmRouter()
+        for _ in range(10):
+            await router.create_completion(messages=[])
+
+    stats = {backend.url: backend for backend in get_backend_stats()}
+    assert stats["http://broken.local:8080"].ejected
+    assert broken_create.call_count == 2
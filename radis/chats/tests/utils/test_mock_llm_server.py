@@ -0,0 +1,44 @@
+import json
+
+import httpx
+from django.conf import settings
+
+from radis.chats.utils.chat_client import build_yes_no_answers_grammar
+from radis.chats.utils.mock_llm_server import MockLlmOptions, MockLlmServer
+
+
+def test_mock_llm_server():
+    server = MockLlmServer(options=MockLlmOptions(token_latency=0))
+    server.start()
+
+    try:
+        messages = [{"role": "user", "content": "Question?"}]
+
+        response = httpx.post(
+            f"{server.url}/v1/chat/completions",
+            json={"messages": messages, "grammar": settings.CHAT_YES_NO_ANSWER_GRAMMAR},
+        )
+        assert response.json()["choices"][0]["message"]["content"] in ["Yes", "No"]
+
+        response = httpx.post(
+            f"{server.url}/v1/chat/completions",
+            json={"messages": messages, "grammar": build_yes_no_answers_grammar(3)},
+        )
+        answers = json.loads(response.json()["choices"][0]["message"]["content"])
+        assert list(answers.keys()) == ["1", "2", "3"]
+
+        assert server.request_count == 2
+        assert httpx.get(f"{server.url}/health").is_success
+    finally:
+        server.stop()
+
+
+def test_mock_llm_server_failure_injection():
+    server = MockLlmServer(options=MockLlmOptions(failure_rate=1.0))
+    server.start()
+
+    try:
+        response = httpx.post(f"{server.url}/v1/chat/completions", json={"messages": []})
+        assert response.status_code == 503
+    finally:
+        server.stop()
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, NamedTuple
+
+import openai
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# The baseline latency is the lowest latency of this many recent requests, so that the
+# limiter adapts to an LLM that got slower in general (and not only because of the load)
+# once all the faster requests dropped out of the window.
+BASELINE_WINDOW = 200
+
+# The errors that signal that the LLM is overloaded (llama.cpp responds with 503 if
+# no slot is available).
+OVERLOAD_ERRORS = (openai.APITimeoutError, openai.InternalServerError)
+
+
+class LimiterState(NamedTuple):
+    window: float
+    in_flight: int
+    # The lowest latency (in seconds) observed recently, i.e. without much load
+    baseline_latency: float | None
+
+
+class LimiterRequest:
+    """A request admitted by the adaptive limiter (see AdaptiveLimiter.request)."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+
+    def start(self) -> None:
+        """Restarts the latency measurement of the request.
+
+        Must be called if the request waited for something else after it was admitted
+        (e.g. for a cluster wide slot), so that this waiting time does not count as
+        latency of the LLM.
+        """
+        self.started = time.monotonic()
+
+
+class AdaptiveLimiter:
+    """Limits the number of in-flight LLM requests with an adaptive window (AIMD).
+
+    The window grows additively (by about one per window of requests) as long as the
+    latency of the requests stays near the baseline latency, the lowest latency of the
+    recent requests (see BASELINE_WINDOW and LLM_ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE).
+    It is not grown anymore if the latency rises, and it shrinks multiplicatively (see
+    LLM_ADAPTIVE_CONCURRENCY_BACKOFF) if a request times out or the LLM is overloaded.
+    The window is capped by LLM_CONCURRENCY_LIMIT.
+    """
+
+    def __init__(self) -> None:
+        self.window = float(settings.LLM_ADAPTIVE_CONCURRENCY_INITIAL)
+        self._latencies: deque[float] = deque(maxlen=BASELINE_WINDOW)
+        self._in_flight = 0
+        self._last_backoff = 0.0
+        self._condition = asyncio.Condition()
+
+    @property
+    def baseline_latency(self) -> float | None:
+        return min(self._latencies) if self._latencies else None
+
+    @property
+    def state(self) -> LimiterState:
+        return LimiterState(self.window, self._in_flight, self.baseline_latency)
+
+    @asynccontextmanager
+    async def request(self, measured: bool = True) -> AsyncIterator[LimiterRequest]:
+        """Admits a request to the LLM once the window allows it.
+
+        The latency of a request that is not measured (e.g. a request that is much faster
+        than a completion, like tokenizing a text) does not adapt the window.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.window))
+            self._in_flight += 1
+
+        request = LimiterRequest()
+        try:
+            yield request
+        except OVERLOAD_ERRORS:
+            self.record_overload(request.started)
+            raise
+        else:
+            if measured:
+                self.record_success(time.monotonic() - request.started)
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def record_success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        baseline_latency = min(self._latencies)
+
+        tolerance: float = settings.LLM_ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE
+        if latency <= baseline_latency * tolerance:
+            previous = int(self.window)
+            self.window = min(self.window + 1 / self.window, settings.LLM_CONCURRENCY_LIMIT)
+            if int(self.window) > previous:
+                logger.debug("Increased LLM concurrency window to %d.", int(self.window))
+
+    def record_overload(self, started: float) -> None:
+        # The requests that were already in flight when we backed off last time must
+        # not shrink the window again.
+        if started <= self._last_backoff:
+            return
+        self._last_backoff = time.monotonic()
+
+        backoff: float = settings.LLM_ADAPTIVE_CONCURRENCY_BACKOFF
+        self.window = max(self.window * backoff, 1.0)
+        logger.info("LLM overloaded, decreased concurrency window to %d.", int(self.window))
+
+
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AdaptiveLimiter]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def log_limiter_state() -> None:
+    """Logs the state of the limiter of the running event loop."""
+    state = get_adaptive_limiter().state
+    logger.info(
+        "LLM adaptive limiter: window %d, %d requests in flight, baseline latency %s",
+        int(state.window),
+        state.in_flight,
+        "-" if state.baseline_latency is None else f"{state.baseline_latency:.2f}s",
+    )
+
+
+def get_adaptive_limiter() -> AdaptiveLimiter:
+    """Returns the limiter of the running event loop (shared by all its LLM requests)."""
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = AdaptiveLimiter()
+        _limiters[loop] = limiter
+    return limiter
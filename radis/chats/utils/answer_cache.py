@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import Iterable, NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from openai.types.chat import ChatCompletionMessageParam
+
+from ..models import CachedAnswer
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCacheStats(NamedTuple):
+    entries: int
+    # The hits of the cached answers (that were not evicted yet)
+    hits: int
+    # All misses so far (see migration 0006)
+    misses: int
+
+
+def build_cache_key(
+    model: str,
+    messages: Iterable[ChatCompletionMessageParam],
+    max_tokens: int | None,
+    grammar: str,
+) -> str:
+    """Builds the key of an LLM answer.
+
+    The messages contain the rendered prompt templates (and so the report and question). The
+    model (see LlmRouter.get_model) and the version of the prompts (to invalidate the cache
+    explicitly) are part of the key, too.
+    """
+    assert model, "The model of a cached answer must be known."
+    normalized = json.dumps(
+        {
+            "model": model,
+            "version": settings.LLM_ANSWER_CACHE_VERSION,
+            "messages": list(messages),
+            "max_tokens": max_tokens,
+            "grammar": grammar,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+async def get_cached_answer(key: str) -> str | None:
+    cached_answer = await CachedAnswer.objects.filter(key=key).afirst()
+    if cached_answer is None:
+        await sync_to_async(_count_miss)()
+        return None
+
+    await CachedAnswer.objects.filter(pk=cached_answer.pk).aupdate(
+        hits=F("hits") + 1, last_used_at=timezone.now()
+    )
+    return cached_answer.answer
+
+
+def _count_miss() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval('answer_cache_misses')")
+
+
+def _get_misses() -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM answer_cache_misses"
+        )
+        row = cursor.fetchone()
+        assert row is not None
+        return row[0]
+
+
+async def cache_answer(key: str, answer: str) -> None:
+    # Another worker could have cached the same answer in the meantime
+    await CachedAnswer.objects.abulk_create(
+        [CachedAnswer(key=key, answer=answer)], ignore_conflicts=True
+    )
+
+
+def evict_cached_answers() -> int:
+    """Evicts the answers that were not used for LLM_ANSWER_CACHE_MAX_AGE (in seconds)
+    and the least recently used answers above LLM_ANSWER_CACHE_MAX_ENTRIES.
+
+    Returns: The number of evicted answers.
+    """
+    expired_before = timezone.now() - timedelta(seconds=settings.LLM_ANSWER_CACHE_MAX_AGE)
+    num_expired, _ = CachedAnswer.objects.filter(last_used_at__lt=expired_before).delete()
+
+    recently_used_first = CachedAnswer.objects.order_by("-last_used_at", "-pk").values("pk")
+    num_surplus, _ = CachedAnswer.objects.filter(
+        pk__in=recently_used_first[settings.LLM_ANSWER_CACHE_MAX_ENTRIES :]
+    ).delete()
+
+    logger.debug("Evicted %d expired and %d surplus LLM answers.", num_expired, num_surplus)
+    return num_expired + num_surplus
+
+
+def get_answer_cache_stats() -> AnswerCacheStats:
+    stats = CachedAnswer.objects.aggregate(entries=Count("pk"), hits=Sum("hits"))
+    return AnswerCacheStats(stats["entries"], stats["hits"] or 0, _get_misses())
@@ -1,45 +1,139 @@
+import json
 import logging
+import math
 from string import Template
 from typing import Iterable, Literal
 
-import openai
+import httpx
 from django.conf import settings
-from openai.types.chat import ChatCompletionMessageParam
+from openai.types.chat import ChatCompletion, ChatCompletionMessageParam
+
+from .answer_cache import build_cache_key, cache_answer, get_cached_answer
+from .llm_governor import LlmGovernor
+from .llm_router import LlmRouter, get_pooled_router
 
 logger = logging.getLogger(__name__)
 
+# A rough estimate of the characters per token (if the LLM can't tokenize a text)
+ESTIMATED_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the tokens of the text without the tokenizer of the LLM."""
+    return math.ceil(len(text) / ESTIMATED_CHARS_PER_TOKEN)
+
 
 class AsyncChatClient:
-    def __init__(self):
-        self._client = openai.AsyncOpenAI(
-            base_url=f"{settings.LLAMACPP_URL}/v1", api_key="unnecessary"
-        )
+    """A client for the LLM.
+
+    If a governor is passed then each request to the LLM must first acquire one of the
+    (cluster wide) LLM slots of the governor.
+
+    If the answer cache is used then the answers of the LLM are cached persistently
+    (see chats/utils/answer_cache.py) and the same messages are only sent once to the
+    LLM. Cached answers are returned without acquiring an LLM slot. The answers are only
+    cached if the model of the LLM is known (see LlmRouter.get_model).
+
+    The requests are routed to one of the llama.cpp instances (see LlmRouter). If pooled
+    then the client shares its router (and so its connections to the LLM) with all other
+    pooled clients of the running event loop (so it must be created within that loop).
+    A client that is not pooled has connections of its own that must be closed (see
+    aclose).
+    """
+
+    def __init__(
+        self,
+        governor: LlmGovernor | None = None,
+        use_answer_cache: bool = False,
+        pooled: bool = False,
+    ):
+        self._router = get_pooled_router() if pooled else LlmRouter()
+        self._pooled = pooled
+        self._governor = governor
+        self._use_answer_cache = use_answer_cache
+
+    async def aclose(self) -> None:
+        """Closes the connections of the client (the pooled ones are kept open)."""
+        if not self._pooled:
+            await self._router.aclose()
+
+    async def count_tokens(self, text: str) -> int:
+        """Counts the tokens of the text with the tokenizer of the LLM.
+
+        The count is only estimated if the LLM could not tokenize the text. Like the other
+        requests to the LLM, a tokenize request must acquire a slot of the governor (but its
+        latency is not measured by the adaptive limiter).
+        """
+        try:
+            if self._governor:
+                async with self._governor.slot(measured=False):
+                    return await self._router.tokenize(text)
+            return await self._router.tokenize(text)
+        except (httpx.HTTPError, KeyError, ValueError) as err:
+            logger.warning("Estimating token count as the LLM could not tokenize: %s", err)
+            return estimate_tokens(text)
 
     async def send_messages(
         self,
         messages: Iterable[ChatCompletionMessageParam],
         max_tokens: int | None = None,
         yes_no_answer: bool = False,
+        grammar: str = "",
+        affinity: str = "",
     ) -> str:
+        """Sends the messages to the LLM and returns its answer.
+
+        Messages with the same affinity (e.g. about the same report) are sent to the same
+        slot of the LLM, so that the common prefix of their prompts can be reused.
+        """
         logger.debug(f"Sending messages to LLM:\n{messages}")
 
-        grammar = ""
         if yes_no_answer:
             grammar = settings.CHAT_YES_NO_ANSWER_GRAMMAR
+        if grammar:
             logger.debug(f"\nUsing grammar: {grammar}")
 
-        completion = await self._client.chat.completions.create(
-            model="option_for_local_llm_not_needed",
-            messages=messages,
-            max_tokens=max_tokens,
-            extra_body={"grammar": grammar},
-        )
+        cache_key = ""
+        model = await self._router.get_model() if self._use_answer_cache else ""
+        if model:
+            messages = list(messages)
+            cache_key = build_cache_key(model, messages, max_tokens, grammar)
+            cached_answer = await get_cached_answer(cache_key)
+            if cached_answer is not None:
+                logger.debug("Received from answer cache: %s", cached_answer)
+                return cached_answer
+        elif self._use_answer_cache:
+            logger.warning("Not using the answer cache as the model of the LLM is unknown.")
+
+        if self._governor:
+            async with self._governor.slot():
+                completion = await self._create_completion(messages, max_tokens, grammar, affinity)
+        else:
+            completion = await self._create_completion(messages, max_tokens, grammar, affinity)
         answer = completion.choices[0].message.content
         assert answer is not None
         logger.debug("Received from LLM: %s", answer)
 
+        if cache_key:
+            await cache_answer(cache_key, answer)
+
         return answer
 
+    async def _create_completion(
+        self,
+        messages: Iterable[ChatCompletionMessageParam],
+        max_tokens: int | None,
+        grammar: str,
+        affinity: str,
+    ) -> ChatCompletion:
+        return await self._router.create_completion(
+            affinity=affinity,
+            model="option_for_local_llm_not_needed",
+            messages=messages,
+            max_tokens=max_tokens,
+            extra_body={"grammar": grammar, "cache_prompt": settings.LLAMACPP_CACHE_PROMPT},
+        )
+
     async def ask_report_question(self, context: str, question: str) -> str:
         system_prompt = Template(settings.CHAT_REPORT_QUESTION_SYSTEM_PROMPT).substitute(
             {"report": context}
@@ -53,6 +147,7 @@ class AsyncChatClient:
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
             ],
+            affinity=context,
         )
 
     async def ask_report_yes_no_question(self, context: str, question: str) -> Literal["yes", "no"]:
@@ -69,6 +164,7 @@ class AsyncChatClient:
                 {"role": "user", "content": user_prompt},
             ],
             yes_no_answer=True,
+            affinity=context,
         )
 
         if answer == "Yes":
@@ -77,3 +173,62 @@ class AsyncChatClient:
             return "no"
         else:
             raise ValueError(f"Unexpected answer: {answer}")
+
+    async def ask_report_yes_no_questions(
+        self, context: str, questions: list[str]
+    ) -> list[Literal["yes", "no"]]:
+        """Asks multiple yes/no questions about a report with a single request.
+
+        The report is only sent (and processed by the LLM) once for all questions. The
+        output is constrained by a grammar to a JSON object with a "Yes" or "No" for
+        each question number. The answers are returned in the order of the questions.
+        """
+        system_prompt = Template(settings.CHAT_REPORT_YES_NO_QUESTIONS_SYSTEM_PROMPT).substitute(
+            {"report": context}
+        )
+        user_prompt = Template(settings.CHAT_REPORT_QUESTIONS_USER_PROMPT).substitute(
+            {
+                "questions": "\n".join(
+                    f"{number}. {question}" for number, question in enumerate(questions, start=1)
+                )
+            }
+        )
+
+        answer = await self.send_messages(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            grammar=build_yes_no_answers_grammar(len(questions)),
+            affinity=context,
+        )
+
+        try:
+            answers = json.loads(answer)
+        except json.JSONDecodeError:
+            raise ValueError(f"Unexpected answer: {answer}")
+
+        results: list[Literal["yes", "no"]] = []
+        for number in range(1, len(questions) + 1):
+            value = answers.get(str(number)) if isinstance(answers, dict) else None
+            if value == "Yes":
+                results.append("yes")
+            elif value == "No":
+                results.append("no")
+            else:
+                raise ValueError(f"Unexpected answer: {answer}")
+        return results
+
+
+def build_yes_no_answers_grammar(num_questions: int) -> str:
+    """Builds a grammar for a JSON object with a "Yes" or "No" for each question number."""
+    members = ' "," ws '.join(
+        f'"\\"{number}\\"" ws ":" ws answer' for number in range(1, num_questions + 1)
+    )
+    return "\n".join(
+        [
+            f'root ::= "{{" ws {members} ws "}}"',
+            'answer ::= "\\"Yes\\"" | "\\"No\\""',
+            "ws ::= [ \\t\\n]*",
+        ]
+    )
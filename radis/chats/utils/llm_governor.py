@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import random
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, LiteralString, NamedTuple
+
+import psycopg
+from django.conf import settings
+from django.db import connection
+
+from .adaptive_limiter import get_adaptive_limiter
+
+logger = logging.getLogger(__name__)
+
+# The first key of all advisory locks used as LLM slots (the second key is the slot
+# number), so that they can't collide with other advisory locks.
+ADVISORY_LOCK_CLASS_ID = 0x4C4C4D  # "LLM"
+
+# The first key of the advisory locks used as gates of the shares (the second key is the
+# index of the share). Only the holder of the gate of a share looks for a free slot, all
+# other requests of the share wait for the gate (in the order they arrived).
+ADVISORY_GATE_CLASS_ID = 0x4C4C47  # "LLG"
+
+# The channel that is notified whenever a slot is released.
+RELEASE_CHANNEL = "llm_slot_released"
+
+# How long (in seconds) the holder of a gate waits for a release notification before it
+# looks for a free slot again anyway (the slots of a crashed worker are released without
+# a notification).
+RELEASE_TIMEOUT = 1.0
+
+_CURRENT_DATABASE_SQL: LiteralString = (
+    "database = (SELECT oid FROM pg_database WHERE datname = current_database())"
+)
+
+
+class ShareUtilization(NamedTuple):
+    share: str
+    in_use: int
+    capacity: int
+
+
+def get_share_slots() -> dict[str, range]:
+    """Partitions the LLM slots (LLM_CONCURRENCY_LIMIT) by the weights of the shares.
+
+    Every share gets at least one slot.
+    """
+    limit: int = settings.LLM_CONCURRENCY_LIMIT
+    shares: dict[str, int] = settings.LLM_CONCURRENCY_SHARES
+    total_weight = sum(shares.values())
+
+    sizes = {share: max(1, limit * weight // total_weight) for share, weight in shares.items()}
+    # Hand out the slots left over by rounding down to the shares with the highest weight
+    left_over = limit - sum(sizes.values())
+    for share in sorted(shares, key=lambda share: shares[share], reverse=True)[: max(0, left_over)]:
+        sizes[share] += 1
+
+    slots: dict[str, range] = {}
+    start = 0
+    for share, size in sizes.items():
+        slots[share] = range(start, start + size)
+        start += size
+    return slots
+
+
+def get_llm_utilization() -> list[ShareUtilization]:
+    """Returns how many LLM slots of each share are currently in use cluster wide.
+
+    A slot of a share may also be in use by a request of another share (that borrowed it).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT objid FROM pg_locks "
+            "WHERE locktype = 'advisory' AND classid = %s AND objsubid = 2 AND granted "
+            f"AND {_CURRENT_DATABASE_SQL}",
+            [ADVISORY_LOCK_CLASS_ID],
+        )
+        slots_in_use = {row[0] for row in cursor.fetchall()}
+
+    return [
+        ShareUtilization(share, len(slots_in_use.intersection(slots)), len(slots))
+        for share, slots in get_share_slots().items()
+    ]
+
+
+async def _connect() -> psycopg.AsyncConnection:
+    # Use the same connection parameters (including the OPTIONS) as Django itself
+    params = connection.get_connection_params()
+    params.pop("cursor_factory", None)
+    return await psycopg.AsyncConnection.connect(**params, autocommit=True)
+
+
+class LlmGovernor:
+    """Caps the number of in-flight LLM requests across all workers.
+
+    Each request must hold a slot. A slot is a PostgreSQL session level advisory lock held
+    on a dedicated connection of the governor, so the slots of a crashed worker are
+    released as soon as its connection is gone.
+
+    Each share (e.g. RAG or subscription jobs, see LLM_CONCURRENCY_SHARES) is guaranteed
+    its part of the slots. The requests of a share wait in the order they arrived (behind
+    the gate of the share) for a free slot of the share. If all its slots are in use, a
+    share may borrow the free slots of another share as long as no request of that share
+    is waiting. A waiting request does not poll for a free slot, but waits until a slot is
+    released (see RELEASE_CHANNEL).
+
+    Within a process the requests are additionally limited by the adaptive limiter of
+    the event loop (see AdaptiveLimiter), so that not more requests are in flight than
+    the LLM can handle without slowing down.
+
+    The connections are opened on the first request (or when used as an async context
+    manager) and reopened if they were closed. Use get_llm_governor to share the
+    governor (and its connections) of a share with all tasks of the event loop.
+    """
+
+    def __init__(self, share: str) -> None:
+        self.share = share
+        share_slots = get_share_slots()
+        self._share_index = list(share_slots).index(share)
+        self._slots = share_slots[share]
+        self._other_slots = {
+            index: share_slots[other]
+            for index, other in enumerate(share_slots)
+            if index != self._share_index
+        }
+        # Advisory locks are reentrant within the same connection, so we have to keep
+        # track of the slots that we already hold ourselves.
+        self._held_slots: set[int] = set()
+        # The slots are held on one connection, the gate is waited for (and the release
+        # notifications are received) on another one, so that slots can be released while
+        # a request is waiting.
+        self._conn: psycopg.AsyncConnection | None = None
+        self._wait_conn: psycopg.AsyncConnection | None = None
+        # Only one request of the governor at a time waits for the gate (the others wait
+        # in the order they arrived for their turn).
+        self._waiting = asyncio.Lock()
+        self._opening = asyncio.Lock()
+
+    async def __aenter__(self) -> "LlmGovernor":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    @property
+    def closed(self) -> bool:
+        return any(conn is None or conn.closed for conn in (self._conn, self._wait_conn))
+
+    async def open(self) -> None:
+        """Opens the connections of the governor (if they aren't open already)."""
+        async with self._opening:
+            if not self.closed:
+                return
+            await self.close()
+            self._conn = await _connect()
+            self._wait_conn = await _connect()
+            await self._wait_conn.execute(f"LISTEN {RELEASE_CHANNEL}")
+
+    async def close(self) -> None:
+        # Closing the connections also releases all slots (and the gate) that are still held
+        for conn in (self._conn, self._wait_conn):
+            if conn is not None:
+                await conn.close()
+        self._conn = None
+        self._wait_conn = None
+        self._held_slots.clear()
+
+    @asynccontextmanager
+    async def slot(self, measured: bool = True) -> AsyncIterator[None]:
+        async with get_adaptive_limiter().request(measured) as request:
+            slot = await self._acquire()
+            # Waiting for a slot of the cluster is not latency of the LLM
+            request.start()
+            try:
+                yield
+            finally:
+                self._held_slots.discard(slot)
+                await self._query(
+                    "SELECT pg_advisory_unlock(%s, %s), pg_notify(%s, '')",
+                    [ADVISORY_LOCK_CLASS_ID, slot, RELEASE_CHANNEL],
+                )
+
+    async def _acquire(self) -> int:
+        await self.open()
+        assert self._wait_conn is not None
+
+        async with self._waiting:
+            gate = [ADVISORY_GATE_CLASS_ID, self._share_index]
+            await self._wait_conn.execute("SELECT pg_advisory_lock(%s, %s)", gate)
+            try:
+                while True:
+                    slot = await self._try_acquire()
+                    if slot is not None:
+                        return slot
+
+                    logger.debug("All LLM slots of share %s in use, waiting.", self.share)
+                    async for _ in self._wait_conn.notifies(timeout=RELEASE_TIMEOUT, stop_after=1):
+                        pass
+            finally:
+                await self._wait_conn.execute("SELECT pg_advisory_unlock(%s, %s)", gate)
+
+    async def _try_acquire(self) -> int | None:
+        slot = await self._try_acquire_any(self._slots)
+        if slot is not None or not self._other_slots:
+            return slot
+
+        # Only borrow the slots of the shares that have no waiting requests themselves
+        waiting_shares = {
+            row[0]
+            for row in await self._query_all(
+                "SELECT objid FROM pg_locks "
+                "WHERE locktype = 'advisory' AND classid = %s AND objsubid = 2 AND granted "
+                f"AND {_CURRENT_DATABASE_SQL}",
+                [ADVISORY_GATE_CLASS_ID],
+            )
+        }
+        for index, slots in self._other_slots.items():
+            if index not in waiting_shares:
+                slot = await self._try_acquire_any(slots)
+                if slot is not None:
+                    return slot
+        return None
+
+    async def _try_acquire_any(self, slots: range) -> int | None:
+        # Start at a random slot so that not all workers compete for the same one
+        offset = random.randrange(len(slots))
+        for i in range(len(slots)):
+            slot = slots[(offset + i) % len(slots)]
+            if slot in self._held_slots:
+                continue
+            self._held_slots.add(slot)
+            if await self._query(
+                "SELECT pg_try_advisory_lock(%s, %s)", [ADVISORY_LOCK_CLASS_ID, slot]
+            ):
+                return slot
+            self._held_slots.discard(slot)
+        return None
+
+    async def _query(self, query: LiteralString, params: list) -> bool:
+        rows = await self._query_all(query, params)
+        return rows[0][0]
+
+    async def _query_all(self, query: LiteralString, params: list) -> list[tuple]:
+        assert self._conn is not None, "The connections of the governor are not open."
+        cursor = await self._conn.execute(query, params)
+        return await cursor.fetchall()
+
+
+_governors: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, LlmGovernor]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_llm_governor(share: str) -> LlmGovernor:
+    """Returns the governor of the share for the running event loop.
+
+    The governor (and so its two connections) is shared by all tasks of the event loop
+    and kept open for the lifetime of the worker.
+    """
+    loop = asyncio.get_running_loop()
+    governors = _governors.setdefault(loop, {})
+    governor = governors.get(share)
+    if governor is None:
+        governor = LlmGovernor(share)
+        governors[share] = governor
+    return governor
+
+
+async def close_llm_governors() -> None:
+    """Closes the governors of the running event loop (and so releases their slots)."""
+    governors = _governors.pop(asyncio.get_running_loop(), {})
+    for governor in governors.values():
+        await governor.close()
@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import weakref
+from http import HTTPStatus
+from typing import Any, NamedTuple
+
+import httpx
+import openai
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from openai.types.chat import ChatCompletion
+
+logger = logging.getLogger(__name__)
+
+# The weight of the latest response time in the moving average of the response times.
+LATENCY_SMOOTHING = 0.2
+
+# The timeout (in seconds) to tokenize a text.
+TOKENIZE_TIMEOUT = 30
+
+# How long (in seconds) the model reported by a backend is used before it is asked again
+# (e.g. after llama.cpp was restarted with another model).
+MODEL_CHECK_INTERVAL = 60
+
+# The timeout (in seconds) of the health and slots requests of the backend status (that is
+# shown in the admin section).
+STATUS_TIMEOUT = 2
+
+
+class BackendStats(NamedTuple):
+    url: str
+    # The requests of this process that are currently in flight
+    outstanding: int
+    # The moving average of the response times (in seconds)
+    latency: float | None
+    ejected: bool
+    # The part of the prompt tokens that were reused from the prompt cache of llama.cpp
+    # (None if llama.cpp didn't report it)
+    prompt_cache_hit_rate: float | None
+
+
+class BackendStatus(NamedTuple):
+    url: str
+    healthy: bool
+    # The slots of llama.cpp that are processing a request (None if the slots endpoint
+    # is not enabled)
+    busy_slots: int | None
+    total_slots: int | None
+    # The response time of the health check (in seconds)
+    latency: float | None
+
+
+class _Backend:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.outstanding = 0
+        self.latency: float | None = None
+        self.ejected_until = 0.0
+        # The failed requests since the last successful one
+        self.failures = 0
+        self.cached_prompt_tokens = 0
+        self.processed_prompt_tokens = 0
+        # The model served by the backend ("" if unknown), see LlmRouter.get_model
+        self.model = ""
+        self.model_checked_at: float | None = None
+
+    @property
+    def prompt_cache_hit_rate(self) -> float | None:
+        total = self.cached_prompt_tokens + self.processed_prompt_tokens
+        return self.cached_prompt_tokens / total if total else None
+
+    def record_timings(self, completion: ChatCompletion) -> None:
+        # llama.cpp reports how many prompt tokens were taken from its prompt cache
+        # (cache_n) and how many had to be processed (prompt_n).
+        timings = (completion.model_extra or {}).get("timings")
+        if not isinstance(timings, dict) or "cache_n" not in timings:
+            return
+        self.cached_prompt_tokens += timings["cache_n"]
+        self.processed_prompt_tokens += timings.get("prompt_n", 0)
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+
+# The state of the backends is shared by all routers of the process (even across event
+# loops), so that each request is routed by all the requests in flight.
+_backends: dict[str, _Backend] = {}
+_backends_lock = threading.Lock()
+
+
+def _get_backends() -> list[_Backend]:
+    with _backends_lock:
+        for url in settings.LLAMACPP_URLS:
+            if url not in _backends:
+                _backends[url] = _Backend(url)
+        return [_backends[url] for url in settings.LLAMACPP_URLS]
+
+
+def get_backend_stats() -> list[BackendStats]:
+    """Returns the routing statistics of the backends (of this process)."""
+    return [
+        BackendStats(
+            backend.url,
+            backend.outstanding,
+            backend.latency,
+            backend.ejected,
+            backend.prompt_cache_hit_rate,
+        )
+        for backend in _get_backends()
+    ]
+
+
+def log_backend_stats() -> None:
+    for stats in get_backend_stats():
+        logger.info(
+            "LLM backend %s: %d outstanding requests, latency %s, prompt cache hit rate %s",
+            stats.url,
+            stats.outstanding,
+            "-" if stats.latency is None else f"{stats.latency:.2f}s",
+            "-" if stats.prompt_cache_hit_rate is None else f"{stats.prompt_cache_hit_rate:.0%}",
+        )
+
+
+async def _get_health(client: httpx.AsyncClient, url: str) -> tuple[bool, float | None]:
+    try:
+        started = time.monotonic()
+        healthy = (await client.get(f"{url}/health")).is_success
+        return healthy, time.monotonic() - started
+    except httpx.HTTPError:
+        return False, None
+
+
+async def _get_slots(client: httpx.AsyncClient, url: str) -> tuple[int | None, int | None]:
+    try:
+        response = await client.get(f"{url}/slots")
+        if response.is_success:
+            slots = response.json()
+            return sum(1 for slot in slots if slot.get("is_processing")), len(slots)
+    except (httpx.HTTPError, ValueError):
+        pass
+    return None, None
+
+
+async def _get_backend_status() -> list[BackendStatus]:
+    urls: list[str] = settings.LLAMACPP_URLS
+    async with httpx.AsyncClient(timeout=STATUS_TIMEOUT) as client:
+        healths, slots = await asyncio.gather(
+            asyncio.gather(*[_get_health(client, url) for url in urls]),
+            asyncio.gather(*[_get_slots(client, url) for url in urls]),
+        )
+
+    status: list[BackendStatus] = []
+    for url, (healthy, latency), (busy_slots, total_slots) in zip(urls, healths, slots):
+        if not healthy and latency is None:
+            status.append(BackendStatus(url, False, None, None, None))
+        else:
+            status.append(BackendStatus(url, healthy, busy_slots, total_slots, latency))
+    return status
+
+
+def get_backend_status() -> list[BackendStatus]:
+    """Asks all backends (llama.cpp instances) concurrently for their health and slots."""
+    return async_to_sync(_get_backend_status)()
+
+
+class LlmRouter:
+    """Routes the requests to the LLM to the llama.cpp instances (LLAMACPP_URLS).
+
+    Each request goes to the backend with the fewest outstanding requests. If a request
+    fails it is tried on another backend. A backend that is unreachable (or whose requests
+    failed LLAMACPP_EJECTION_FAILURES times in a row) is ejected for LLAMACPP_EJECTION_TIME
+    seconds. A backend that is only busy (llama.cpp responds with 503 if no slot is
+    available) is not ejected, as its load would then only move to the other backends.
+
+    Requests with the same affinity (e.g. all questions about the same report) always go
+    to the same slot of the same backend (as long as it is not ejected) if
+    LLAMACPP_SLOTS_PER_INSTANCE is set. So llama.cpp can reuse the cached prompt prefix
+    (the instructions and the report) of the earlier requests and only has to process
+    the question.
+    """
+
+    def __init__(self) -> None:
+        self._clients: dict[str, openai.AsyncOpenAI] = {}
+        self._http_client: httpx.AsyncClient | None = None
+
+    async def aclose(self) -> None:
+        """Closes the connections of the router."""
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def _get_client(self, url: str) -> openai.AsyncOpenAI:
+        client = self._clients.get(url)
+        if client is None:
+            client = openai.AsyncOpenAI(base_url=f"{url}/v1", api_key="unnecessary")
+            self._clients[url] = client
+        return client
+
+    def _select_affine_slot(self, affinity: str) -> tuple[_Backend, int] | None:
+        slots_per_instance: int = settings.LLAMACPP_SLOTS_PER_INSTANCE
+        if not slots_per_instance:
+            return None
+
+        backends = _get_backends()
+        digest = int.from_bytes(hashlib.sha256(affinity.encode()).digest()[:8])
+        backend = backends[digest % len(backends)]
+        if backend.ejected:
+            return None
+        return backend, digest // len(backends) % slots_per_instance
+
+    def _select_backend(self, tried: set[str]) -> _Backend | None:
+        candidates = [backend for backend in _get_backends() if backend.url not in tried]
+        if not candidates:
+            return None
+
+        # If all backends are ejected we still try them (the earliest ejected first)
+        # instead of failing right away.
+        available = [backend for backend in candidates if not backend.ejected]
+        if not available:
+            return min(candidates, key=lambda backend: backend.ejected_until)
+
+        fewest = min(backend.outstanding for backend in available)
+        return random.choice([backend for backend in available if backend.outstanding == fewest])
+
+    async def create_completion(self, affinity: str = "", **kwargs: Any) -> ChatCompletion:
+        affine_slot = self._select_affine_slot(affinity) if affinity else None
+
+        tried: set[str] = set()
+        while True:
+            request_kwargs = kwargs
+            if affine_slot and not tried:
+                backend, slot = affine_slot
+                request_kwargs = {
+                    **kwargs,
+                    "extra_body": {**kwargs.get("extra_body", {}), "id_slot": slot},
+                }
+            else:
+                backend = self._select_backend(tried)
+                assert backend is not None
+            tried.add(backend.url)
+
+            backend.outstanding += 1
+            started = time.monotonic()
+            try:
+                completion = await self._get_client(backend.url).chat.completions.create(
+                    **request_kwargs
+                )
+            except (openai.APIConnectionError, openai.InternalServerError) as err:
+                if (
+                    isinstance(err, openai.InternalServerError)
+                    and err.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+                ):
+                    # The backend is busy (the OpenAI client already retried with backoff)
+                    logger.info("LLM backend %s is busy: %s", backend.url, err)
+                else:
+                    backend.failures += 1
+                    # A timeout may also only be caused by a busy backend
+                    unreachable = isinstance(err, openai.APIConnectionError) and not isinstance(
+                        err, openai.APITimeoutError
+                    )
+                    if unreachable or backend.failures >= settings.LLAMACPP_EJECTION_FAILURES:
+                        backend.ejected_until = time.monotonic() + settings.LLAMACPP_EJECTION_TIME
+                        logger.warning("Ejected LLM backend %s after error: %s", backend.url, err)
+                if len(tried) == len(settings.LLAMACPP_URLS):
+                    raise
+                continue
+            finally:
+                backend.outstanding -= 1
+
+            backend.failures = 0
+
+            latency = time.monotonic() - started
+            if backend.latency is None:
+                backend.latency = latency
+            else:
+                backend.latency += LATENCY_SMOOTHING * (latency - backend.latency)
+            backend.record_timings(completion)
+
+            return completion
+
+    async def get_model(self) -> str:
+        """Returns the identity of the model served by the backends (its name and metadata
+        as reported by llama.cpp).
+
+        Returns an empty string if no backend reported its model or the backends serve
+        different models.
+        """
+        models = await asyncio.gather(
+            *[self._get_backend_model(backend) for backend in _get_backends()]
+        )
+        known_models = {model for model in models if model}
+        if len(known_models) != 1:
+            return ""
+        return known_models.pop()
+
+    async def _get_backend_model(self, backend: _Backend) -> str:
+        checked_at = backend.model_checked_at
+        if checked_at is not None and time.monotonic() - checked_at < MODEL_CHECK_INTERVAL:
+            return backend.model
+
+        try:
+            page = await self._get_client(backend.url).models.list()
+            backend.model = json.dumps(
+                [
+                    {"id": model.id, "meta": (model.model_extra or {}).get("meta")}
+                    for model in page.data
+                ],
+                sort_keys=True,
+            )
+        except openai.APIError as err:
+            logger.warning("Could not get the model of LLM backend %s: %s", backend.url, err)
+            backend.model = ""
+        backend.model_checked_at = time.monotonic()
+        return backend.model
+
+    async def tokenize(self, text: str) -> int:
+        """Counts the tokens of the text with the tokenizer of one of the backends."""
+        backend = self._select_backend(set())
+        assert backend is not None
+        client = self._http_client
+        if client is None:
+            client = self._http_client = httpx.AsyncClient(timeout=TOKENIZE_TIMEOUT)
+        response = await client.post(f"{backend.url}/tokenize", json={"content": text})
+        response.raise_for_status()
+        return len(response.json()["tokens"])
+
+
+_pooled_routers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LlmRouter]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_pooled_router() -> LlmRouter:
+    """Returns the router of the running event loop.
+
+    The connections of a router are bound to the event loop they were opened in, so
+    there is one router per event loop.
+    """
+    loop = asyncio.get_running_loop()
+    router = _pooled_routers.get(loop)
+    if router is None:
+        router = LlmRouter()
+        _pooled_routers[loop] = router
+    return router
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# A rough estimate of the characters per token (the mock server has no tokenizer)
+CHARS_PER_TOKEN = 4
+
+# How long (in seconds) to wait before looking again for a free slot
+SLOT_POLL_INTERVAL = 0.001
+
+LOREM_IPSUM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua."
+)
+
+
+class MockLlmOptions(NamedTuple):
+    # The number of parallel slots (further requests are queued like in llama.cpp)
+    parallel: int = 2
+    # The time (in seconds) to process a prompt token that is not cached in the slot
+    prompt_token_latency: float = 0.0002
+    # The time (in seconds) to generate a token
+    token_latency: float = 0.02
+    # The probability that a yes/no question is answered with "Yes"
+    yes_ratio: float = 0.5
+    # The probability that a request fails with a 503 (no slot available)
+    failure_rate: float = 0.0
+
+
+class _Slot:
+    def __init__(self, id: int) -> None:
+        self.id = id
+        self.lock = threading.Lock()
+        # The prompt processed last in this slot (its prefix can be reused)
+        self.prompt = ""
+
+
+class MockLlmServer:
+    """A mock of the llama.cpp server (with its OpenAI compatible API).
+
+    It answers chat completions with "Yes" or "No" (or a JSON object of those for
+    numbered questions) depending on the passed grammar and with some Lorem Ipsum text
+    otherwise. The latencies are simulated per token, a prompt prefix is reused if the
+    request ends up in the slot that processed that prefix before (see cache_prompt and
+    id_slot of llama.cpp), and failures can be injected. For benchmarks and development
+    without a GPU (see the mock_llm_server and benchmark_rag commands).
+    """
+
+    def __init__(
+        self, host: str = "localhost", port: int = 0, options: MockLlmOptions = MockLlmOptions()
+    ) -> None:
+        self.options = options
+        self.slots = [_Slot(id) for id in range(options.parallel)]
+        self.request_count = 0
+        self._request_count_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _create_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def start(self) -> None:
+        """Starts the server in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def count_request(self) -> None:
+        with self._request_count_lock:
+            self.request_count += 1
+
+    def acquire_slot(self, id_slot: int | None) -> _Slot:
+        if id_slot is not None and 0 <= id_slot < len(self.slots):
+            slot = self.slots[id_slot]
+            slot.lock.acquire()
+            return slot
+
+        while True:
+            for slot in self.slots:
+                if slot.lock.acquire(blocking=False):
+                    return slot
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    def complete(self, body: dict[str, Any]) -> dict[str, Any]:
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        grammar: str = body.get("grammar") or ""
+        id_slot = body.get("id_slot")
+
+        # The same prompt always gets the same answer
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        content = self._generate_content(grammar, rng)
+
+        slot = self.acquire_slot(id_slot if isinstance(id_slot, int) and id_slot >= 0 else None)
+        try:
+            cached_chars = 0
+            if body.get("cache_prompt", True):
+                cached_chars = len(os.path.commonprefix([prompt, slot.prompt]))
+            slot.prompt = prompt
+
+            cache_n = cached_chars // CHARS_PER_TOKEN
+            prompt_n = len(prompt) // CHARS_PER_TOKEN - cache_n
+            predicted_n = max(1, len(content) // CHARS_PER_TOKEN)
+            time.sleep(
+                prompt_n * self.options.prompt_token_latency
+                + predicted_n * self.options.token_latency
+            )
+        finally:
+            slot.lock.release()
+
+        return {
+            "id": f"chatcmpl-{rng.getrandbits(64):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": cache_n + prompt_n,
+                "completion_tokens": predicted_n,
+                "total_tokens": cache_n + prompt_n + predicted_n,
+            },
+            "timings": {"cache_n": cache_n, "prompt_n": prompt_n, "predicted_n": predicted_n},
+        }
+
+    def _generate_content(self, grammar: str, rng: random.Random) -> str:
+        def answer() -> str:
+            return "Yes" if rng.random() < self.options.yes_ratio else "No"
+
+        # The grammar of multiple numbered questions (see build_yes_no_answers_grammar)
+        numbers = re.findall(r'\\"(\d+)\\"', grammar)
+        if numbers:
+            return json.dumps({number: answer() for number in numbers})
+        if '"Yes"' in grammar and '"No"' in grammar:
+            return answer()
+        return LOREM_IPSUM
+
+
+def _create_handler(server: MockLlmServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(HTTPStatus.OK, {"status": "ok"})
+            elif self.path == "/slots":
+                self._send_json(
+                    HTTPStatus.OK,
+                    [{"id": slot.id, "is_processing": slot.lock.locked()} for slot in server.slots],
+                )
+            elif self.path == "/v1/models":
+                self._send_json(
+                    HTTPStatus.OK,
+                    {"object": "list", "data": [{"id": "mock-model", "object": "model"}]},
+                )
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": {"message": "Not found"}})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path == "/tokenize":
+                num_tokens = len(str(body.get("content", ""))) // CHARS_PER_TOKEN
+                self._send_json(HTTPStatus.OK, {"tokens": list(range(num_tokens))})
+                return
+
+            if self.path != "/v1/chat/completions":
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": {"message": "Not found"}})
+                return
+
+            server.count_request()
+
+            if random.random() < server.options.failure_rate:
+                self._send_json(
+                    HTTPStatus.SERVICE_UNAVAILABLE,
+                    {
+                        "error": {
+                            "code": 503,
+                            "message": "no slot available",
+                            "type": "unavailable_error",
+                        }
+                    },
+                )
+                return
+
+            self._send_json(HTTPStatus.OK, server.complete(body))
+
+        def _send_json(self, status: HTTPStatus, data: Any) -> None:
+            content = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format, *args)
+
+    return Handler
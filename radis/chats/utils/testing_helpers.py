@@ -21,4 +21,7 @@ def create_async_openai_client_mock(content: str) -> openai.AsyncOpenAI:
     future = asyncio.Future()
     future.set_result(mock_response)
     openai_mock.chat.completions.create.return_value = future
+    models_future = asyncio.Future()
+    models_future.set_result(MagicMock(data=[MagicMock(id="mock-model", model_extra={})]))
+    openai_mock.models.list.return_value = models_future
     return openai_mock
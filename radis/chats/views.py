@@ -62,7 +62,7 @@ async def chat_create_view(request: AuthenticatedHttpRequest) -> HttpResponse:
             else:
                 instructions_system_prompt: str = settings.CHAT_GENERAL_SYSTEM_PROMPT
 
-            client = AsyncChatClient()
+            client = AsyncChatClient(pooled=True)
 
             # Generate an answer for the user prompt
             answer = await client.send_messages(
@@ -171,7 +171,7 @@ async def chat_update_view(request: AuthenticatedHttpRequest, pk: int) -> HttpRe
         prompt = form.cleaned_data["prompt"]
         messages.append({"role": "user", "content": prompt})
 
-        client = AsyncChatClient()
+        client = AsyncChatClient(pooled=True)
         response = await client.send_messages(
             messages,
             yes_no_answer=True if request.POST.get("yes_no_answer") else False,
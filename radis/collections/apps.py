@@ -17,6 +17,8 @@ def register_app():
 
     from radis.reports.site import register_report_panel_button
 
+    from .utils.panel_utils import prefetch_collections_count
+
     register_main_menu_item(
         MainMenuItem(
             url_name="collection_list",
@@ -24,7 +26,9 @@ def register_app():
         )
     )
 
-    register_report_panel_button(1, "collections/_collection_select_button.html")
+    register_report_panel_button(
+        1, "collections/_collection_select_button.html", prefetch_collections_count
+    )
 
 
 def init_db(**kwargs):
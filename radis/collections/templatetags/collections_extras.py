@@ -5,6 +5,7 @@ from django.db.models import QuerySet
 from django.template import Library
 
 from radis.reports.models import Report
+from radis.reports.utils.panel_utils import get_panel_data
 
 from ..models import Collection
 
@@ -13,6 +14,10 @@ register = Library()
 
 @register.simple_tag(takes_context=True)
 def collections_count(context: dict[str, Any], report: Report):
+    panel_data = get_panel_data(report)
+    if "collections_count" in panel_data:
+        return panel_data["collections_count"]
+
     user = cast(User, context["request"].user)
     collections = cast(QuerySet[Collection], getattr(report, "collections"))
     return collections.filter(owner=user).count()
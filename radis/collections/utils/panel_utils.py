@@ -0,0 +1,20 @@
+from adit_radis_shared.accounts.models import User
+from django.db.models import Count
+
+from radis.reports.models import Report
+from radis.reports.utils.panel_utils import get_panel_data
+
+from ..models import Collection
+
+
+def prefetch_collections_count(reports: list[Report], user: User) -> None:
+    counts = dict(
+        Collection.reports.through.objects.filter(
+            report_id__in=[report.pk for report in reports], collection__owner=user
+        )
+        .values("report_id")
+        .annotate(count=Count("collection_id"))
+        .values_list("report_id", "count")
+    )
+    for report in reports:
+        get_panel_data(report)["collections_count"] = counts.get(report.pk, 0)
@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+import uuid
+
+from adit_radis_shared.accounts.factories import GroupFactory, UserFactory
+from adit_radis_shared.common.utils.testing_helpers import add_user_to_group
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from faker import Faker
+from procrastinate.contrib.django import app
+
+from radis.chats.utils.mock_llm_server import MockLlmServer
+from radis.rag.factories import QuestionFactory
+from radis.rag.models import RagJob
+from radis.rag.site import retrieval_providers
+from radis.reports.factories import LanguageFactory, ReportFactory
+from radis.reports.models import Report
+
+from .mock_llm_server import add_mock_llm_arguments, get_mock_llm_options
+
+fake = Faker()
+
+FINISHED_STATUSES = [
+    RagJob.Status.SUCCESS,
+    RagJob.Status.WARNING,
+    RagJob.Status.FAILURE,
+    RagJob.Status.CANCELED,
+]
+
+
+class QueryCounter:
+    """Counts the queries of all database connections (of all threads)."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs) -> None:
+        connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the throughput of a RAG job end to end (against a mock LLM by default). "
+        "The workers also process any other queued jobs, so better use an otherwise idle "
+        "database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "--reports", type=int, default=200, help="Number of reports. Defaults to 200."
+        )
+        parser.add_argument(
+            "--questions", type=int, default=3, help="Number of questions. Defaults to 3."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="The concurrency of the worker. Defaults to 10.",
+        )
+        parser.add_argument(
+            "--llm-url",
+            default=None,
+            help="Benchmark against this LLM instead of a mock LLM.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=3600,
+            help="Abort if the job is not finished after this many seconds. Defaults to 3600.",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the created job and reports.")
+        parser.add_argument("--json", action="store_true", help="Output the results as JSON.")
+        add_mock_llm_arguments(parser)
+
+    def handle(self, *args, **options):
+        server: MockLlmServer | None = None
+        llm_url = options["llm_url"]
+        if llm_url is None:
+            server = MockLlmServer(options=get_mock_llm_options(options))
+            server.start()
+            llm_url = server.url
+
+        if not options["json"]:
+            self.stdout.write(f"Creating {options['reports']} reports ...")
+        job, report_ids = self.create_job(options["reports"], options["questions"])
+
+        counter = QueryCounter()
+        connection_created.connect(counter.install)
+        connection.execute_wrappers.append(counter)
+        try:
+            with override_settings(LLAMACPP_URLS=[llm_url]):
+                started = time.monotonic()
+                job.delay()
+                while job.status not in FINISHED_STATUSES:
+                    # The worker stops as soon as it caught up with the queues, but the
+                    # job could still be preparing (and queue further tasks)
+                    app.run_worker(
+                        queues=["default", "llm"],
+                        wait=False,
+                        concurrency=options["concurrency"],
+                        install_signal_handlers=False,
+                    )
+                    job.refresh_from_db()
+                    if time.monotonic() - started > options["timeout"]:
+                        raise CommandError(f"{job} not finished in time (still {job.status}).")
+                wall_time = time.monotonic() - started
+        finally:
+            connection.execute_wrappers.remove(counter)
+            connection_created.disconnect(counter.install)
+            if server:
+                server.stop()
+
+        num_reports = len(report_ids)
+        results = {
+            "status": job.get_status_display(),
+            "reports": num_reports,
+            "questions": options["questions"],
+            "wall_time": round(wall_time, 3),
+            "reports_per_second": round(num_reports / wall_time, 3),
+            "llm_calls_per_second": (
+                round(server.request_count / wall_time, 3) if server else None
+            ),
+            "db_queries_per_report": round(counter.count / num_reports, 3),
+        }
+
+        if not options["keep"]:
+            job.delete()
+            Report.objects.filter(id__in=report_ids).delete()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results))
+        else:
+            for key, value in results.items():
+                self.stdout.write(f"{key}: {value}")
+
+    def create_job(self, num_reports: int, num_questions: int) -> tuple[RagJob, list[int]]:
+        # A word only the benchmark reports contain, so that the job finds exactly those
+        marker = f"radisbenchmark{uuid.uuid4().hex[:8]}"
+
+        language = LanguageFactory.create(code="en")
+        user = UserFactory.create()
+        group = GroupFactory.create()
+        add_user_to_group(user, group)
+
+        report_ids: list[int] = []
+        for _ in range(num_reports):
+            report = ReportFactory.create(
+                language=language, body=f"{fake.paragraph(nb_sentences=10)} {marker}"
+            )
+            report.groups.set([group])
+            report_ids.append(report.pk)
+
+        job = RagJob.objects.create(
+            title="Benchmark",
+            provider=next(iter(retrieval_providers)),
+            group=group,
+            owner=user,
+            query=marker,
+            language=language,
+            status=RagJob.Status.PREPARING,
+            use_llm_cache=False,
+        )
+        QuestionFactory.create_batch(num_questions, job=job)
+
+        return job, report_ids
@@ -0,0 +1,55 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from radis.reports.utils.bulk_import import BulkImportError, ReportBulkImporter
+
+
+class Command(BaseCommand):
+    help = "Bulk import reports from a NDJSON file (one report per line in the API format)."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "file",
+            help="The NDJSON file to import the reports from ('-' to read from stdin).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="The number of reports to import within one transaction. "
+            "Defaults to the REPORTS_BULK_IMPORT_BATCH_SIZE setting.",
+        )
+        parser.add_argument(
+            "--upsert",
+            action="store_true",
+            help="Update the reports with an already existing document ID (instead of "
+            "skipping them).",
+        )
+
+    def handle(self, *args, **options):
+        importer = ReportBulkImporter(batch_size=options["batch_size"], upsert=options["upsert"])
+
+        self.stdout.write("Importing reports...", ending="")
+        self.stdout.flush()
+
+        start = time.time()
+        try:
+            if options["file"] == "-":
+                result = importer.import_lines(sys.stdin)
+            else:
+                with open(options["file"], "r", encoding="utf-8") as f:
+                    result = importer.import_lines(f)
+        except BulkImportError as err:
+            raise CommandError(
+                f"{err} ({err.result.created} reports were imported before the error)"
+            )
+
+        self.stdout.write(
+            f"Done (created {result.created}, updated {result.updated}, "
+            f"skipped {result.skipped} existing reports "
+            f"in {time.time() - start:.2f} seconds)"
+        )
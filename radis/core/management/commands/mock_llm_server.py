@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandParser
+
+from radis.chats.utils.mock_llm_server import MockLlmOptions, MockLlmServer
+
+
+class Command(BaseCommand):
+    help = "Runs a mock of the llama.cpp server (e.g. for development without a GPU)."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+
+        parser.add_argument("--host", default="localhost", help="Defaults to 'localhost'.")
+        parser.add_argument("--port", type=int, default=8080, help="Defaults to 8080.")
+        add_mock_llm_arguments(parser)
+
+    def handle(self, *args, **options):
+        server = MockLlmServer(options["host"], options["port"], get_mock_llm_options(options))
+        self.stdout.write(f"Mock LLM server listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def add_mock_llm_arguments(parser: CommandParser) -> None:
+    defaults = MockLlmOptions()
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=defaults.parallel,
+        help=f"The number of parallel slots. Defaults to {defaults.parallel}.",
+    )
+    parser.add_argument(
+        "--prompt-token-latency",
+        type=float,
+        default=defaults.prompt_token_latency,
+        help="The seconds to process a (not cached) prompt token. "
+        f"Defaults to {defaults.prompt_token_latency}.",
+    )
+    parser.add_argument(
+        "--token-latency",
+        type=float,
+        default=defaults.token_latency,
+        help=f"The seconds to generate a token. Defaults to {defaults.token_latency}.",
+    )
+    parser.add_argument(
+        "--yes-ratio",
+        type=float,
+        default=defaults.yes_ratio,
+        help=f"The ratio of 'Yes' answers. Defaults to {defaults.yes_ratio}.",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=defaults.failure_rate,
+        help=f"The ratio of requests that fail with 503. Defaults to {defaults.failure_rate}.",
+    )
+
+
+def get_mock_llm_options(options: dict) -> MockLlmOptions:
+    return MockLlmOptions(
+        parallel=options["parallel"],
+        prompt_token_latency=options["prompt_token_latency"],
+        token_latency=options["token_latency"],
+        yes_ratio=options["yes_ratio"],
+        failure_rate=options["failure_rate"],
+    )
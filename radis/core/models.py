@@ -1,9 +1,11 @@
 import logging
-from typing import Callable
+from typing import Callable, NamedTuple, TypeVar
 
 from django.conf import settings
 from django.core.mail import send_mail
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.html import strip_tags
@@ -14,6 +16,25 @@ from radis.core.utils.model_utils import reset_tasks
 logger = logging.getLogger(__name__)
 
 
+class TaskCounts(NamedTuple):
+    """The number of tasks of a job per status."""
+
+    pending: int = 0
+    in_progress: int = 0
+    canceled: int = 0
+    success: int = 0
+    warning: int = 0
+    failure: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self)
+
+    @property
+    def processed(self) -> int:
+        return self.total - self.pending - self.in_progress
+
+
 class AnalysisJob(models.Model):
     class Status(models.TextChoices):
         UNVERIFIED = "UV", "Unverified"
@@ -39,11 +60,19 @@ class AnalysisJob(models.Model):
     )
     urgent = models.BooleanField(default=False)
     send_finished_mail = models.BooleanField(default=False)
+    # If the answers of the LLM are cached (see chats/utils/answer_cache.py)
+    use_llm_cache = models.BooleanField(default=True)
     finished_mail_template: str | None
     message = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     started_at = models.DateTimeField(null=True, blank=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+    # The checkpoint of the preparation (see prepare_tasks), so that an interrupted
+    # preparation can be resumed.
+    last_prepared_report_id = models.BigIntegerField(null=True, blank=True)
+    # Regularly updated while the job is prepared, so that a stalled preparation (e.g. its
+    # worker was killed) can be told apart from a long running one.
+    preparation_heartbeat = models.DateTimeField(null=True, blank=True)
 
     tasks: models.QuerySet["AnalysisTask"]
 
@@ -80,14 +109,23 @@ class AnalysisJob(models.Model):
         Returns: True if the job (for now) has no more pending tasks left. If it
             is a continuous job there could be added new tasks later on.
         """
-        if self.tasks.filter(status=AnalysisTask.Status.PENDING).exists():
-            if self.status != AnalysisJob.Status.CANCELING:
+        if self.status == AnalysisJob.Status.PREPARING:
+            # The first tasks are already processed while the job is still preparing.
+            # The job state is evaluated when the preparation is finished.
+            self.refresh_from_db()
+            if self.status == AnalysisJob.Status.PREPARING:
+                return False
+
+        counts = self.get_task_counts()
+
+        if counts.pending:
+            if self.status not in (AnalysisJob.Status.PENDING, AnalysisJob.Status.CANCELING):
                 self.status = AnalysisJob.Status.PENDING
                 self.save()
             return False
 
-        if self.tasks.filter(status=AnalysisTask.Status.IN_PROGRESS).exists():
-            if self.status != AnalysisJob.Status.CANCELING:
+        if counts.in_progress:
+            if self.status not in (AnalysisJob.Status.IN_PROGRESS, AnalysisJob.Status.CANCELING):
                 self.status = AnalysisJob.Status.IN_PROGRESS
                 self.save()
             return False
@@ -98,9 +136,9 @@ class AnalysisJob(models.Model):
             return False
 
         # Job is finished and we evaluate its final status
-        has_success = self.tasks.filter(status=AnalysisTask.Status.SUCCESS).exists()
-        has_warning = self.tasks.filter(status=AnalysisTask.Status.WARNING).exists()
-        has_failure = self.tasks.filter(status=AnalysisTask.Status.FAILURE).exists()
+        has_success = counts.success > 0
+        has_warning = counts.warning > 0
+        has_failure = counts.failure > 0
 
         if has_success and not has_warning and not has_failure:
             self.status = AnalysisJob.Status.SUCCESS
@@ -129,6 +167,11 @@ class AnalysisJob(models.Model):
 
         return True
 
+    def get_task_counts(self) -> TaskCounts:
+        """Counts the tasks of this job per status (with a single query)."""
+        counts = self.tasks.order_by().values_list("status").annotate(count=Count("pk"))
+        return _build_task_counts(dict(counts))
+
     def _send_job_finished_mail(self) -> None:
         if not self.finished_mail_template:
             raise ValueError("No finished mail template for job %s", self)
@@ -240,6 +283,7 @@ class AnalysisTask(models.Model):
     class Meta:
         abstract = True
         ordering = ("id",)
+        indexes = [models.Index(fields=["job", "status"])]
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__} [{self.pk}]"
@@ -260,3 +304,53 @@ class AnalysisTask(models.Model):
             self.Status.WARNING,
             self.Status.FAILURE,
         ]
+
+
+# The fields of TaskCounts and the task status each of them counts
+TASK_COUNT_FIELDS = {
+    "pending": AnalysisTask.Status.PENDING,
+    "in_progress": AnalysisTask.Status.IN_PROGRESS,
+    "canceled": AnalysisTask.Status.CANCELED,
+    "success": AnalysisTask.Status.SUCCESS,
+    "warning": AnalysisTask.Status.WARNING,
+    "failure": AnalysisTask.Status.FAILURE,
+}
+
+
+def _build_task_counts(counts: dict[str, int]) -> TaskCounts:
+    return TaskCounts(
+        **{field: counts.get(status, 0) for field, status in TASK_COUNT_FIELDS.items()}
+    )
+
+
+AnalysisJobT = TypeVar("AnalysisJobT", bound=AnalysisJob)
+
+
+def annotate_task_counts(jobs: models.QuerySet[AnalysisJobT]) -> models.QuerySet[AnalysisJobT]:
+    """Annotates each job with its number of tasks per status (see get_annotated_task_counts).
+
+    The tasks are counted with a subquery per job and status (instead of joining and
+    grouping all tasks of all jobs), so only the fetched jobs (e.g. of a table page) have
+    their tasks counted.
+    """
+    task_model = jobs.model._meta.get_field("tasks").related_model
+    assert task_model is not None and not isinstance(task_model, str)
+
+    def count(status: str) -> Coalesce:
+        tasks = (
+            task_model.objects.filter(job=OuterRef("pk"), status=status)
+            .order_by()
+            .values("job")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(tasks), 0)
+
+    return jobs.annotate(
+        **{f"num_{field}_tasks": count(status) for field, status in TASK_COUNT_FIELDS.items()}
+    )
+
+
+def get_annotated_task_counts(job: AnalysisJob) -> TaskCounts:
+    """Returns the task counts of a job that was annotated by annotate_task_counts."""
+    return TaskCounts(**{field: getattr(job, f"num_{field}_tasks") for field in TASK_COUNT_FIELDS})
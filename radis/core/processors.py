@@ -1,8 +1,13 @@
 import logging
 import traceback
 
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from django import db
 from django.utils import timezone
 
+from radis.chats.utils.llm_governor import close_llm_governors
+
 from .models import AnalysisJob, AnalysisTask
 
 logger = logging.getLogger(__name__)
@@ -13,7 +18,25 @@ class AnalysisTaskProcessor:
         self.task = task
 
     def start(self) -> None:
-        task = self.task
+        """Processes the task in an event loop of its own."""
+
+        async def start_in_own_loop() -> None:
+            try:
+                await self.start_async()
+            finally:
+                # The connections of the governors don't outlive the event loop
+                await close_llm_governors()
+
+        async_to_sync(start_in_own_loop)()
+
+    async def start_async(self) -> None:
+        """Processes the task in the running event loop.
+
+        So a (long-lived) worker can process multiple tasks concurrently in the same
+        event loop and share its resources (like the pooled connections to the LLM).
+        """
+        task = await type(self.task).objects.select_related("job").aget(pk=self.task.pk)
+        self.task = task
         job = task.job
 
         logger.info("Start processing task %s", task)
@@ -30,8 +53,8 @@ class AnalysisTaskProcessor:
             task.status = task.Status.CANCELED
             task.started_at = timezone.now()
             task.ended_at = timezone.now()
-            task.save()
-            job.update_job_state()
+            await task.asave()
+            await database_sync_to_async(job.update_job_state)()
             return
 
         assert task.status == task.Status.PENDING
@@ -40,18 +63,23 @@ class AnalysisTaskProcessor:
         # status of the job switches from PENDING to IN_PROGRESS
         if job.status == job.Status.PENDING:
             job.status = job.Status.IN_PROGRESS
-            job.started_at = timezone.now()
-            job.save()
+            job.started_at = job.started_at or timezone.now()
+            await job.asave()
+        elif job.status == job.Status.PREPARING:
+            # The tasks already created are processed while the job is still preparing
+            # the remaining ones. We don't save the (possibly outdated) job here.
+            not_started = type(job).objects.filter(pk=job.pk, started_at__isnull=True)
+            await not_started.aupdate(started_at=timezone.now())
 
-        assert job.status == job.Status.IN_PROGRESS
+        assert job.status in [job.Status.PREPARING, job.Status.IN_PROGRESS]
 
         # Prepare the task itself
         task.status = AnalysisTask.Status.IN_PROGRESS
         task.started_at = timezone.now()
-        task.save()
+        await task.asave()
 
         try:
-            self.process_task(task)
+            await self.process_task(task)
 
             # If the overwritten process_task method changes the status of the
             # task itself then we leave it as it is. Otherwise if the status is
@@ -69,9 +97,10 @@ class AnalysisTaskProcessor:
         finally:
             logger.info("Task %s ended", task)
             task.ended_at = timezone.now()
-            task.save()
-            job.update_job_state()
+            await task.asave()
+            await database_sync_to_async(job.update_job_state)()
+            await database_sync_to_async(db.close_old_connections)()
 
-    def process_task(self, task: AnalysisTask) -> None:
+    async def process_task(self, task: AnalysisTask) -> None:
         """The derived class should process the task here."""
         ...
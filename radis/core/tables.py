@@ -1,7 +1,7 @@
 import django_tables2 as tables
 from django.utils.html import format_html
 
-from .models import AnalysisJob, AnalysisTask
+from .models import AnalysisJob, AnalysisTask, get_annotated_task_counts
 from .templatetags.core_extras import (
     analysis_job_status_css_class,
     analysis_task_status_css_class,
@@ -23,12 +23,15 @@ class RecordIdColumn(tables.TemplateColumn):
 class AnalysisJobTable(tables.Table):
     id = RecordIdColumn(verbose_name="Job ID")
     created = tables.Column(verbose_name="Created At")
+    # The jobs must be annotated with their task counts (see annotate_task_counts)
+    progress = tables.Column(verbose_name="Progress", empty_values=(), orderable=False)
 
     class Meta:
         model: type[AnalysisJob]
         order_by = ("-id",)
         # owner is dynamically excluded for non staff users (see views.py)
         fields = ("id", "status", "message", "created_at", "owner")
+        sequence = ("id", "status", "progress", "...")
         empty_text = "No jobs to show"
         attrs = {
             "id": "analysis_job_table",
@@ -39,6 +42,17 @@ class AnalysisJobTable(tables.Table):
         css_class = analysis_job_status_css_class(record.status)
         return format_html('<span class="{} text-nowrap">{}</span>', css_class, value)
 
+    def render_progress(self, record):
+        counts = get_annotated_task_counts(record)
+        if counts.failure:
+            return format_html(
+                '{} / {} <span class="text-danger text-nowrap">({} failed)</span>',
+                counts.processed,
+                counts.total,
+                counts.failure,
+            )
+        return f"{counts.processed} / {counts.total}"
+
 
 class AnalysisTaskTable(tables.Table):
     id = RecordIdColumn(verbose_name="Task ID")
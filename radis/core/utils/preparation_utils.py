@@ -0,0 +1,132 @@
+import logging
+import time
+from datetime import timedelta
+from itertools import batched
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, TypeVar
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from procrastinate.contrib.django import app
+
+from radis.reports.models import Report
+
+if TYPE_CHECKING:
+    from ..models import AnalysisJob
+
+logger = logging.getLogger(__name__)
+
+JobT = TypeVar("JobT", bound="AnalysisJob")
+
+
+def prepare_tasks(
+    job: JobT,
+    document_ids: Iterable[str],
+    batch_size: int,
+    chunk_size: int,
+    create_tasks: Callable[[JobT, list[tuple[int, ...]]], None],
+) -> bool:
+    """Creates the tasks of a preparing job from the retrieved documents.
+
+    The document IDs must be ordered by report ID (see RetrievalProvider). They are
+    consumed in chunks of chunk_size tasks (with batch_size reports per task). Each chunk
+    is committed together with the ID of the last report as checkpoint of the job, so the
+    tasks of a chunk can already be processed while the later chunks are still retrieved,
+    and an interrupted preparation can be resumed from the checkpoint (reports up to the
+    checkpoint are skipped, even if retrieved again).
+
+    The passed create_tasks function must create (and defer) one task per batch of
+    report IDs.
+
+    While the documents are consumed the preparation sends heartbeats (see
+    retry_stalled_preparations).
+
+    Returns: False if the job stopped preparing in between (e.g. it was canceled).
+    """
+    for chunk in batched(_with_heartbeats(job, document_ids), batch_size * chunk_size):
+        report_ids = dict(
+            Report.objects.filter(document_id__in=chunk).values_list("document_id", "id")
+        )
+        missing = len(set(chunk)) - len(report_ids)
+        if missing:
+            logger.warning("Skipping %d retrieved reports that do not exist (anymore).", missing)
+
+        with transaction.atomic():
+            # Lock the job so that a concurrent preparation (e.g. a retried stalled one)
+            # can never create tasks for the same reports
+            locked_job = type(job).objects.select_for_update().get(pk=job.pk)
+            if locked_job.status != locked_job.Status.PREPARING:
+                logger.info("Stopped preparing job %s as it is %s.", job, locked_job.status)
+                return False
+
+            checkpoint = locked_job.last_prepared_report_id or 0
+            new_report_ids = list(
+                dict.fromkeys(
+                    report_ids[document_id]
+                    for document_id in chunk
+                    if document_id in report_ids and report_ids[document_id] > checkpoint
+                )
+            )
+            if not new_report_ids:
+                continue
+
+            logger.debug("Creating tasks for %d reports of job %s", len(new_report_ids), job)
+            create_tasks(locked_job, list(batched(new_report_ids, batch_size)))
+
+            locked_job.last_prepared_report_id = max(new_report_ids)
+            locked_job.save(update_fields=["last_prepared_report_id"])
+
+    return True
+
+
+def _send_heartbeat(job: "AnalysisJob") -> None:
+    type(job).objects.filter(pk=job.pk).update(preparation_heartbeat=timezone.now())
+
+
+def _with_heartbeats(job: "AnalysisJob", document_ids: Iterable[str]) -> Iterator[str]:
+    interval: int = settings.PREPARATION_HEARTBEAT_INTERVAL
+    _send_heartbeat(job)
+    last_heartbeat = time.monotonic()
+    for document_id in document_ids:
+        if time.monotonic() - last_heartbeat >= interval:
+            _send_heartbeat(job)
+            last_heartbeat = time.monotonic()
+        yield document_id
+
+
+async def retry_stalled_preparations(
+    job_model: type["AnalysisJob"], task_name: str, stalled_after: int
+) -> None:
+    """Retries the preparations (the jobs of the given task) that stopped sending heartbeats
+    for more than stalled_after seconds.
+
+    A job stays in the doing state forever if its worker was killed (e.g. on a restart),
+    so it must be retried explicitly. A preparation that is still running (but maybe for
+    a long time) keeps sending heartbeats and is not retried.
+    """
+    stalled_since = timezone.now() - timedelta(seconds=stalled_after)
+    for queued_job in await app.job_manager.get_stalled_jobs(stalled_after, task_name=task_name):
+        job_id = queued_job.task_kwargs["job_id"]
+        if await job_model.objects.filter(
+            pk=job_id, preparation_heartbeat__gte=stalled_since
+        ).aexists():
+            continue
+
+        logger.warning("Retrying stalled preparation of job %s (%s).", job_id, task_name)
+        await app.job_manager.retry_job(queued_job)
+
+
+def finish_preparation(job: "AnalysisJob") -> None:
+    """Switches a job from preparing to pending (and evaluates the tasks processed so far)."""
+    with transaction.atomic():
+        locked_job = type(job).objects.select_for_update().get(pk=job.pk)
+        if locked_job.status != locked_job.Status.PREPARING:
+            return
+
+        locked_job.status = locked_job.Status.PENDING
+        locked_job.save()
+
+        if locked_job.tasks.exists():
+            locked_job.update_job_state()
+
+    job.refresh_from_db()
@@ -0,0 +1,38 @@
+import json
+from typing import Any
+
+from django.db import connection
+from procrastinate.contrib.django import app
+
+
+def defer_many(
+    task_name: str, priorities: list[int], task_kwargs: list[dict[str, Any]]
+) -> list[int]:
+    """Defers many jobs of the same task with one statement.
+
+    procrastinate (3.0) itself can only defer one job per query. So we call its
+    defer function in a set-based query instead. Each job gets the priority at the
+    same position. Returns the IDs of the deferred jobs in the same order as the given
+    task kwargs.
+    """
+    if not task_kwargs:
+        return []
+
+    job = app.configure_task(task_name, allow_unknown=False).job
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT procrastinate_defer_job_v1(%s, %s, priority, %s, %s, args, NULL) "
+            "FROM unnest(%s::integer[], %s::jsonb[]) "
+            "WITH ORDINALITY AS t(priority, args, position) "
+            "ORDER BY position",
+            [
+                job.queue,
+                job.task_name,
+                job.lock,
+                job.queueing_lock,
+                priorities,
+                [json.dumps(kwargs) for kwargs in task_kwargs],
+            ],
+        )
+        return [row[0] for row in cursor.fetchall()]
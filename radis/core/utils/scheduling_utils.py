@@ -0,0 +1,107 @@
+from typing import TYPE_CHECKING, NamedTuple
+
+from django.apps import apps
+from django.db.models import Count, Max
+from procrastinate.contrib.django import app
+from procrastinate.contrib.django.models import ProcrastinateJob
+
+if TYPE_CHECKING:
+    from ..models import AnalysisJob
+
+# The procrastinate priority of a task consists of the static priority of its job (default
+# or urgent, see e.g. RAG_DEFAULT_PRIORITY) as band and its virtual time tag within that
+# band, i.e. a band covers the priorities from static priority * BAND_SIZE (inclusive) to
+# (static priority + 1) * BAND_SIZE (exclusive). So a task of a higher band is still always
+# fetched first (and procrastinate priorities must fit into an integer column).
+BAND_SIZE = 100_000_000
+
+
+class OwnerQueueDepth(NamedTuple):
+    owner: str
+    jobs: int
+    queued_tasks: int
+
+
+def get_fair_share_priorities(task_name: str, job: "AnalysisJob", count: int) -> list[int]:
+    """Returns the procrastinate priorities of count new tasks of a job.
+
+    The tasks of all jobs with the same static priority are interleaved by start-time
+    fair queuing: Each task gets a virtual time tag that is the tag of the last queued
+    task of its job (or the tag at the head of the queue if the job has no queued tasks)
+    plus a step, and the tasks are fetched in the order of their tags. The step is the
+    number of jobs of the owner with queued tasks, so that each owner gets an equal share
+    of the queue (split between its jobs) regardless of how many tasks its jobs have.
+    E.g. the tasks of a small job that is started while a huge job of another owner is
+    queued alternate with the tasks of the huge job instead of waiting for all of them.
+    """
+    if count == 0:
+        return []
+
+    static_priority = job.urgent_priority if job.urgent else job.default_priority
+    band_start = static_priority * BAND_SIZE
+    band_end = band_start + BAND_SIZE - 1
+
+    def to_tag(priority: int) -> int:
+        return band_end - priority
+
+    queue = app.configure_task(task_name, allow_unknown=False).job.queue
+    head_priority = ProcrastinateJob.objects.filter(
+        queue_name=queue,
+        status="todo",
+        priority__gte=band_start,
+        priority__lte=band_end,
+    ).aggregate(priority=Max("priority"))["priority"]
+    head_tag = to_tag(head_priority) if head_priority is not None else 0
+
+    last_priority = (
+        job.tasks.filter(queued_job__status="todo")
+        .order_by("queued_job__priority")
+        .values_list("queued_job__priority", flat=True)
+        .first()
+    )
+    start_tag = head_tag
+    if last_priority is not None and band_start <= last_priority <= band_end:
+        start_tag = max(start_tag, to_tag(last_priority))
+
+    other_jobs = (
+        type(job)
+        .objects.filter(owner_id=job.owner_id, tasks__queued_job__status="todo")
+        .exclude(pk=job.pk)
+        .values("pk")
+        .distinct()
+        .count()
+    )
+    step = other_jobs + 1
+
+    # If the band never drains the tags would outgrow it, the tasks are then fetched in
+    # the order they were deferred (the priority never drops below the band).
+    return [band_end - min(start_tag + step * (i + 1), BAND_SIZE - 1) for i in range(count)]
+
+
+def get_owner_queue_depths() -> list[OwnerQueueDepth]:
+    """Returns the number of queued tasks (of all analysis jobs) per owner.
+
+    The most queued tasks come first.
+    """
+    from ..models import AnalysisTask
+
+    depths: dict[str, OwnerQueueDepth] = {}
+    for model in apps.get_models():
+        if not issubclass(model, AnalysisTask):
+            continue
+
+        rows = (
+            model.objects.filter(queued_job__status="todo")
+            .values("job__owner__username")
+            .annotate(jobs=Count("job", distinct=True), queued_tasks=Count("id"))
+            .order_by()
+        )
+        for row in rows:
+            owner = row["job__owner__username"]
+            jobs, queued_tasks = row["jobs"], row["queued_tasks"]
+            if owner in depths:
+                jobs += depths[owner].jobs
+                queued_tasks += depths[owner].queued_tasks
+            depths[owner] = OwnerQueueDepth(owner, jobs, queued_tasks)
+
+    return sorted(depths.values(), key=lambda depth: depth.queued_tasks, reverse=True)
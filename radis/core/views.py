@@ -29,15 +29,28 @@ from django_filters.views import FilterView
 from django_tables2 import SingleTableMixin, Table
 from procrastinate.contrib.django import app
 
+from radis.chats.utils.answer_cache import get_answer_cache_stats
+from radis.chats.utils.llm_governor import get_llm_utilization
+from radis.chats.utils.llm_router import get_backend_status
 from radis.core.utils.model_utils import reset_tasks
+from radis.core.utils.scheduling_utils import get_owner_queue_depths
 
-from .models import AnalysisJob, AnalysisTask
+from .models import AnalysisJob, AnalysisTask, annotate_task_counts
 from .tasks import broadcast_mail
 
 
 @staff_member_required
 def admin_section(request: HttpRequest) -> HttpResponse:
-    return render(request, "core/admin_section.html")
+    return render(
+        request,
+        "core/admin_section.html",
+        {
+            "llm_utilization": get_llm_utilization(),
+            "answer_cache_stats": get_answer_cache_stats(),
+            "llm_backends": get_backend_status(),
+            "owner_queue_depths": get_owner_queue_depths(),
+        },
+    )
 
 
 class BroadcastView(BaseBroadcastView):
@@ -64,9 +77,11 @@ class AnalysisJobListView(LoginRequiredMixin, SingleTableMixin, PageSizeSelectMi
 
     def get_queryset(self) -> QuerySet:
         if self.request.user.is_staff and self.request.GET.get("all"):
-            return self.model.objects.all()
+            jobs = self.model.objects.all()
+        else:
+            jobs = self.model.objects.filter(owner=self.request.user)
 
-        return self.model.objects.filter(owner=self.request.user)
+        return annotate_task_counts(jobs)
 
     def get_table_kwargs(self) -> dict[str, Any]:
         kwargs = super().get_table_kwargs()
@@ -124,6 +139,11 @@ class AnalysisJobDetailView(
         job = cast(AnalysisJob, self.get_object())
         return job.tasks
 
+    def get_context_data(self, **kwargs) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        context["task_counts"] = cast(AnalysisJob, self.object).get_task_counts()
+        return context
+
 
 class AnalysisJobDeleteView(LoginRequiredMixin, DeleteView):
     model: type[AnalysisJob]
@@ -300,6 +320,9 @@ class AnalysisJobRestartView(LoginRequiredMixin, UserPassesTestMixin, SingleObje
 
         job.status = AnalysisJob.Status.PREPARING
         job.message = ""
+        job.last_prepared_report_id = None
+        job.started_at = None
+        job.ended_at = None
         job.save()
 
         transaction.on_commit(lambda: job.delay())
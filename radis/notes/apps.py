@@ -17,6 +17,8 @@ def register_app():
 
     from radis.reports.site import register_report_panel_button
 
+    from .utils.panel_utils import prefetch_note_available
+
     register_main_menu_item(
         MainMenuItem(
             url_name="note_list",
@@ -24,7 +26,7 @@ def register_app():
         )
     )
 
-    register_report_panel_button(2, "notes/_note_edit_button.html")
+    register_report_panel_button(2, "notes/_note_edit_button.html", prefetch_note_available)
 
 
 def init_db(**kwargs):
@@ -4,6 +4,7 @@ from adit_radis_shared.accounts.models import User
 from django.template import Library
 
 from radis.reports.models import Report
+from radis.reports.utils.panel_utils import get_panel_data
 
 from ..models import Note
 
@@ -12,6 +13,10 @@ register = Library()
 
 @register.simple_tag(takes_context=True)
 def note_available(context: dict[str, Any], report: Report):
+    panel_data = get_panel_data(report)
+    if "note_available" in panel_data:
+        return panel_data["note_available"]
+
     user = cast(User, context["request"].user)
     note = Note.objects.filter(owner=user, report_id=report.pk).first()
     return note is not None
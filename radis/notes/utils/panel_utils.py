@@ -0,0 +1,16 @@
+from adit_radis_shared.accounts.models import User
+
+from radis.reports.models import Report
+from radis.reports.utils.panel_utils import get_panel_data
+
+from ..models import Note
+
+
+def prefetch_note_available(reports: list[Report], user: User) -> None:
+    report_ids_with_note = set(
+        Note.objects.filter(
+            owner=user, report_id__in=[report.pk for report in reports]
+        ).values_list("report_id", flat=True)
+    )
+    for report in reports:
+        get_panel_data(report)["note_available"] = report.pk in report_ids_with_note
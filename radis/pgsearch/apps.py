@@ -5,31 +5,36 @@ class PgSearchConfig(AppConfig):
     name = "radis.pgsearch"
 
     def ready(self):
-        from . import signals as signals
-
         register_app()
 
 
 def register_app():
     from radis.rag.site import RetrievalProvider, register_retrieval_provider
     from radis.search.site import SearchProvider, register_search_provider
-    from radis.subscriptions.site import FilterProvider, register_filter_provider
+    from radis.search.utils.search_cache import cached_count, cached_retrieve, cached_search
+    from radis.subscriptions.site import (
+        FilterProvider,
+        PercolateProvider,
+        register_filter_provider,
+        register_percolate_provider,
+    )
 
-    from .providers import count, filter, retrieve, search
+    from .providers import count, filter, percolate, retrieve, search
 
     register_search_provider(
         SearchProvider(
             name="PG Search",
-            search=search,
+            search=cached_search("PG Search", search),
             max_results=1000,
+            supports_cursor=True,
         )
     )
 
     register_retrieval_provider(
         RetrievalProvider(
             name="PG Search",
-            count=count,
-            retrieve=retrieve,
+            count=cached_count("PG Search", count),
+            retrieve=cached_retrieve("PG Search", retrieve),
             max_results=None,
         )
     )
@@ -41,3 +46,10 @@ def register_app():
             max_results=None,
         )
     )
+
+    register_percolate_provider(
+        PercolateProvider(
+            name="PG Search",
+            percolate=percolate,
+        )
+    )
@@ -0,0 +1,98 @@
+from django.db import migrations
+
+# Mirrors LANGUAGES in pgsearch/utils/language_utils.py. A new migration that replaces
+# the function is needed whenever a language is added there.
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION pgsearch_language_config(language_code text)
+RETURNS regconfig
+AS $CODE$
+BEGIN
+    RETURN CASE language_code
+        WHEN 'de' THEN 'german'::regconfig
+        WHEN 'en' THEN 'english'::regconfig
+    END;
+END
+$CODE$
+LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION pgsearch_update_report_search_vector()
+RETURNS trigger
+AS $CODE$
+DECLARE
+    config regconfig;
+BEGIN
+    SELECT pgsearch_language_config(code) INTO config
+    FROM reports_language WHERE id = NEW.language_id;
+
+    IF config IS NULL THEN
+        RAISE EXCEPTION 'Language of report % is not supported.', NEW.document_id;
+    END IF;
+
+    INSERT INTO pgsearch_reportsearchvector (report_id, search_vector)
+    VALUES (NEW.id, to_tsvector(config, COALESCE(NEW.body, '')))
+    ON CONFLICT (report_id) DO UPDATE SET search_vector = EXCLUDED.search_vector;
+
+    RETURN NULL;
+END
+$CODE$
+LANGUAGE plpgsql;
+
+CREATE TRIGGER pgsearch_report_search_vector_insert
+AFTER INSERT ON reports_report
+FOR EACH ROW EXECUTE FUNCTION pgsearch_update_report_search_vector();
+
+CREATE TRIGGER pgsearch_report_search_vector_update
+AFTER UPDATE OF body, language_id ON reports_report
+FOR EACH ROW
+WHEN (OLD.body IS DISTINCT FROM NEW.body OR OLD.language_id IS DISTINCT FROM NEW.language_id)
+EXECUTE FUNCTION pgsearch_update_report_search_vector();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER pgsearch_report_search_vector_update ON reports_report;
+DROP TRIGGER pgsearch_report_search_vector_insert ON reports_report;
+DROP FUNCTION pgsearch_update_report_search_vector();
+DROP FUNCTION pgsearch_language_config(text);
+"""
+
+BACKFILL_BATCH_SIZE = 10_000
+
+# Only reports without a (complete) search vector are touched. Reports of
+# unsupported languages are left out (as before).
+BACKFILL_SQL = """
+INSERT INTO pgsearch_reportsearchvector (report_id, search_vector)
+SELECT r.id, to_tsvector(pgsearch_language_config(l.code), COALESCE(r.body, ''))
+FROM reports_report r
+JOIN reports_language l ON l.id = r.language_id
+LEFT JOIN pgsearch_reportsearchvector v ON v.report_id = r.id
+WHERE r.id > %s AND r.id <= %s
+AND pgsearch_language_config(l.code) IS NOT NULL
+AND v.search_vector IS NULL
+ON CONFLICT (report_id) DO UPDATE SET search_vector = EXCLUDED.search_vector
+"""
+
+
+def backfill_search_vectors(apps, schema_editor):
+    # The migration is not atomic, so each batch is committed on its own and
+    # the report table is never locked for the whole backfill.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM reports_report")
+        max_id = cursor.fetchone()[0]
+
+        for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+            cursor.execute(BACKFILL_SQL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('pgsearch', '0001_initial'),
+        ('reports', '0012_report_accession_number_and_study_instance_uid'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGER_SQL, reverse_sql=DROP_TRIGGER_SQL),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,20 @@
 from django.contrib.postgres.indexes import GinIndex
-from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from radis.reports.models import Report
 
-from .utils.language_utils import code_to_language
-
 
 class ReportSearchVector(models.Model):
+    """The full text search vector of a report.
+
+    The rows of this table are maintained by a database trigger on the report table
+    (see migration 0002) that computes the vector from the report body and language
+    whenever a report is created or its body or language changes. So it must not be
+    written by the application itself.
+    """
+
+    report_id: int
     report = models.OneToOneField(Report, on_delete=models.CASCADE, related_name="search_vector")
     search_vector = SearchVectorField(null=True)
 
@@ -16,9 +23,3 @@ class ReportSearchVector(models.Model):
 
     def __str__(self) -> str:
         return f"Report {self.report.id} search vector"
-
-    def save(self, *args, **kwargs):
-        body = self.report.body if self.report else ""
-        language = code_to_language(self.report.language.code)
-        self.search_vector = SearchVector(models.Value(body), config=language)
-        super().save(*args, **kwargs)
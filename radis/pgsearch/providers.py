@@ -1,11 +1,24 @@
+import base64
+import json
 import logging
-from typing import Iterator, cast
+from functools import lru_cache
+from typing import Iterator, Literal, cast
 
 import pyparsing as pp
 from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
-from django.db.models import F, Q
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Q, QuerySet
+from django.db.models.expressions import RawSQL
 
-from radis.search.site import Search, SearchFilters, SearchResult
+from radis.reports.models import Report
+from radis.search.site import (
+    CountStrategy,
+    InvalidCursorError,
+    Search,
+    SearchFilters,
+    SearchResult,
+    SummaryOptions,
+)
 from radis.search.utils.query_parser import BinaryNode, ParensNode, QueryNode, TermNode, UnaryNode
 
 from .models import ReportSearchVector
@@ -74,52 +87,138 @@ def _build_filter_query(filters: SearchFilters) -> Q:
         fq &= Q(report__created_at__gte=filters.created_after)
     if filters.created_before:
         fq &= Q(report__created_at__lte=filters.created_before)
+    if filters.report_id_after is not None:
+        fq &= Q(report_id__gt=filters.report_id_after)
+    if filters.report_id_till is not None:
+        fq &= Q(report_id__lte=filters.report_id_till)
 
     return fq
 
 
+def _encode_cursor(rank: float, report_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, report_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rank, report_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(report_id)
+    except (ValueError, TypeError) as err:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from err
+
+
+def _estimate_count(matches: QuerySet[ReportSearchVector]) -> int:
+    plan = json.loads(matches.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _count_matches(
+    matches: QuerySet[ReportSearchVector], strategy: CountStrategy
+) -> tuple[int, Literal["exact", "at_least", "approximately"]]:
+    if strategy.relation == "at_least":
+        # Only scan the matches up to the threshold
+        capped_count = matches.order_by()[: strategy.threshold + 1].count()
+        if capped_count > strategy.threshold:
+            return strategy.threshold, "at_least"
+        return capped_count, "exact"
+
+    if strategy.relation == "approximately":
+        estimated_count = _estimate_count(matches)
+        if estimated_count > strategy.threshold:
+            return estimated_count, "approximately"
+
+    return matches.count(), "exact"
+
+
+def _build_summaries(
+    report_ids: list[int], query: SearchQuery, language: str, options: SummaryOptions
+) -> dict[int, str]:
+    # Generating headlines is the most expensive part of a search, so it is done in a
+    # separate query only for the reports of the returned page.
+    summaries = (
+        Report.objects.filter(pk__in=report_ids)
+        .annotate(
+            summary=SearchHeadline(
+                "body",
+                query,
+                config=language,
+                start_sel="<em>",
+                stop_sel="</em>",
+                min_words=options.min_words,
+                max_words=options.max_words,
+                max_fragments=options.max_fragments,
+            )
+        )
+        .values_list("pk", "summary")
+    )
+    return dict(summaries)
+
+
 def search(search: Search) -> SearchResult:
     query_str = _build_query_string(search.query)
     language = code_to_language(search.filters.language)
     query = SearchQuery(query_str, search_type="raw", config=language)
     filter_query = _build_filter_query(search.filters)
     language = code_to_language(search.filters.language)
+    matches = ReportSearchVector.objects.filter(filter_query).filter(search_vector=query)
+    total_count, total_relation = _count_matches(matches, search.count_strategy)
     results = (
-        ReportSearchVector.objects.filter(filter_query)
-        .filter(search_vector=query)
-        .annotate(
+        matches.annotate(
             rank=SearchRank(
                 F("search_vector"),
                 query,
             )
         )
-        .annotate(
-            summary=SearchHeadline(
-                "report__body",
-                query,
-                config=language,
-                start_sel="<em>",
-                stop_sel="</em>",
-                min_words=10,
-                max_words=20,
-                max_fragments=10,
-            )
-        )
         .select_related("report")
-        .order_by("-rank")
+        .prefetch_related("report__modalities")
+        .defer("report__body")
+        .order_by("-rank", "report_id")
     )
 
-    total_count = results.count()
+    if search.cursor is not None:
+        # Keyset pagination, so that fetching a deep page is as cheap as fetching the
+        # first one (no re-ranking and discarding of all results before the page).
+        last_rank, last_report_id = _decode_cursor(search.cursor)
+        # ts_rank returns a real, so we must compare with a real as well
+        rank = RawSQL("%s::real", (last_rank,))
+        results = results.filter(Q(rank__lt=rank) | Q(rank=rank, report_id__gt=last_report_id))
+        offset = 0
+    else:
+        offset = search.offset
+
     if search.limit is None:
-        results = results[search.offset :]
+        results = results[offset:]
     else:
-        results = results[search.offset : search.offset + search.limit]
+        # One more record tells us if there is a next page (the total count may be only
+        # a lower bound or an estimate)
+        results = results[offset : offset + search.limit + 1]
+
+    records = [cast(AnnotatedReportSearchVector, result) for result in results]
+    has_more = search.limit is not None and len(records) > search.limit
+    if has_more:
+        records = records[: search.limit]
+
+    summaries: dict[int, str] = {}
+    if search.summary_options is not None and records:
+        summaries = _build_summaries(
+            [record.report_id for record in records], query, language, search.summary_options
+        )
+
     documents = [
-        document_from_pgsearch_response(cast(AnnotatedReportSearchVector, result))
-        for result in results
+        document_from_pgsearch_response(record, summaries.get(record.report_id, ""))
+        for record in records
     ]
 
-    return SearchResult(total_count=total_count, total_relation="exact", documents=documents)
+    next_cursor: str | None = None
+    if has_more:
+        next_cursor = _encode_cursor(records[-1].rank, records[-1].report_id)
+
+    return SearchResult(
+        total_count=total_count,
+        total_relation=total_relation,
+        documents=documents,
+        next_cursor=next_cursor,
+    )
 
 
 def count(search: Search) -> int:
@@ -128,8 +227,9 @@ def count(search: Search) -> int:
     query = SearchQuery(query_str, search_type="raw", config=language)
     filter_query = _build_filter_query(search.filters)
     language = code_to_language(search.filters.language)
-    results = ReportSearchVector.objects.filter(filter_query).filter(search_vector=query)
-    return results.count()
+    matches = ReportSearchVector.objects.filter(filter_query).filter(search_vector=query)
+    total_count, _ = _count_matches(matches, search.count_strategy)
+    return total_count
 
 
 def retrieve(search: Search) -> Iterator[str]:
@@ -137,18 +237,12 @@ def retrieve(search: Search) -> Iterator[str]:
     language = code_to_language(search.filters.language)
     query = SearchQuery(query_str, search_type="raw", config=language)
     filter_query = _build_filter_query(search.filters)
-    language = code_to_language(search.filters.language)
+    # All matches are retrieved anyway, so they are ordered by the report ID (instead of
+    # the rank) that allows to resume the retrieval (see SearchFilters.report_id_after).
     results = (
         ReportSearchVector.objects.filter(filter_query)
         .filter(search_vector=query)
-        .annotate(
-            rank=SearchRank(
-                F("search_vector"),
-                query,
-            )
-        )
-        .select_related("report")
-        .order_by("-rank")
+        .order_by("report_id")
         .values_list("report__document_id", flat=True)
     )
 
@@ -157,7 +251,65 @@ def retrieve(search: Search) -> Iterator[str]:
 
 def filter(filter: SearchFilters) -> Iterator[str]:
     filter_query = _build_filter_query(filter)
-    results = ReportSearchVector.objects.filter(filter_query).values_list(
-        "report__document_id", flat=True
+    results = (
+        ReportSearchVector.objects.filter(filter_query)
+        .order_by("report_id")
+        .values_list("report__document_id", flat=True)
     )
     return results.iterator()
+
+
+# The queries are passed as arrays (instead of a VALUES list), so that the number of
+# query parameters does not grow with the number of queries. Each query is evaluated
+# with the language configuration of the report (that its search vector was built with).
+PERCOLATE_SQL = """
+SELECT queries.id, vector.report_id
+FROM unnest(%s::integer[], %s::text[]) AS queries (id, query)
+JOIN pgsearch_reportsearchvector vector ON vector.report_id = ANY(%s)
+JOIN reports_report report ON report.id = vector.report_id
+JOIN reports_language language ON language.id = report.language_id
+WHERE vector.search_vector @@ to_tsquery(pgsearch_language_config(language.code), queries.query)
+"""
+
+
+@lru_cache(maxsize=1024)
+def _is_valid_query_string(query_string: str) -> bool:
+    # The syntax of a tsquery does not depend on the text search configuration. The check
+    # runs in a savepoint, so that an invalid query does not abort the transaction.
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT to_tsquery('simple', %s)", [query_string])
+    except DatabaseError:
+        return False
+    return True
+
+
+def percolate(queries: dict[int, QueryNode], report_ids: list[int]) -> dict[int, set[int]]:
+    if not queries or not report_ids:
+        return {}
+
+    # Each query is compiled (and validated) on its own, so that a single invalid query
+    # is skipped instead of failing the matching of all subscriptions.
+    query_ids: list[int] = []
+    query_strings: list[str] = []
+    for query_id, query in queries.items():
+        try:
+            query_string = _build_query_string(query)
+        except ValueError as err:
+            logger.warning("Skipping query of subscription %d: %s", query_id, err)
+            continue
+        if not _is_valid_query_string(query_string):
+            logger.warning("Skipping invalid query of subscription %d: %s", query_id, query_string)
+            continue
+        query_ids.append(query_id)
+        query_strings.append(query_string)
+
+    if not query_ids:
+        return {}
+
+    matches: dict[int, set[int]] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(PERCOLATE_SQL, [query_ids, query_strings, report_ids])
+        for query_id, report_id in cursor.fetchall():
+            matches.setdefault(query_id, set()).add(report_id)
+    return matches
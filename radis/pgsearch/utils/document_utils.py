@@ -4,7 +4,6 @@ from radis.search.site import ReportDocument
 
 class AnnotatedReportSearchVector(ReportSearchVector):
     rank: float
-    summary: str
 
     class Meta:
         abstract = True
@@ -12,6 +11,7 @@ class AnnotatedReportSearchVector(ReportSearchVector):
 
 def document_from_pgsearch_response(
     record: AnnotatedReportSearchVector,
+    summary: str = "",
 ) -> ReportDocument:
     report = record.report
     return ReportDocument(
@@ -23,5 +23,5 @@ def document_from_pgsearch_response(
         patient_sex=report.patient_sex,
         study_description=report.study_description,
         modalities=report.modality_codes,
-        summary=record.summary,
+        summary=summary,
     )
@@ -1,3 +1,5 @@
+# Must be kept in sync with the pgsearch_language_config database function that is
+# used by the search vector trigger (see migration 0002).
 LANGUAGES = {
     "de": "german",
     "en": "english",
@@ -29,6 +29,7 @@ class SearchForm(forms.ModelForm):
             "age_from",
             "age_till",
             "send_finished_mail",
+            "use_llm_cache",
         ]
         help_texts = {
             "title": "Title of the RAG job",
@@ -79,6 +80,7 @@ class SearchForm(forms.ModelForm):
             ),
         )
         self.fields["send_finished_mail"].label = "Notify me via mail"
+        self.fields["use_llm_cache"].label = "Reuse cached LLM answers"
 
         self.helper = FormHelper()
         self.helper.form_tag = False
@@ -90,6 +92,7 @@ class SearchForm(forms.ModelForm):
                 Column(
                     "title",
                     "send_finished_mail",
+                    "use_llm_cache",
                     "provider",
                     "query",
                     Submit("next", "Next Step (Questions)", css_class="btn-primary"),
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rag", "0014_other_reports_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ragjob",
+            name="last_prepared_report_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rag", "0015_ragjob_last_prepared_report_id"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="questionresult",
+            name="current_answer",
+            field=models.CharField(
+                blank=True, choices=[("Y", "Yes"), ("N", "No")], max_length=1
+            ),
+        ),
+        migrations.AlterField(
+            model_name="questionresult",
+            name="original_answer",
+            field=models.CharField(
+                blank=True, choices=[("Y", "Yes"), ("N", "No")], max_length=1
+            ),
+        ),
+        migrations.AlterField(
+            model_name="questionresult",
+            name="result",
+            field=models.CharField(
+                blank=True, choices=[("A", "Accepted"), ("R", "Rejected")], max_length=1
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rag", "0017_ragjob_use_llm_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="raginstance",
+            name="token_count",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rag", "0018_raginstance_token_count"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ragtask",
+            index=models.Index(fields=["job", "status"], name="rag_ragtask_job_id_08cd43_idx"),
+        ),
+    ]
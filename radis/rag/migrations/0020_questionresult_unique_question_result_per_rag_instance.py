@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+# Only the latest result of a question per RAG instance is kept (there should not be any
+# duplicates as the results were always updated or created).
+DELETE_DUPLICATES_SQL = """
+DELETE FROM rag_questionresult r
+USING rag_questionresult newer
+WHERE r.rag_instance_id = newer.rag_instance_id
+AND r.question_id = newer.question_id
+AND r.id < newer.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rag", "0019_ragtask_job_status_index"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATES_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="questionresult",
+            constraint=models.UniqueConstraint(
+                fields=("rag_instance", "question"),
+                name="unique_question_result_per_rag_instance",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+# Aggregate the counts of the already evaluated results (a rejected result is "R")
+INIT_COUNTS_SQL = """
+UPDATE rag_question question
+SET rejected_count = counts.rejected, evaluated_count = counts.evaluated
+FROM (
+    SELECT question_id, COUNT(*) FILTER (WHERE result = 'R') AS rejected, COUNT(*) AS evaluated
+    FROM rag_questionresult
+    WHERE result <> ''
+    GROUP BY question_id
+) counts
+WHERE question.id = counts.question_id
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("rag", "0020_questionresult_unique_question_result_per_rag_instance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="rejected_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="evaluated_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(INIT_COUNTS_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rag", "0021_question_rejection_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ragjob",
+            name="preparation_heartbeat",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -4,11 +4,14 @@ from adit_radis_shared.common.models import AppSettings
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.db import models
+from django.db.models.constraints import UniqueConstraint
 from django.urls import reverse
 from procrastinate.contrib.django import app
 from procrastinate.contrib.django.models import ProcrastinateJob
 
 from radis.core.models import AnalysisJob, AnalysisTask
+from radis.core.utils.procrastinate_utils import defer_many
+from radis.core.utils.scheduling_utils import get_fair_share_priorities
 from radis.reports.models import Language, Modality, Report
 
 
@@ -71,6 +74,10 @@ class Question(models.Model):
     job = models.ForeignKey(RagJob, on_delete=models.CASCADE, related_name="questions")
     accepted_answer = models.CharField(max_length=1, choices=Answer.choices, default=Answer.YES)
     get_accepted_answer_display: Callable[[], str]
+    # How often the question rejected a report (of how many evaluated reports), see
+    # RejectionRates. Aggregated incrementally by the tasks of the job.
+    rejected_count = models.PositiveIntegerField(default=0)
+    evaluated_count = models.PositiveIntegerField(default=0)
 
     def __str__(self) -> str:
         return f'Question "{self.question}" [{self.pk}]'
@@ -85,14 +92,27 @@ class RagTask(AnalysisTask):
         return reverse("rag_task_detail", args=[self.pk])
 
     def delay(self) -> None:
-        queued_job_id = app.configure_task(
-            "radis.rag.tasks.process_rag_task",
-            allow_unknown=False,
-            priority=self.job.urgent_priority if self.job.urgent else self.job.default_priority,
-        ).defer(task_id=self.pk)
+        task_name = "radis.rag.tasks.process_rag_task"
+        (priority,) = get_fair_share_priorities(task_name, self.job, 1)
+        queued_job_id = app.configure_task(task_name, allow_unknown=False, priority=priority).defer(
+            task_id=self.pk
+        )
         self.queued_job_id = queued_job_id
         self.save()
 
+    @classmethod
+    def delay_many(cls, job: RagJob, tasks: list["RagTask"]) -> None:
+        """Defers many tasks of the same job with a constant number of queries."""
+        task_name = "radis.rag.tasks.process_rag_task"
+        queued_job_ids = defer_many(
+            task_name,
+            priorities=get_fair_share_priorities(task_name, job, len(tasks)),
+            task_kwargs=[{"task_id": task.pk} for task in tasks],
+        )
+        for task, queued_job_id in zip(tasks, queued_job_ids):
+            task.queued_job_id = queued_job_id
+        RagTask.objects.bulk_update(tasks, ["queued_job_id"])
+
 
 class RagInstance(models.Model):
     class Result(models.TextChoices):
@@ -100,6 +120,10 @@ class RagInstance(models.Model):
         REJECTED = "R", "Rejected"
 
     text = models.TextField()
+    # The number of tokens of the text as counted by the tokenizer of the LLM (None if the
+    # text was not tokenized as it is clearly within the token budget, see
+    # build_context_chunks)
+    token_count = models.PositiveIntegerField(null=True, blank=True)
     report_id: int
     report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name="rag_instances")
     other_reports = models.ManyToManyField(Report)
@@ -117,12 +141,25 @@ class RagInstance(models.Model):
 
 
 class QuestionResult(models.Model):
+    rag_instance_id: int
     rag_instance = models.ForeignKey(RagInstance, on_delete=models.CASCADE, related_name="results")
+    question_id: int
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="results")
-    original_answer = models.CharField(max_length=1, choices=Answer.choices)
-    current_answer = models.CharField(max_length=1, choices=Answer.choices)
+    # The answers and the result are empty if the question was not evaluated as the
+    # report was already rejected by another question (see evaluate_questions)
+    original_answer = models.CharField(max_length=1, choices=Answer.choices, blank=True)
+    current_answer = models.CharField(max_length=1, choices=Answer.choices, blank=True)
     get_current_answer_display: Callable[[], str]
-    result = models.CharField(max_length=1, choices=RagInstance.Result.choices)
+    result = models.CharField(max_length=1, choices=RagInstance.Result.choices, blank=True)
+    get_result_display: Callable[[], str]
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=["rag_instance", "question"],
+                name="unique_question_result_per_rag_instance",
+            )
+        ]
 
     def __str__(self) -> str:
         return f'Result of "{self.question}": {self.get_current_answer_display} [{self.pk}]'
@@ -1,64 +1,159 @@
 import asyncio
 import logging
-from asyncio import Semaphore
 
-from channels.db import database_sync_to_async
-from django import db
 from django.conf import settings
-from django.db.models import Prefetch
+from django.db.models import Count, F, Prefetch, Q
 
+from radis.chats.utils.adaptive_limiter import log_limiter_state
 from radis.chats.utils.chat_client import AsyncChatClient
+from radis.chats.utils.llm_governor import get_llm_governor
+from radis.chats.utils.llm_router import log_backend_stats
 from radis.core.processors import AnalysisTaskProcessor
+from radis.reports.models import Report
 
 from .models import Answer, Question, QuestionResult, RagInstance, RagTask
+from .utils.context_utils import build_context_chunks, combine_yes_no_answers
+from .utils.evaluation_utils import RejectionRates, evaluate_questions
+from .utils.result_utils import ResultBuffer
 
 logger = logging.getLogger(__name__)
 
 
 class RagTaskProcessor(AnalysisTaskProcessor):
-    def process_task(self, task: RagTask) -> None:
-        asyncio.run(self.process_task_async(task))
-
-    async def process_task_async(self, task: RagTask) -> None:
-        client = AsyncChatClient()
-        sem = Semaphore(settings.RAG_LLM_CONCURRENCY_LIMIT)
+    def __init__(self, task: RagTask) -> None:
+        super().__init__(task)
+        # The results are written in bulk (see ResultBuffer)
+        self.result_buffer = ResultBuffer(settings.RAG_RESULT_FLUSH_INTERVAL)
 
+    async def process_task(self, task: RagTask) -> None:
         task = await RagTask.objects.prefetch_related(
             "job__language",
         ).aget(pk=task.pk)
         language_code = task.job.language.code
+        questions = [question async for question in task.job.questions.order_by("pk")]
+        rates = RejectionRates(
+            {
+                question.pk: (question.rejected_count, question.evaluated_count)
+                for question in questions
+            }
+        )
+        # A task that is processed again (e.g. retried or reset) already contributed the
+        # counts of its earlier results to the counts of the questions
+        previous_counts = await self.get_rejection_counts(task)
 
-        await asyncio.gather(
-            *[
-                self.process_rag_instance(rag_instance, language_code, client, sem)
-                async for rag_instance in task.rag_instances.prefetch_related(
-                    Prefetch("report"), Prefetch("other_reports")
-                )
-            ]
+        try:
+            client = AsyncChatClient(
+                get_llm_governor("rag"), use_answer_cache=task.job.use_llm_cache, pooled=True
+            )
+            await asyncio.gather(
+                *[
+                    self.process_rag_instance(rag_instance, questions, language_code, client, rates)
+                    async for rag_instance in task.rag_instances.prefetch_related(
+                        Prefetch("report"),
+                        Prefetch(
+                            "other_reports", queryset=Report.objects.order_by("study_datetime")
+                        ),
+                    )
+                ]
+            )
+        finally:
+            # Also keep the results of the finished instances if the task failed
+            await self.result_buffer.flush()
+            await self.save_rejection_counts(task, previous_counts)
+        log_backend_stats()
+        log_limiter_state()
+
+    async def get_rejection_counts(self, task: RagTask) -> dict[int, tuple[int, int]]:
+        """Returns the rejected and evaluated results of the task per question."""
+        rows = (
+            QuestionResult.objects.filter(rag_instance__task=task)
+            .exclude(result="")
+            .values("question_id")
+            .annotate(
+                rejected=Count("pk", filter=Q(result=RagInstance.Result.REJECTED)),
+                evaluated=Count("pk"),
+            )
+            .order_by()
         )
-        await database_sync_to_async(db.close_old_connections)()
+        return {row["question_id"]: (row["rejected"], row["evaluated"]) async for row in rows}
+
+    async def save_rejection_counts(
+        self, task: RagTask, previous_counts: dict[int, tuple[int, int]]
+    ) -> None:
+        # The counts of the job are aggregated incrementally by the contribution of each
+        # task (instead of counting all the results of the job in each task). The results
+        # of the task replaced its previous ones, so only the difference is added.
+        counts = await self.get_rejection_counts(task)
+        for question_id in counts.keys() | previous_counts.keys():
+            rejected, evaluated = counts.get(question_id, (0, 0))
+            previous_rejected, previous_evaluated = previous_counts.get(question_id, (0, 0))
+            if (rejected, evaluated) == (previous_rejected, previous_evaluated):
+                continue
+            await Question.objects.filter(pk=question_id).aupdate(
+                rejected_count=F("rejected_count") + rejected - previous_rejected,
+                evaluated_count=F("evaluated_count") + evaluated - previous_evaluated,
+            )
 
     async def process_rag_instance(
-        self, rag_instance: RagInstance, language_code: str, client: AsyncChatClient, sem: Semaphore
+        self,
+        rag_instance: RagInstance,
+        questions: list[Question],
+        language_code: str,
+        client: AsyncChatClient,
+        rates: RejectionRates,
     ) -> None:
-        rag_instance.text = await self.get_text_to_analyze(rag_instance)
-        await rag_instance.asave()
+        texts = self.get_texts_to_analyze(rag_instance)
+        rag_instance.text = "\n\n".join(texts)
+        # Reports over the token budget are asked about chunk by chunk
+        chunks, rag_instance.token_count = await build_context_chunks(
+            texts, client.count_tokens, settings.RAG_CONTEXT_TOKEN_BUDGET
+        )
+        if len(chunks) > 1:
+            logger.debug(
+                "%s exceeds the token budget with %d tokens, split into %d chunks.",
+                rag_instance,
+                rag_instance.token_count,
+                len(chunks),
+            )
 
-        async with sem:
-            results = await asyncio.gather(
-                *[
-                    self.process_yes_or_no_question(rag_instance, language_code, question, client)
-                    async for question in rag_instance.task.job.questions.all()
-                ]
+        async def ask(questions: list[Question]) -> list[bool]:
+            if settings.RAG_ASK_QUESTIONS_AT_ONCE:
+                results = await self.process_yes_or_no_questions(
+                    rag_instance, chunks, questions, client
+                )
+            else:
+                results = await asyncio.gather(
+                    *[
+                        self.process_yes_or_no_question(
+                            rag_instance, chunks, language_code, question, client
+                        )
+                        for question in questions
+                    ]
+                )
+            return [result == RagInstance.Result.ACCEPTED for result in results]
+
+        accepted, not_evaluated = await evaluate_questions(
+            questions, ask, rates, settings.RAG_QUESTION_WAVE_SIZE
+        )
+
+        for question in not_evaluated:
+            self.result_buffer.add_result(
+                QuestionResult(
+                    rag_instance=rag_instance,
+                    question=question,
+                    original_answer="",
+                    current_answer="",
+                    result="",
+                )
             )
 
-        if all([result == RagInstance.Result.ACCEPTED for result in results]):
+        if accepted:
             overall_result = RagInstance.Result.ACCEPTED
         else:
             overall_result = RagInstance.Result.REJECTED
 
         rag_instance.overall_result = overall_result
-        await rag_instance.asave()
+        await self.result_buffer.add_instance(rag_instance)
 
         logger.info(
             "Overall RAG result for for report %s: %s",
@@ -66,26 +161,50 @@ class RagTaskProcessor(AnalysisTaskProcessor):
             rag_instance.get_overall_result_display(),
         )
 
-    async def get_text_to_analyze(self, rag_instance: RagInstance) -> str:
-        text_to_analyze = ""
-        text_to_analyze += rag_instance.report.body
-
-        async for report in rag_instance.other_reports.order_by("study_datetime").all():
-            if text_to_analyze:
-                text_to_analyze += "\n\n"
-            text_to_analyze += report.body
-
-        return text_to_analyze
+    def get_texts_to_analyze(self, rag_instance: RagInstance) -> list[str]:
+        # The other reports are prefetched (ordered by their study date)
+        return [rag_instance.report.body] + [
+            report.body for report in rag_instance.other_reports.all()
+        ]
 
     async def process_yes_or_no_question(
         self,
         rag_instance: RagInstance,
+        chunks: list[str],
         language: str,
         question: Question,
         client: AsyncChatClient,
     ) -> RagInstance.Result:
-        llm_answer = await client.ask_report_yes_no_question(rag_instance.text, question.question)
+        chunk_answers = await asyncio.gather(
+            *[client.ask_report_yes_no_question(chunk, question.question) for chunk in chunks]
+        )
+        llm_answer = combine_yes_no_answers(chunk_answers)
+        return self.save_question_result(rag_instance, question, llm_answer)
 
+    async def process_yes_or_no_questions(
+        self,
+        rag_instance: RagInstance,
+        chunks: list[str],
+        questions: list[Question],
+        client: AsyncChatClient,
+    ) -> list[RagInstance.Result]:
+        chunk_answers = await asyncio.gather(
+            *[
+                client.ask_report_yes_no_questions(
+                    chunk, [question.question for question in questions]
+                )
+                for chunk in chunks
+            ]
+        )
+        llm_answers = [combine_yes_no_answers(answers) for answers in zip(*chunk_answers)]
+        return [
+            self.save_question_result(rag_instance, question, llm_answer)
+            for question, llm_answer in zip(questions, llm_answers)
+        ]
+
+    def save_question_result(
+        self, rag_instance: RagInstance, question: Question, llm_answer: str
+    ) -> RagInstance.Result:
         if llm_answer == "yes":
             answer = Answer.YES
         elif llm_answer == "no":
@@ -99,14 +218,14 @@ class RagTaskProcessor(AnalysisTaskProcessor):
             else RagInstance.Result.REJECTED
         )
 
-        await QuestionResult.objects.aupdate_or_create(
-            rag_instance=rag_instance,
-            question=question,
-            defaults={
-                "original_answer": answer,
-                "current_answer": answer,
-                "result": result,
-            },
+        self.result_buffer.add_result(
+            QuestionResult(
+                rag_instance=rag_instance,
+                question=question,
+                original_answer=answer,
+                current_answer=answer,
+                result=result,
+            )
         )
 
         logger.debug("RAG result for question %s: %s", question, answer)
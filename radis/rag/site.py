@@ -10,7 +10,8 @@ class RetrievalProvider(NamedTuple):
     - name: The name of the retrieval provider.
     - count: A function that counts the number of results for a search.
     - retrieve: A function that retrieves the document IDs
-      for a search.
+      for a search. The document IDs must be ordered by the (internal) report ID,
+      so that an interrupted retrieval can be resumed with SearchFilters.report_id_after.
     - max_results: The maximum number of results that can be retrieved by this
       provider, or None if there is no limit.
     """
@@ -1,11 +1,13 @@
 import logging
-from itertools import batched
 
 from django.conf import settings
-from pebble import asynchronous
 from procrastinate.contrib.django import app
 
-from radis.reports.models import Report
+from radis.core.utils.preparation_utils import (
+    finish_preparation,
+    prepare_tasks,
+    retry_stalled_preparations,
+)
 from radis.search.site import Search, SearchFilters
 from radis.search.utils.query_parser import QueryParser
 
@@ -18,15 +20,10 @@ logger = logging.getLogger(__name__)
 
 @app.task(queue="llm")
 async def process_rag_task(task_id: int) -> None:
-    # We have to run RagTaskProcessor in a separate thread because it is
-    # creating an async loop itself.
-    @asynchronous.thread
-    def _process_tag_task(task_id: int) -> None:
-        task = RagTask.objects.get(id=task_id)
-        processor = RagTaskProcessor(task)
-        processor.start()
-
-    await _process_tag_task(task_id) # type: ignore
+    # Processed natively in the event loop of the worker, so that the LLM requests of
+    # multiple tasks can overlap.
+    task = await RagTask.objects.aget(id=task_id)
+    await RagTaskProcessor(task).start_async()
 
 
 @app.task
@@ -68,15 +65,36 @@ def process_rag_job(job_id: int) -> None:
 
     logger.debug("Searching reports for task with search: %s", search)
 
-    for document_ids in batched(retrieval_provider.retrieve(search), settings.RAG_TASK_BATCH_SIZE):
-        logger.debug("Creating RAG task for document IDs: %s", document_ids)
-        task = RagTask.objects.create(job=job, status=RagTask.Status.PENDING)
+    # Resume an interrupted preparation from its checkpoint
+    search.filters.report_id_after = job.last_prepared_report_id
+
+    if prepare_tasks(
+        job,
+        retrieval_provider.retrieve(search),
+        batch_size=settings.RAG_TASK_BATCH_SIZE,
+        chunk_size=settings.RAG_TASK_CREATION_CHUNK_SIZE,
+        create_tasks=_create_rag_tasks,
+    ):
+        finish_preparation(job)
 
-        for document_id in document_ids:
-            report = Report.objects.get(document_id=document_id)
-            RagInstance.objects.create(task=task, report_id=report.pk)
 
-        task.delay()
+def _create_rag_tasks(job: RagJob, batches: list[tuple[int, ...]]) -> None:
+    tasks = RagTask.objects.bulk_create(
+        [RagTask(job=job, status=RagTask.Status.PENDING) for _ in batches]
+    )
+    RagInstance.objects.bulk_create(
+        [
+            RagInstance(task=task, report_id=report_id)
+            for task, batch in zip(tasks, batches)
+            for report_id in batch
+        ]
+    )
+    RagTask.delay_many(job, tasks)
 
-    job.status = RagJob.Status.PENDING
-    job.save()
+
+@app.periodic(cron=settings.STALLED_PREPARATIONS_CRON)
+@app.task
+async def retry_stalled_rag_job_preparations(timestamp: int) -> None:
+    await retry_stalled_preparations(
+        RagJob, "radis.rag.tasks.process_rag_job", settings.STALLED_PREPARATIONS_TIMEOUT
+    )
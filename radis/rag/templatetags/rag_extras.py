@@ -32,9 +32,10 @@ def task_control_panel(context: dict[str, Any]) -> dict[str, Any]:
 
 
 @register.filter
-def result_badge_css_class(result: RagInstance.Result) -> str:
-    css_classes = {
+def result_badge_css_class(result: RagInstance.Result | str) -> str:
+    css_classes: dict[str, str] = {
         RagInstance.Result.ACCEPTED: "text-bg-success",
         RagInstance.Result.REJECTED: "text-bg-danger",
     }
-    return css_classes[result]
+    # An empty result is a not evaluated question
+    return css_classes.get(result, "text-bg-secondary")
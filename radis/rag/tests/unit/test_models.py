@@ -0,0 +1,61 @@
+import pytest
+from adit_radis_shared.accounts.factories import UserFactory
+from procrastinate.contrib.django.models import ProcrastinateJob
+
+from radis.core.models import TaskCounts, annotate_task_counts, get_annotated_task_counts
+from radis.core.utils.scheduling_utils import get_owner_queue_depths
+from radis.rag.factories import RagJobFactory, RagTaskFactory
+from radis.rag.models import RagJob, RagTask
+
+
+@pytest.mark.django_db
+def test_update_job_state_from_task_counts():
+    user = UserFactory()
+    job = RagJobFactory.create(status=RagJob.Status.IN_PROGRESS, owner_id=user.id)
+    RagTaskFactory.create(job=job, status=RagTask.Status.SUCCESS)
+    RagTaskFactory.create(job=job, status=RagTask.Status.SUCCESS)
+    task = RagTaskFactory.create(job=job, status=RagTask.Status.IN_PROGRESS)
+
+    assert job.get_task_counts() == TaskCounts(in_progress=1, success=2)
+    assert not job.update_job_state()
+    assert job.status == RagJob.Status.IN_PROGRESS
+
+    task.status = RagTask.Status.FAILURE
+    task.save()
+
+    assert job.update_job_state()
+    assert job.status == RagJob.Status.FAILURE
+
+    annotated_job = annotate_task_counts(RagJob.objects.filter(pk=job.pk)).get()
+    counts = get_annotated_task_counts(annotated_job)
+    assert counts == TaskCounts(success=2, failure=1)
+    assert counts.processed == counts.total == 3
+
+
+@pytest.mark.django_db
+def test_delay_many_interleaves_tasks_of_different_owners():
+    batch_job = RagJobFactory.create(owner_id=UserFactory().id)
+    batch_tasks = RagTaskFactory.create_batch(4, job=batch_job)
+    RagTask.delay_many(batch_job, batch_tasks)
+
+    small_job = RagJobFactory.create(owner_id=UserFactory().id)
+    small_tasks = RagTaskFactory.create_batch(2, job=small_job)
+    RagTask.delay_many(small_job, small_tasks)
+
+    urgent_job = RagJobFactory.create(owner_id=UserFactory().id, urgent=True)
+    urgent_task = RagTaskFactory.create(job=urgent_job)
+    urgent_task.delay()
+
+    queued_job_ids = list(
+        ProcrastinateJob.objects.order_by("-priority", "id").values_list("id", flat=True)
+    )
+    # The small job starts right after the head of the queue (and does not wait for all
+    # the tasks of the batch job), the urgent job is still processed first.
+    b1, b2, b3, b4 = batch_tasks
+    s1, s2 = small_tasks
+    tasks = [urgent_task, b1, b2, s1, b3, s2, b4]
+    assert queued_job_ids == [task.queued_job_id for task in tasks]
+
+    depths = {depth.owner: depth for depth in get_owner_queue_depths()}
+    assert depths[batch_job.owner.username].queued_tasks == 4
+    assert depths[small_job.owner.username].queued_tasks == 2
@@ -2,15 +2,21 @@ from unittest.mock import patch
 
 import pytest
 from django.db import close_old_connections
+from django.test import override_settings
 from pytest_mock import MockerFixture
 
+from radis.chats.utils.chat_client import AsyncChatClient
 from radis.chats.utils.testing_helpers import create_async_openai_client_mock
-from radis.rag.models import Answer, RagInstance
+from radis.rag.models import Answer, RagInstance, RagJob, RagTask
 from radis.rag.processors import RagTaskProcessor
 from radis.rag.utils.testing_helpers import create_rag_task
 
+# The reports are not tokenized by the LLM in the tests
+TOKEN_COUNT = 100
+
 
 @pytest.mark.django_db(transaction=True)
+@override_settings(RAG_ASK_QUESTIONS_AT_ONCE=False)
 def test_rag_task_processor(mocker: MockerFixture):
     num_rag_instances = 5
     num_questions = 5
@@ -25,6 +31,7 @@ def test_rag_task_processor(mocker: MockerFixture):
     process_rag_task_spy = mocker.spy(RagTaskProcessor, "process_task")
     process_rag_instance_spy = mocker.spy(RagTaskProcessor, "process_rag_instance")
     process_yes_or_no_question_spy = mocker.spy(RagTaskProcessor, "process_yes_or_no_question")
+    mocker.patch.object(AsyncChatClient, "count_tokens", return_value=TOKEN_COUNT)
 
     with patch("openai.AsyncOpenAI", return_value=openai_mock):
         RagTaskProcessor(rag_task).start()
@@ -43,3 +50,126 @@ def test_rag_task_processor(mocker: MockerFixture):
         assert openai_mock.chat.completions.create.call_count == num_rag_instances * num_questions
 
     close_old_connections()
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(RAG_ASK_QUESTIONS_AT_ONCE=True, RAG_QUESTION_WAVE_SIZE=None)
+def test_rag_task_processor_with_questions_at_once(mocker: MockerFixture):
+    num_rag_instances = 5
+    num_questions = 3
+    rag_task = create_rag_task(
+        language_code="en",
+        num_questions=num_questions,
+        accepted_answer="Y",
+        num_rag_instances=num_rag_instances,
+    )
+
+    openai_mock = create_async_openai_client_mock('{"1": "Yes", "2": "Yes", "3": "No"}')
+    create_mock = mocker.patch.object(
+        openai_mock.chat.completions, "create", wraps=openai_mock.chat.completions.create
+    )
+    process_yes_or_no_questions_spy = mocker.spy(RagTaskProcessor, "process_yes_or_no_questions")
+    mocker.patch.object(AsyncChatClient, "count_tokens", return_value=TOKEN_COUNT)
+
+    with patch("openai.AsyncOpenAI", return_value=openai_mock):
+        RagTaskProcessor(rag_task).start()
+
+        for instance in rag_task.rag_instances.all():
+            assert instance.overall_result == RagInstance.Result.REJECTED
+            question_results = instance.results.order_by("question_id")
+            assert [result.original_answer for result in question_results] == [
+                Answer.YES,
+                Answer.YES,
+                Answer.NO,
+            ]
+
+        assert process_yes_or_no_questions_spy.call_count == num_rag_instances
+        assert create_mock.call_count == num_rag_instances
+
+    close_old_connections()
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(RAG_ASK_QUESTIONS_AT_ONCE=False, RAG_QUESTION_WAVE_SIZE=2)
+def test_rag_task_processor_stops_at_first_rejection(mocker: MockerFixture):
+    num_rag_instances = 5
+    num_questions = 5
+    rag_task = create_rag_task(
+        language_code="en",
+        num_questions=num_questions,
+        accepted_answer="Y",
+        num_rag_instances=num_rag_instances,
+    )
+
+    openai_mock = create_async_openai_client_mock("No")
+    create_mock = mocker.patch.object(
+        openai_mock.chat.completions, "create", wraps=openai_mock.chat.completions.create
+    )
+    mocker.patch.object(AsyncChatClient, "count_tokens", return_value=TOKEN_COUNT)
+
+    with patch("openai.AsyncOpenAI", return_value=openai_mock):
+        RagTaskProcessor(rag_task).start()
+
+        for instance in rag_task.rag_instances.all():
+            assert instance.overall_result == RagInstance.Result.REJECTED
+            assert instance.results.filter(result=RagInstance.Result.REJECTED).count() == 2
+            assert instance.results.filter(result="", current_answer="").count() == 3
+
+        # Only the first wave of questions was asked
+        assert create_mock.call_count == num_rag_instances * 2
+
+        # The rejection counts of the questions are aggregated for the next tasks
+        questions = rag_task.job.questions.all()
+        assert sum(question.evaluated_count for question in questions) == num_rag_instances * 2
+        assert sum(question.rejected_count for question in questions) == num_rag_instances * 2
+
+    close_old_connections()
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(
+    RAG_ASK_QUESTIONS_AT_ONCE=True,
+    RAG_QUESTION_WAVE_SIZE=None,
+    # The reports are not clearly within such a small budget, so they are tokenized
+    RAG_CONTEXT_TOKEN_BUDGET=TOKEN_COUNT * 2,
+)
+def test_rag_task_processor_overwrites_results_when_reprocessed(mocker: MockerFixture):
+    num_rag_instances = 3
+    num_questions = 2
+    rag_task = create_rag_task(
+        language_code="en",
+        num_questions=num_questions,
+        accepted_answer="Y",
+        num_rag_instances=num_rag_instances,
+    )
+    count_tokens_mock = mocker.patch.object(
+        AsyncChatClient, "count_tokens", return_value=TOKEN_COUNT
+    )
+
+    for content, overall_result in [
+        ('{"1": "Yes", "2": "Yes"}', RagInstance.Result.ACCEPTED),
+        ('{"1": "Yes", "2": "No"}', RagInstance.Result.REJECTED),
+    ]:
+        type(rag_task).objects.filter(pk=rag_task.pk).update(status=RagTask.Status.PENDING)
+        type(rag_task.job).objects.filter(pk=rag_task.job.pk).update(status=RagJob.Status.PENDING)
+
+        with patch("openai.AsyncOpenAI", return_value=create_async_openai_client_mock(content)):
+            RagTaskProcessor(rag_task).start()
+
+        for instance in rag_task.rag_instances.all():
+            assert instance.overall_result == overall_result
+            assert instance.token_count == TOKEN_COUNT
+            # The results were upserted and not added again
+            assert instance.results.count() == num_questions
+
+    # The reports didn't fit into the token budget without being tokenized
+    assert count_tokens_mock.call_count == num_rag_instances * 2
+
+    # The rejection counts only contain the results of the last run
+    questions = rag_task.job.questions.all()
+    assert sum(question.evaluated_count for question in questions) == (
+        num_rag_instances * num_questions
+    )
+    assert sum(question.rejected_count for question in questions) == num_rag_instances
+
+    close_old_connections()
@@ -0,0 +1,48 @@
+import pytest
+
+from radis.rag.utils.context_utils import build_context_chunks, combine_yes_no_answers
+
+
+async def count_words(text: str) -> int:
+    return len(text.split())
+
+
+@pytest.mark.asyncio
+async def test_context_within_budget_is_not_chunked():
+    texts = ["one two three", "four five"]
+
+    chunks, token_count = await build_context_chunks(texts, count_words, 5)
+
+    assert chunks == ["one two three\n\nfour five"]
+    assert token_count == 5
+
+
+@pytest.mark.asyncio
+async def test_context_over_budget_is_chunked():
+    texts = ["a b c", "d e", "f g h i j k l m"]
+
+    chunks, token_count = await build_context_chunks(texts, count_words, 5)
+
+    assert token_count == 13
+    assert all(len(chunk.split()) <= 5 for chunk in chunks)
+    # Nothing got lost and the order of the reports is kept
+    assert " ".join(chunks).split() == list("abcdefghijklm")
+    assert chunks[0] == "a b c\n\nd e"
+
+
+@pytest.mark.asyncio
+async def test_context_clearly_within_budget_is_not_tokenized():
+    texts = ["one two three", "four five"]
+
+    async def count_tokens(text: str) -> int:
+        raise AssertionError("Must not be tokenized")
+
+    chunks, token_count = await build_context_chunks(texts, count_tokens, 1000)
+
+    assert chunks == ["one two three\n\nfour five"]
+    assert token_count is None
+
+
+def test_combine_yes_no_answers():
+    assert combine_yes_no_answers(["no", "yes", "no"]) == "yes"
+    assert combine_yes_no_answers(["no", "no"]) == "no"
@@ -0,0 +1,91 @@
+import math
+from typing import Awaitable, Callable, Literal, Sequence
+
+from radis.chats.utils.chat_client import estimate_tokens
+
+# The separator between the reports of a context
+SEPARATOR = "\n\n"
+
+# The texts are not tokenized at all if even this many times their estimated tokens fit
+# into the budget.
+ESTIMATE_MARGIN = 2
+
+
+async def build_context_chunks(
+    texts: Sequence[str],
+    count_tokens: Callable[[str], Awaitable[int]],
+    budget: int,
+) -> tuple[list[str], int | None]:
+    """Builds the contexts to pass to the LLM from the texts (e.g. of a report and its
+    other reports).
+
+    If all texts together fit into the token budget then there is a single context with
+    all of them. Otherwise the texts are packed in order into as few chunks as possible
+    that each fit the budget (a text that alone exceeds the budget is split at
+    whitespace). The questions must then be asked about each chunk and the answers
+    combined (see combine_yes_no_answers).
+
+    The texts are tokenized together with a single count_tokens call, and not at all if
+    they are clearly within the budget (see ESTIMATE_MARGIN).
+
+    Returns: The contexts and the total number of tokens of the texts (None if they were
+    not tokenized).
+    """
+    context = SEPARATOR.join(texts)
+    if estimate_tokens(context) * ESTIMATE_MARGIN <= budget:
+        return [context], None
+
+    total_tokens = await count_tokens(context)
+    if total_tokens <= budget:
+        return [context], total_tokens
+
+    # We only know the tokens of all texts together, so we assume that they are spread
+    # evenly over the texts.
+    token_counts = [math.ceil(total_tokens * len(text) / len(context)) for text in texts]
+
+    chunks: list[str] = []
+    parts: list[str] = []
+    chunk_tokens = 0
+    for text, tokens in zip(texts, token_counts):
+        for part, part_tokens in _split_text(text, tokens, budget):
+            if parts and chunk_tokens + part_tokens > budget:
+                chunks.append(SEPARATOR.join(parts))
+                parts = []
+                chunk_tokens = 0
+            parts.append(part)
+            chunk_tokens += part_tokens
+    if parts:
+        chunks.append(SEPARATOR.join(parts))
+
+    return chunks, total_tokens
+
+
+def _split_text(text: str, tokens: int, budget: int) -> list[tuple[str, int]]:
+    if tokens <= budget:
+        return [(text, tokens)]
+
+    # We only know the tokens of the whole text, so we assume that they are spread
+    # evenly over the text.
+    max_chars = max(1, len(text) * budget // tokens)
+    parts: list[tuple[str, int]] = []
+    start = 0
+    while start < len(text):
+        end = start + max_chars
+        if end < len(text):
+            split = max(text.rfind(" ", start, end), text.rfind("\n", start, end))
+            if split > start:
+                end = split
+        part = text[start:end].strip()
+        if part:
+            parts.append((part, math.ceil(tokens * len(part) / len(text))))
+        start = end
+    return parts
+
+
+def combine_yes_no_answers(answers: Sequence[Literal["yes", "no"]]) -> Literal["yes", "no"]:
+    """Combines the answers of a yes/no question about the chunks of a context.
+
+    The question is answered with yes if it is answered with yes for any of the chunks
+    (e.g. a finding that is only mentioned in one of the reports).
+    """
+    return "yes" if "yes" in answers else "no"
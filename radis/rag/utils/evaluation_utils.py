@@ -0,0 +1,69 @@
+from typing import Awaitable, Callable, Protocol, Sequence, TypeVar
+
+
+class _Question(Protocol):
+    pk: int
+
+
+QuestionT = TypeVar("QuestionT", bound=_Question)
+
+
+class RejectionRates:
+    """Observed rejection rates of the questions of a job.
+
+    The rates are smoothed, so that a question without (or with only a few) observations
+    has a rate of about 0.5.
+    """
+
+    def __init__(self, counts: dict[int, tuple[int, int]] | None = None) -> None:
+        # question ID -> (rejected, evaluated)
+        self._counts: dict[int, tuple[int, int]] = dict(counts or {})
+
+    def record(self, question_id: int, rejected: bool) -> None:
+        num_rejected, num_evaluated = self._counts.get(question_id, (0, 0))
+        self._counts[question_id] = (num_rejected + int(rejected), num_evaluated + 1)
+
+    def rate(self, question_id: int) -> float:
+        num_rejected, num_evaluated = self._counts.get(question_id, (0, 0))
+        return (num_rejected + 1) / (num_evaluated + 2)
+
+    def order(self, questions: Sequence[QuestionT]) -> list[QuestionT]:
+        """Orders the questions by their rejection rate (the most selective first)."""
+        return sorted(questions, key=lambda question: -self.rate(question.pk))
+
+
+async def evaluate_questions(
+    questions: Sequence[QuestionT],
+    ask: Callable[[list[QuestionT]], Awaitable[list[bool]]],
+    rates: RejectionRates,
+    wave_size: int | None,
+) -> tuple[bool, list[QuestionT]]:
+    """Evaluates the questions of a report until one of them rejects the report.
+
+    A report is only accepted if all questions accept it. So the questions are asked in
+    waves of wave_size questions (all at once if None), ordered by their observed
+    rejection rate, and no further waves are asked once a question rejected the report.
+    The passed ask function must return for each question if it accepted the report.
+
+    Returns: If the report was accepted by all questions and the questions that were
+        not evaluated.
+    """
+    if not questions:
+        return True, []
+
+    if wave_size is None or wave_size >= len(questions):
+        # No early exit possible, so we keep the order of the questions
+        waves = [list(questions)]
+    else:
+        ordered = rates.order(questions)
+        waves = [ordered[i : i + wave_size] for i in range(0, len(ordered), wave_size)]
+
+    for index, wave in enumerate(waves):
+        accepted = await ask(wave)
+        for question, question_accepted in zip(wave, accepted):
+            rates.record(question.pk, not question_accepted)
+
+        if not all(accepted):
+            return False, [question for later_wave in waves[index + 1 :] for question in later_wave]
+
+    return True, []
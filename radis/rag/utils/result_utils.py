@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+
+from channels.db import database_sync_to_async
+from django.db import transaction
+
+from ..models import QuestionResult, RagInstance
+
+logger = logging.getLogger(__name__)
+
+
+class ResultBuffer:
+    """Buffers the results of a RAG task in memory and writes them in bulk.
+
+    The question results are upserted with a single statement and the finished RAG
+    instances are updated with another one. The buffer is flushed when the flush interval
+    (in seconds) passed since the last flush (so the progress of a long running task
+    stays visible and a crash only loses the results of one interval) and must be flushed
+    at the end of the task. Each flush is written in a single transaction.
+    """
+
+    def __init__(self, flush_interval: float) -> None:
+        self.flush_interval = flush_interval
+        self._instances: dict[int, RagInstance] = {}
+        self._results: dict[tuple[int, int], QuestionResult] = {}
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def add_result(self, result: QuestionResult) -> None:
+        self._results[(result.rag_instance_id, result.question_id)] = result
+
+    async def add_instance(self, rag_instance: RagInstance) -> None:
+        """Adds a finished RAG instance (after all its question results were added)."""
+        self._instances[rag_instance.pk] = rag_instance
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            # Results added while we are writing go to the next flush
+            results = list(self._results.values())
+            instances = list(self._instances.values())
+            self._results.clear()
+            self._instances.clear()
+            self._last_flush = time.monotonic()
+
+            if results or instances:
+                await database_sync_to_async(self._write)(results, instances)
+
+            logger.debug(
+                "Flushed %d question results of %d RAG instances.", len(results), len(instances)
+            )
+
+    @staticmethod
+    @transaction.atomic
+    def _write(results: list[QuestionResult], instances: list[RagInstance]) -> None:
+        # An instance is never marked as finished without its results (and vice versa)
+        if results:
+            QuestionResult.objects.bulk_create(
+                results,
+                update_conflicts=True,
+                unique_fields=["rag_instance", "question"],
+                update_fields=["original_answer", "current_answer", "result"],
+            )
+        if instances:
+            RagInstance.objects.bulk_update(instances, ["text", "token_count", "overall_result"])
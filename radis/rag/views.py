@@ -41,7 +41,7 @@ from radis.rag.filters import RagJobFilter, RagResultFilter, RagTaskFilter
 from radis.rag.mixins import RagLockedMixin
 from radis.rag.tables import RagInstanceTable, RagJobTable, RagTaskTable
 from radis.reports.models import Language, Modality
-from radis.search.site import Search, SearchFilters
+from radis.search.site import CountStrategy, Search, SearchFilters
 from radis.search.utils.query_parser import QueryParser
 
 from .forms import QuestionFormSet, QuestionFormSetHelper, SearchForm
@@ -123,6 +123,10 @@ class RagJobWizardView(
                     patient_age_from=data["age_from"],
                     patient_age_till=data["age_till"],
                 ),
+                count_strategy=CountStrategy(
+                    relation=settings.RAG_RETRIEVAL_COUNT_RELATION,
+                    threshold=settings.RAG_RETRIEVAL_COUNT_THRESHOLD,
+                ),
             )
 
             retrieval_provider = retrieval_providers[data["provider"]]
@@ -278,6 +282,7 @@ class ChangeAnswerView(LoginRequiredMixin, HtmxOnlyMixin, View):
             raise SuspiciousOperation("You are not the owner of this task")
 
         with transaction.atomic():
+            # A not evaluated question gets evaluated by the user (starting with Yes)
             result.current_answer = Answer.NO if result.current_answer == Answer.YES else Answer.YES
             if result.current_answer == question.accepted_answer:
                 result.result = RagInstance.Result.ACCEPTED
@@ -285,6 +290,7 @@ class ChangeAnswerView(LoginRequiredMixin, HtmxOnlyMixin, View):
                 result.result = RagInstance.Result.REJECTED
             result.save()
 
+            # Not evaluated questions (with an empty result) don't accept the report
             all_results = list(rag_instance.results.values_list("result", flat=True))
             if all(result == RagInstance.Result.ACCEPTED for result in all_results):
                 rag_instance.overall_result = RagInstance.Result.ACCEPTED
@@ -4,7 +4,8 @@ from typing import Any
 from django.db import transaction
 from django.http import Http404
 from rest_framework import mixins, status, viewsets
-from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.decorators import action
+from rest_framework.exceptions import MethodNotAllowed, ValidationError
 from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request, clone_request
 from rest_framework.response import Response
@@ -17,6 +18,7 @@ from ..site import (
     reports_deleted_handlers,
     reports_updated_handlers,
 )
+from ..utils.bulk_import import BulkImportError, ReportBulkImporter
 from .serializers import ReportSerializer
 
 logger = logging.getLogger(__name__)
@@ -80,6 +82,37 @@ class ReportViewSet(
 
         transaction.on_commit(on_commit)
 
+    @action(detail=False, methods=["post"], url_path="bulk-import")
+    def bulk_import(self, request: Request) -> Response:
+        """Import (many) new reports streamed as NDJSON (one report per line).
+
+        Reports are imported in batches, each batch in its own transaction. Reports
+        with an already existing document ID are skipped (or updated with upsert).
+        """
+        upsert = request.GET.get("upsert", "").lower() in ["true", "1", "yes"]
+        stream = request.stream
+        if stream is None:
+            raise ValidationError("Empty request body.")
+
+        try:
+            result = ReportBulkImporter(upsert=upsert).import_lines(stream)
+        except BulkImportError as err:
+            # The reports of the batches before the failing one were imported nevertheless
+            return Response(
+                {
+                    "detail": str(err),
+                    "created": err.result.created,
+                    "updated": err.result.updated,
+                    "skipped": err.result.skipped,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {"created": result.created, "updated": result.updated, "skipped": result.skipped},
+            status=status.HTTP_201_CREATED,
+        )
+
     def update(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         # DRF itself does not support upsert.
         # Workaround adapted from https://gist.github.com/tomchristie/a2ace4577eff2c603b1b
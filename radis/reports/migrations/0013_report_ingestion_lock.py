@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Each statement that creates reports takes the ingestion lock (shared) before the
+# reports get their IDs and holds it until its transaction ends, see
+# get_committed_report_id in reports/utils/ingestion_utils.py (the lock ID must match
+# INGESTION_LOCK_ID there).
+CREATE_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION reports_lock_ingestion()
+RETURNS trigger
+AS $CODE$
+BEGIN
+    PERFORM pg_advisory_xact_lock_shared(4804167);
+    RETURN NULL;
+END
+$CODE$
+LANGUAGE plpgsql;
+
+CREATE TRIGGER reports_report_ingestion_lock
+BEFORE INSERT ON reports_report
+FOR EACH STATEMENT EXECUTE FUNCTION reports_lock_ingestion();
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER reports_report_ingestion_lock ON reports_report;
+DROP FUNCTION reports_lock_ingestion();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0012_report_accession_number_and_study_instance_uid"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGER_SQL, reverse_sql=DROP_TRIGGER_SQL),
+    ]
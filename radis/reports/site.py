@@ -1,5 +1,6 @@
 from typing import Any, Callable, NamedTuple
 
+from adit_radis_shared.accounts.models import User
 from django.http import HttpRequest
 
 from .models import Report
@@ -74,19 +75,31 @@ def register_document_fetcher(source: str, fetch: FetchDocument) -> None:
     document_fetchers[source] = DocumentFetcher(source, fetch)
 
 
+PrefetchPanelData = Callable[[list[Report], User], None]
+
+
 class ReportPanelButton(NamedTuple):
     order: int
     template_name: str
+    prefetch: PrefetchPanelData | None = None
 
 
 report_panel_buttons: list[ReportPanelButton] = []
 
 
-def register_report_panel_button(order: int, template_name: str) -> None:
-    """Register an additional button for the panel below each report."""
-    global report_panel_buttons
-    report_panel_buttons.append(ReportPanelButton(order, template_name))
-    report_panel_buttons = sorted(report_panel_buttons, key=lambda x: x.order)
+def register_report_panel_button(
+    order: int, template_name: str, prefetch: PrefetchPanelData | None = None
+) -> None:
+    """Register an additional button for the panel below each report.
+
+    The optional prefetch function is called with all reports of a page (and the
+    current user) and should store the data the button needs in the panel_data
+    dict of each report (see prefetch_report_panels), so that the button does not
+    have to query it for each report on its own.
+    """
+    report_panel_buttons.append(ReportPanelButton(order, template_name, prefetch))
+    # Sort in place, as the list is also imported by other modules
+    report_panel_buttons.sort(key=lambda x: x.order)
 
 
 def base_context_processor(request: HttpRequest) -> dict[str, Any]:
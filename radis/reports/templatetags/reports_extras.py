@@ -4,12 +4,17 @@ from adit_radis_shared.accounts.models import User
 from django.template import Library
 
 from ..models import Report
+from ..utils.panel_utils import get_panel_data
 
 register = Library()
 
 
 @register.simple_tag(takes_context=True)
 def can_view_report(context: dict[str, Any], report: Report) -> bool:
+    panel_data = get_panel_data(report)
+    if "viewable" in panel_data:
+        return panel_data["viewable"]
+
     user = cast(User, context["request"].user)
     active_group = user.active_group
     if not active_group:
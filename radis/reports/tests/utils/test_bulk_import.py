@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from adit_radis_shared.accounts.factories import GroupFactory
+
+from radis.reports.models import Report
+from radis.reports.utils.bulk_import import BulkImportError, ReportBulkImporter
+
+
+def create_line(document_id: str, group_id: int, **kwargs) -> str:
+    report = {
+        "document_id": document_id,
+        "language": "en",
+        "groups": [group_id],
+        "pacs_aet": "ORTHANC",
+        "pacs_name": "Orthanc",
+        "patient_id": "1234567890",
+        "patient_birth_date": "1970-01-01",
+        "patient_sex": "F",
+        "study_description": "CT Thorax",
+        "study_datetime": "2024-01-01T12:00:00Z",
+        "modalities": ["CT"],
+        "metadata": {"series": "1"},
+        "body": "No pneumothorax.",
+        **kwargs,
+    }
+    return json.dumps(report)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_import_creates_new_reports():
+    group = GroupFactory.create()
+
+    result = ReportBulkImporter().import_lines(
+        [create_line("1", group.pk), "", create_line("2", group.pk, modalities=["CT", "PT"])]
+    )
+
+    assert (result.created, result.updated, result.skipped) == (2, 0, 0)
+    report = Report.objects.get(document_id="2")
+    assert report.language.code == "en"
+    assert list(report.groups.all()) == [group]
+    assert sorted(report.modalities.values_list("code", flat=True)) == ["CT", "PT"]
+    assert dict(report.metadata.values_list("key", "value")) == {"series": "1"}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_import_upserts_existing_reports():
+    group = GroupFactory.create()
+    ReportBulkImporter().import_lines([create_line("1", group.pk)])
+    report_id = Report.objects.get(document_id="1").pk
+
+    result = ReportBulkImporter().import_lines([create_line("1", group.pk, body="Changed")])
+    assert (result.created, result.updated, result.skipped) == (0, 0, 1)
+    assert Report.objects.get(document_id="1").body == "No pneumothorax."
+
+    result = ReportBulkImporter(upsert=True).import_lines(
+        [create_line("1", group.pk, body="Changed", modalities=["MR"], metadata={})]
+    )
+    assert (result.created, result.updated, result.skipped) == (0, 1, 0)
+    report = Report.objects.get(document_id="1")
+    assert report.pk == report_id
+    assert report.body == "Changed"
+    assert list(report.modalities.values_list("code", flat=True)) == ["MR"]
+    assert not report.metadata.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_import_reports_the_line_of_a_malformed_report():
+    group = GroupFactory.create()
+
+    with pytest.raises(BulkImportError, match="^Line 2: "):
+        ReportBulkImporter().import_lines([create_line("1", group.pk), "{not json"])
+
+    with pytest.raises(BulkImportError, match="^Line 3: "):
+        ReportBulkImporter().import_lines([create_line("1", group.pk).encode(), b"", b"\xff\xfe"])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_import_commits_each_batch_atomically():
+    group = GroupFactory.create()
+    lines = [
+        create_line("1", group.pk),
+        create_line("2", group.pk),
+        create_line("3", group.pk),
+        create_line("4", group.pk, groups=[group.pk + 1000]),
+    ]
+
+    with pytest.raises(BulkImportError, match="Invalid group IDs") as exc_info:
+        ReportBulkImporter(batch_size=2).import_lines(lines)
+
+    # The first batch was committed, nothing of the failed second batch
+    assert exc_info.value.result.created == 2
+    assert sorted(Report.objects.values_list("document_id", flat=True)) == ["1", "2"]
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+from adit_radis_shared.accounts.models import User
+
+from radis.reports.factories import ReportFactory
+from radis.reports.models import Report
+from radis.reports.site import register_report_panel_button, report_panel_buttons
+from radis.reports.utils.panel_utils import get_panel_data, prefetch_report_panels
+
+
+@pytest.fixture
+def panel_buttons():
+    registered = list(report_panel_buttons)
+    report_panel_buttons.clear()
+    yield
+    report_panel_buttons[:] = registered
+
+
+def prefetch_language(reports: list[Report], user: User) -> None:
+    codes = dict(
+        Report.objects.filter(pk__in=[report.pk for report in reports]).values_list(
+            "pk", "language__code"
+        )
+    )
+    for report in reports:
+        get_panel_data(report)["language"] = codes[report.pk]
+
+
+def prefetch_document_id(reports: list[Report], user: User) -> None:
+    document_ids = dict(
+        Report.objects.filter(pk__in=[report.pk for report in reports]).values_list(
+            "pk", "document_id"
+        )
+    )
+    for report in reports:
+        get_panel_data(report)["document_id"] = document_ids[report.pk]
+
+
+@pytest.mark.django_db
+def test_prefetch_report_panels_of_all_buttons(panel_buttons, django_assert_num_queries):
+    register_report_panel_button(2, "language.html", prefetch_language)
+    register_report_panel_button(1, "document_id.html", prefetch_document_id)
+    reports = [ReportFactory.create() for _ in range(3)]
+    user = cast(User, SimpleNamespace(active_group=None))
+
+    # One query per button, regardless of the number of reports
+    with django_assert_num_queries(2):
+        prefetch_report_panels(reports, user)
+
+    assert [button.template_name for button in report_panel_buttons] == [
+        "document_id.html",
+        "language.html",
+    ]
+    for report in reports:
+        assert get_panel_data(report)["language"] == report.language.code
+        assert get_panel_data(report)["document_id"] == report.document_id
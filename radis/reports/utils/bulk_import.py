@@ -0,0 +1,320 @@
+import json
+import logging
+from dataclasses import dataclass
+from itertools import batched
+from typing import Any, Iterable, NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+
+from ..models import Language, Metadata, Modality, Report
+from ..site import reports_created_handlers, reports_updated_handlers
+
+logger = logging.getLogger(__name__)
+
+# The plain (non relational) report fields that are staged with COPY. The remaining
+# fields (id, created_at, updated_at, patient_age) are set by the database itself.
+REPORT_FIELDS = (
+    "document_id",
+    "pacs_aet",
+    "pacs_name",
+    "pacs_link",
+    "patient_id",
+    "patient_birth_date",
+    "patient_sex",
+    "study_description",
+    "study_datetime",
+    "study_instance_uid",
+    "accession_number",
+    "body",
+)
+
+RELATED_FIELDS = ("language", "groups", "modalities", "metadata")
+
+
+class StagedReport(NamedTuple):
+    values: dict[str, Any]
+    language: str
+    groups: list[int]
+    modalities: list[str]
+    metadata: dict[str, str]
+
+
+@dataclass
+class BulkImportResult:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    batches: int = 0
+
+
+class _ImportedBatch(NamedTuple):
+    created_ids: list[int]
+    updated_ids: list[int]
+
+
+class BulkImportError(Exception):
+    """Raised when a report could not be imported.
+
+    All batches before the failing one were already committed (see result).
+    """
+
+    def __init__(self, message: str, result: BulkImportResult | None = None) -> None:
+        super().__init__(message)
+        self.result = result or BulkImportResult()
+
+
+def parse_report(data: Any) -> StagedReport:
+    """Validates a single report in the format of the reports API.
+
+    Only runs the field validators of the Report model and does not touch the
+    database (in contrast to the ReportSerializer).
+    """
+    if not isinstance(data, dict):
+        raise ValidationError("Report must be a JSON object.")
+
+    unknown_keys = set(data.keys()) - set(REPORT_FIELDS) - set(RELATED_FIELDS)
+    if unknown_keys:
+        raise ValidationError("Got unknown fields: {}".format(unknown_keys))
+
+    values: dict[str, Any] = {}
+    for name in REPORT_FIELDS:
+        model_field = Report._meta.get_field(name)
+        assert isinstance(model_field, models.Field)
+        value = data.get(name, model_field.get_default())
+        try:
+            values[name] = model_field.clean(value, None)
+        except ValidationError as err:
+            raise ValidationError(f"{name}: {'; '.join(err.messages)}")
+
+    language = data.get("language")
+    if not isinstance(language, str) or not language:
+        raise ValidationError("Invalid language type.")
+
+    groups = data.get("groups", [])
+    if not isinstance(groups, list) or not all(isinstance(group, int) for group in groups):
+        raise ValidationError("Invalid groups type.")
+
+    modalities = data.get("modalities", [])
+    if not isinstance(modalities, list) or not all(isinstance(code, str) for code in modalities):
+        raise ValidationError("Invalid modalities type.")
+
+    metadata = data.get("metadata", {})
+    if not isinstance(metadata, dict):
+        raise ValidationError("Invalid metadata type.")
+
+    return StagedReport(
+        values=values,
+        language=language,
+        groups=list(dict.fromkeys(groups)),
+        modalities=list(dict.fromkeys(modalities)),
+        metadata={str(key): str(value) for key, value in metadata.items()},
+    )
+
+
+class ReportBulkImporter:
+    """Imports reports in batches with a constant number of queries per batch.
+
+    The reports are staged with PostgreSQL COPY into a temporary table and then
+    inserted in one statement. Reports with an already existing document ID are skipped,
+    or updated (with all their relations replaced) if upsert is enabled. Languages,
+    modalities and groups are resolved with cached lookups, and the relations are
+    inserted with bulk_create. The reports created (and updated) handlers are called
+    once per batch (after the batch was committed).
+    """
+
+    def __init__(self, batch_size: int | None = None, upsert: bool = False) -> None:
+        self.batch_size = batch_size or settings.REPORTS_BULK_IMPORT_BATCH_SIZE
+        self.upsert = upsert
+        self._language_ids: dict[str, int] = {}
+        self._modality_ids: dict[str, int] = {}
+        self._group_ids: set[int] = set()
+
+    def import_lines(self, lines: Iterable[str | bytes]) -> BulkImportResult:
+        """Imports reports from NDJSON lines (one report per line)."""
+
+        def parse_lines():
+            for line_number, line in enumerate(lines, start=1):
+                try:
+                    if isinstance(line, bytes):
+                        line = line.decode("utf-8")
+                    line = line.strip()
+                    if not line:
+                        continue
+                    yield parse_report(json.loads(line))
+                except (UnicodeDecodeError, json.JSONDecodeError, ValidationError) as err:
+                    message = err.messages if isinstance(err, ValidationError) else [str(err)]
+                    raise BulkImportError(f"Line {line_number}: {'; '.join(message)}")
+
+        return self.import_reports(parse_lines())
+
+    def import_reports(self, reports: Iterable[StagedReport]) -> BulkImportResult:
+        result = BulkImportResult()
+        try:
+            for batch in batched(reports, self.batch_size):
+                self._import_batch_atomic(batch, result)
+        except BulkImportError as err:
+            err.result = result
+            raise
+        return result
+
+    def _import_batch_atomic(
+        self, batch: tuple[StagedReport, ...], result: BulkImportResult
+    ) -> None:
+        try:
+            with transaction.atomic():
+                imported = self._import_batch(batch)
+                transaction.on_commit(lambda: self._notify(imported))
+        except Exception:
+            # Languages or modalities created in the failed batch were rolled back
+            self._language_ids.clear()
+            self._modality_ids.clear()
+            raise
+
+        result.batches += 1
+        result.created += len(imported.created_ids)
+        result.updated += len(imported.updated_ids)
+        result.skipped += len(batch) - len(imported.created_ids) - len(imported.updated_ids)
+        logger.debug(
+            "Bulk imported batch %d with %d new and %d updated reports",
+            result.batches,
+            len(imported.created_ids),
+            len(imported.updated_ids),
+        )
+
+    def _import_batch(self, batch: tuple[StagedReport, ...]) -> _ImportedBatch:
+        if self.upsert:
+            # A report can only be updated once per statement, so only the last one of the
+            # reports with the same document ID in the batch is imported.
+            batch = tuple({report.values["document_id"]: report for report in batch}.values())
+
+        language_ids = self._resolve_languages({report.language for report in batch})
+        modality_ids = self._resolve_modalities(
+            {code for report in batch for code in report.modalities}
+        )
+        self._check_groups({group for report in batch for group in report.groups})
+
+        rows = self._copy_reports(batch, language_ids)
+        if not rows:
+            return _ImportedBatch([], [])
+
+        inserted = {document_id: report_id for report_id, document_id, _ in rows}
+
+        group_through = Report.groups.through
+        modality_through = Report.modalities.through
+
+        # The relations of the updated reports are replaced
+        updated_ids = [report_id for report_id, _, created in rows if not created]
+        if updated_ids:
+            group_through.objects.filter(report_id__in=updated_ids).delete()
+            modality_through.objects.filter(report_id__in=updated_ids).delete()
+            Metadata.objects.filter(report_id__in=updated_ids).delete()
+
+        groups: list[Any] = []
+        modalities: list[Any] = []
+        metadata: list[Metadata] = []
+        for report in batch:
+            report_id = inserted.pop(report.values["document_id"], None)
+            if report_id is None:
+                # Already existed or a duplicate in the same batch
+                continue
+            groups += [group_through(report_id=report_id, group_id=g) for g in report.groups]
+            modalities += [
+                modality_through(report_id=report_id, modality_id=modality_ids[code])
+                for code in report.modalities
+            ]
+            metadata += [
+                Metadata(report_id=report_id, key=key, value=value)
+                for key, value in report.metadata.items()
+            ]
+
+        group_through.objects.bulk_create(groups)
+        modality_through.objects.bulk_create(modalities)
+        Metadata.objects.bulk_create(metadata)
+
+        created_ids = [report_id for report_id, _, created in rows if created]
+        return _ImportedBatch(created_ids, updated_ids)
+
+    def _copy_reports(
+        self, batch: tuple[StagedReport, ...], language_ids: dict[str, int]
+    ) -> list[tuple[int, str, bool]]:
+        qn = connection.ops.quote_name
+        table = qn(Report._meta.db_table)
+        staging = qn(f"{Report._meta.db_table}_staging")
+        columns = ", ".join(qn(name) for name in (*REPORT_FIELDS, "language_id"))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {staging} ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {table} WITH NO DATA"
+            )
+            with cursor.copy(f"COPY {staging} ({columns}) FROM STDIN") as copy:
+                for report in batch:
+                    copy.write_row(
+                        [report.values[name] for name in REPORT_FIELDS]
+                        + [language_ids[report.language]]
+                    )
+            if self.upsert:
+                assignments = ", ".join(
+                    f"{qn(name)} = EXCLUDED.{qn(name)}"
+                    for name in (*REPORT_FIELDS, "language_id")
+                    if name != "document_id"
+                )
+                on_conflict = f"DO UPDATE SET {assignments}, updated_at = now()"
+            else:
+                on_conflict = "DO NOTHING"
+            # A report that was inserted (and not updated) has no xmax
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}, created_at, updated_at) "
+                f"SELECT {columns}, now(), now() FROM {staging} "
+                f"ON CONFLICT (document_id) {on_conflict} "
+                "RETURNING id, document_id, xmax = 0"
+            )
+            return cursor.fetchall()
+
+    def _resolve_languages(self, codes: set[str]) -> dict[str, int]:
+        missing = codes - self._language_ids.keys()
+        if missing:
+            Language.objects.bulk_create(
+                [Language(code=code) for code in missing], ignore_conflicts=True
+            )
+            self._language_ids.update(
+                Language.objects.filter(code__in=missing).values_list("code", "id")
+            )
+        return self._language_ids
+
+    def _resolve_modalities(self, codes: set[str]) -> dict[str, int]:
+        missing = codes - self._modality_ids.keys()
+        if missing:
+            Modality.objects.bulk_create(
+                [Modality(code=code) for code in missing], ignore_conflicts=True
+            )
+            self._modality_ids.update(
+                Modality.objects.filter(code__in=missing).values_list("code", "id")
+            )
+        return self._modality_ids
+
+    def _check_groups(self, group_ids: set[int]) -> None:
+        missing = group_ids - self._group_ids
+        if missing:
+            self._group_ids.update(
+                Group.objects.filter(pk__in=missing).values_list("pk", flat=True)
+            )
+            missing -= self._group_ids
+            if missing:
+                raise BulkImportError(f"Invalid group IDs: {sorted(missing)}")
+
+    def _notify(self, imported: _ImportedBatch) -> None:
+        if imported.created_ids and reports_created_handlers:
+            reports = list(Report.objects.filter(pk__in=imported.created_ids))
+            for handler in reports_created_handlers:
+                logger.debug(f"{handler.name} - handle {len(reports)} bulk imported reports")
+                handler.handle(reports)
+
+        if imported.updated_ids and reports_updated_handlers:
+            reports = list(Report.objects.filter(pk__in=imported.updated_ids))
+            for handler in reports_updated_handlers:
+                logger.debug(f"{handler.name} - handle {len(reports)} bulk updated reports")
+                handler.handle(reports)
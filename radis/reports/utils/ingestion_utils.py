@@ -0,0 +1,27 @@
+from django.db import connection, transaction
+from django.db.models import Max
+
+from ..models import Report
+
+# The key of the advisory lock that each transaction creating reports holds (shared) from
+# before its reports get their IDs until it commits (see migration 0013).
+INGESTION_LOCK_ID = 0x494E47  # "ING"
+
+
+def get_last_report_id() -> int:
+    """Returns the ID of the last created report (0 if there is none)."""
+    return Report.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+
+
+def get_committed_report_id() -> int:
+    """Returns a report ID up to which all reports are committed.
+
+    The report IDs are the ingestion sequence of the reports (increasing monotonically),
+    but a report with a lower ID could still be committed after a report with a higher
+    one. So we wait until all transactions that are creating reports right now are
+    committed (while new ones have to wait) before we look for the last report ID. No
+    report up to the returned ID can show up later on.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [INGESTION_LOCK_ID])
+        return get_last_report_id()
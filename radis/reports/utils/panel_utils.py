@@ -0,0 +1,36 @@
+from typing import Any
+
+from adit_radis_shared.accounts.models import User
+
+from ..models import Report
+from ..site import report_panel_buttons
+
+
+def get_panel_data(report: Report) -> dict[str, Any]:
+    """Returns the prefetched data of the report panel (empty if not prefetched)."""
+    return getattr(report, "panel_data", {})
+
+
+def prefetch_report_panels(reports: list[Report], user: User) -> None:
+    """Prefetches the data of the report panels for all reports of a page.
+
+    Needs a constant number of queries (instead of several queries per report when the
+    template tags of the panel have to query the data themselves).
+    """
+    for report in reports:
+        report.panel_data = {}  # type: ignore
+
+    active_group = user.active_group
+    viewable_report_ids: set[int] = set()
+    if active_group and reports:
+        viewable_report_ids = set(
+            Report.groups.through.objects.filter(
+                report_id__in=[report.pk for report in reports], group_id=active_group.pk
+            ).values_list("report_id", flat=True)
+        )
+    for report in reports:
+        get_panel_data(report)["viewable"] = report.pk in viewable_report_ids
+
+    for button in report_panel_buttons:
+        if button.prefetch and reports:
+            button.prefetch(reports, user)
@@ -15,6 +15,17 @@ class SearchConfig(AppConfig):
 def register_app():
     from adit_radis_shared.common.site import MainMenuItem, register_main_menu_item
 
+    from radis.reports.site import (
+        ReportsCreatedHandler,
+        ReportsDeletedHandler,
+        ReportsUpdatedHandler,
+        register_reports_created_handler,
+        register_reports_deleted_handler,
+        register_reports_updated_handler,
+    )
+
+    from .utils.search_cache import invalidate_search_cache
+
     register_main_menu_item(
         MainMenuItem(
             url_name="search",
@@ -22,6 +33,16 @@ def register_app():
         )
     )
 
+    register_reports_created_handler(
+        ReportsCreatedHandler(name="Search cache", handle=invalidate_search_cache)
+    )
+    register_reports_updated_handler(
+        ReportsUpdatedHandler(name="Search cache", handle=invalidate_search_cache)
+    )
+    register_reports_deleted_handler(
+        ReportsDeletedHandler(name="Search cache", handle=invalidate_search_cache)
+    )
+
 
 def init_db(**kwargs):
     from .models import SearchAppSettings
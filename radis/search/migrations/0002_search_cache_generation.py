@@ -0,0 +1,19 @@
+from django.db import migrations
+
+# The generation of the search cache (see search/utils/search_cache.py). It is a sequence
+# in the database (and not a key of the cache itself), so that an invalidation reaches all
+# processes (even if each of them has a local memory cache).
+CREATE_SEQUENCE_SQL = "CREATE SEQUENCE search_cache_generation"
+
+DROP_SEQUENCE_SQL = "DROP SEQUENCE search_cache_generation"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("search", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEQUENCE_SQL, reverse_sql=DROP_SEQUENCE_SQL),
+    ]
@@ -22,10 +22,27 @@ class ReportDocument(NamedTuple):
         return Report.objects.get(document_id=self.document_id)
 
 
+class InvalidCursorError(ValueError):
+    """Raised by a search provider if the cursor of a search is malformed or invalid."""
+
+
 class SearchResult(NamedTuple):
+    """A class representing the result of a search.
+
+    Attributes:
+    - total_count: The total number of results found.
+    - total_relation: How the total count relates to the real number of results.
+    - documents: The documents of the requested page.
+    - next_cursor: An opaque cursor that can be passed to the next search to fetch
+        the page after this one, or None if the provider does not support cursors
+        or there are no more results (regardless of the total count, that may be
+        only a lower bound or an estimate).
+    """
+
     total_count: int
     total_relation: Literal["exact", "at_least", "approximately"]
     documents: list[ReportDocument]
+    next_cursor: str | None = None
 
 
 @dataclass
@@ -43,6 +60,10 @@ class SearchFilters:
         - patient_sex: Filter only reports that have the given sex
         - patient_age_from: Filter only reports where the patient is at least this age
         - patient_age_till: Filter only reports where the patient is at most this age
+        - report_id_after: Filter only reports with a greater (internal) report ID, used
+          to resume the retrieval of a job (see RetrievalProvider)
+        - report_id_till: Filter only reports with at most this (internal) report ID, used
+          to refresh only the new reports of a subscription (together with report_id_after)
     """
 
     group: int  # TODO: Rename to group_id
@@ -57,6 +78,40 @@ class SearchFilters:
     patient_id: str | None = None
     created_after: datetime | None = None
     created_before: datetime | None = None
+    report_id_after: int | None = None
+    report_id_till: int | None = None
+
+
+class CountStrategy(NamedTuple):
+    """How a search provider should determine the total count of a search.
+
+    Counting all matches of a broad query can be more expensive than fetching
+    the requested page itself, so each caller can choose its own trade-off.
+
+    Attributes:
+    - relation: "exact" counts all matches. "at_least" counts at most threshold
+        matches and returns an exact count below it and a lower bound above it.
+        "approximately" returns an estimate (e.g. the query planner estimate) and
+        only counts exactly when the estimate is below the threshold.
+    - threshold: The threshold for "at_least" and "approximately" (see above).
+    """
+
+    relation: Literal["exact", "at_least", "approximately"] = "exact"
+    threshold: int = 10_000
+
+
+class SummaryOptions(NamedTuple):
+    """How the summaries (highlighted excerpts) of the found documents are generated.
+
+    Attributes:
+    - min_words: The minimum number of words of each fragment.
+    - max_words: The maximum number of words of each fragment.
+    - max_fragments: The maximum number of fragments of a summary.
+    """
+
+    min_words: int = 10
+    max_words: int = 20
+    max_fragments: int = 10
 
 
 class Search(NamedTuple):
@@ -70,12 +125,23 @@ class Search(NamedTuple):
     - filters: The filters to apply to the search.
     - offset: The offset of the search results.
     - limit: The size limit of the search results.
+    - cursor: A cursor returned by a previous search (see SearchResult.next_cursor).
+        If set, the search continues right after the last document of that previous
+        search and the offset is ignored (keyset pagination). The provider raises an
+        InvalidCursorError if the cursor is malformed.
+    - count_strategy: How the total count should be determined (providers that
+        can't estimate counts may always count exactly).
+    - summary_options: How the summaries of the returned documents are generated,
+        or None if no summaries are needed (the summaries are empty then).
     """
 
     query: QueryNode
     filters: SearchFilters
     offset: int = 0
     limit: int | None = 10
+    cursor: str | None = None
+    count_strategy: CountStrategy = CountStrategy()
+    summary_options: SummaryOptions | None = SummaryOptions()
 
 
 class SearchProvider(NamedTuple):
@@ -86,11 +152,14 @@ class SearchProvider(NamedTuple):
     - search: The function that handles the search.
     - max_results: The maximum number of results that can be fetched by a search.
         Must be smaller than offset + limit when searching.
+    - supports_cursor: Whether the provider supports cursor (keyset) pagination. Results
+        beyond max_results can then still be fetched by using cursors.
     """
 
     name: str
     search: Callable[[Search], SearchResult]
     max_results: int
+    supports_cursor: bool = False
 
 
 search_providers: dict[str, SearchProvider] = {}
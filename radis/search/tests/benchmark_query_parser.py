@@ -0,0 +1,34 @@
+"""Micro-benchmark of the query parser.
+
+Run it with `python -m radis.search.tests.benchmark_query_parser`.
+"""
+
+import timeit
+
+from radis.search.utils.query_parser import QueryParser, _parse_cached
+
+QUERIES = [
+    "foobar",
+    "foo bar",
+    "foo AND bar OR baz",
+    'foo AND (bar OR NOT "baz qux") AND qux',
+    'foo AND (NOT "bar ( baz" (moo OR zoo) AND yoo)',
+    "Lungenembolie AND (Thrombus OR Embolus) NOT Verdacht",
+    '(foo bar NOT) AND OR "foo bar" baz" \\) $',
+]
+
+NUMBER = 200
+
+
+def main() -> None:
+    parser = QueryParser()
+
+    for query in QUERIES:
+        uncached = timeit.timeit(lambda: parser._parse(query), number=NUMBER) / NUMBER
+        _parse_cached.cache_clear()
+        cached = timeit.timeit(lambda: parser.parse(query), number=NUMBER) / NUMBER
+        print(f"{query!r:60} uncached: {uncached * 1e6:9.1f} µs   cached: {cached * 1e6:7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -138,3 +138,16 @@ def test_empty_queries():
     assert is_empty_query("( AND )", 2)
     assert is_empty_query("( AND OR )", 3)
     assert is_empty_query("AND OR )", 3)
+
+
+def test_cached_parse():
+    node1, fixes1 = QueryParser().parse("foo AND AND bar")
+    node2, fixes2 = QueryParser().parse("foo AND AND bar")
+
+    assert node1 is node2
+    assert fixes1 == fixes2 == ["Fixed invalid consecutive operators"]
+
+    # Modifying the returned fixes must not affect the cache
+    fixes1.append("Foo")
+    _, fixes3 = QueryParser().parse("foo AND AND bar")
+    assert fixes3 == ["Fixed invalid consecutive operators"]
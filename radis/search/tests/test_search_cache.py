@@ -0,0 +1,80 @@
+import time
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from pytest_mock import MockerFixture
+
+from radis.search.site import Search, SearchFilters, SearchResult
+from radis.search.utils.query_parser import QueryParser
+from radis.search.utils.search_cache import (
+    GENERATION_TTL,
+    cached_retrieve,
+    cached_search,
+    invalidate_search_cache,
+)
+
+SEARCH_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "search": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-search",
+    },
+}
+
+
+def create_search() -> Search:
+    query_node, _ = QueryParser().parse("pneumothorax")
+    assert query_node is not None
+    return Search(query=query_node, filters=SearchFilters(group=1))
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=SEARCH_CACHES)
+def test_cached_search_is_invalidated_when_reports_change(django_capture_on_commit_callbacks):
+    calls: list[Search] = []
+
+    def search(s: Search) -> SearchResult:
+        calls.append(s)
+        return SearchResult(total_count=len(calls), total_relation="exact", documents=[])
+
+    cached = cached_search("Test", search)
+    assert cached(create_search()).total_count == 1
+    assert cached(create_search()).total_count == 1
+
+    # The generation is only increased once the changes are committed
+    with django_capture_on_commit_callbacks(execute=True):
+        invalidate_search_cache([])
+        assert cached(create_search()).total_count == 1
+
+    assert cached(create_search()).total_count == 2
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=SEARCH_CACHES)
+def test_cached_retrieve_is_invalidated_by_another_process(mocker: MockerFixture):
+    document_ids = ["1", "2"]
+
+    def retrieve(s: Search) -> list[str]:
+        return list(document_ids)
+
+    now = time.monotonic()
+    monotonic_mock = mocker.patch(
+        "radis.search.utils.search_cache.time.monotonic", return_value=now
+    )
+
+    cached = cached_retrieve("Test", retrieve)
+    assert list(cached(create_search())) == ["1", "2"]
+
+    document_ids.append("3")
+    assert list(cached(create_search())) == ["1", "2"]
+
+    # Another process (e.g. a worker importing reports) invalidates the cache with its
+    # own local cache, but increases the same generation.
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval('search_cache_generation')")
+
+    # The generation is only read again from the database once it expired
+    assert list(cached(create_search())) == ["1", "2"]
+    monotonic_mock.return_value = now + GENERATION_TTL
+    assert list(cached(create_search())) == ["1", "2", "3"]
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from typing import Callable, Literal, cast
 
 import pyparsing as pp
@@ -54,6 +55,112 @@ class BinaryNode:
 QueryNode = TermNode | ParensNode | UnaryNode | BinaryNode
 
 
+# Packrat parsing memoizes the (right-recursive) grammar rules, which otherwise would be
+# re-evaluated for each alternative.
+pp.ParserElement.enable_packrat()
+
+VALID_TERM_CHARS = pp.alphanums + pp.alphas8bit + "_-'"
+VALID_UNQUOTED_CHARS = frozenset(VALID_TERM_CHARS + "() ")
+
+QUOTED_SEGMENT_PATTERN = re.compile(r'(".*?(?<!\\)")')
+CONSECUTIVE_OPERATORS_PATTERN = re.compile(
+    r"((?:NOT|AND|OR)\b\s*)(?:(?:NOT|AND|OR)\b\s*)*(?:(?:AND|OR)\b\s*)+((?:NOT\b)*)"
+)
+BINARY_OPERATORS_AT_START_OF_LINE_PATTERN = re.compile(r"^(\s*(AND|OR))+\s*")
+OPERATORS_AT_END_OF_LINE_PATTERN = re.compile(r"(\s*(NOT|AND|OR))+\s*$")
+BINARY_OPERATORS_AT_START_OF_PARENS_PATTERN = re.compile(r"\((\s*(AND|OR))+\s*")
+OPERATORS_AT_END_OF_PARENS_PATTERN = re.compile(r"(\s*(NOT|AND|OR))+\s*\)")
+EMPTY_PARENS_PATTERN = re.compile(r"\(\s*\)")
+SPACES_AT_START_OF_PARENS_PATTERN = re.compile(r"\(\s*")
+SPACES_AT_END_OF_PARENS_PATTERN = re.compile(r"\s*\)")
+SPACES_PATTERN = re.compile(r"\s+")
+
+PARSE_CACHE_SIZE = 1024
+
+
+def _build_grammar() -> pp.ParserElement:
+    not_ = pp.Keyword("NOT")
+    and_ = pp.Keyword("AND")
+    or_ = pp.Keyword("OR")
+    lparen = pp.Literal("(")
+    rparen = pp.Literal(")")
+
+    word = ~(not_ | and_ | or_) + pp.Word(VALID_TERM_CHARS).set_parse_action(
+        lambda t: TermNode("WORD", t[0])  # type: ignore
+    )
+    phrase = pp.QuotedString(quoteChar='"', esc_char="\\").set_parse_action(
+        lambda t: TermNode("PHRASE", t[0])  # type: ignore
+    )
+    term = phrase | word
+
+    or_expression = pp.Forward()
+
+    parens_expression = pp.Forward()
+    parens_expression <<= (
+        pp.Suppress(lparen) + or_expression + pp.Suppress(rparen)
+    ).set_parse_action(lambda t: ParensNode(t[0])) | term  # type: ignore
+
+    not_expression = pp.Forward()
+    not_expression <<= (not_ + not_expression).set_parse_action(
+        lambda t: UnaryNode("NOT", t[1])  # type: ignore
+    ) | parens_expression
+
+    and_expression = pp.Forward()
+    and_expression <<= (
+        (not_expression + and_ + and_expression).set_parse_action(
+            lambda t: BinaryNode("AND", t[0], t[2])  # type: ignore
+        )
+        | (not_expression + and_expression).set_parse_action(
+            lambda t: BinaryNode("AND", t[0], t[1], implicit=True)  # type: ignore
+        )
+        | not_expression
+    )
+
+    or_expression <<= (and_expression + or_ + or_expression).set_parse_action(
+        lambda t: BinaryNode("OR", t[0], t[2])  # type: ignore
+    ) | and_expression
+
+    return or_expression
+
+
+# The grammar is only built once as it is quite expensive to do so
+GRAMMAR = _build_grammar()
+
+
+class Segments:
+    """A query split into its unquoted and quoted segments.
+
+    The segments alternate, starting and ending with an (maybe empty) unquoted
+    segment. Only the unquoted segments are modified by the cleanup steps.
+    """
+
+    def __init__(self, query: str) -> None:
+        self.parts = QUOTED_SEGMENT_PATTERN.split(query)
+
+    def __str__(self) -> str:
+        return "".join(self.parts)
+
+    def modify_unquoted(self, handler: Callable[[str], str]) -> bool:
+        changed = False
+        for i in range(0, len(self.parts), 2):
+            part = self.parts[i]
+            modified = handler(part)
+            if modified != part:
+                self.parts[i] = modified
+                changed = True
+        return changed
+
+    def modify_first(self, handler: Callable[[str], str]) -> bool:
+        part = self.parts[0]
+        self.parts[0] = handler(part)
+        return self.parts[0] != part
+
+    def modify_last(self, handler: Callable[[str], str]) -> bool:
+        part = self.parts[-1]
+        self.parts[-1] = handler(part)
+        return self.parts[-1] != part
+
+
 class QueryParser:
     def __init__(self):
         pass
@@ -108,116 +215,59 @@ class QueryParser:
 
         return "".join(result)
 
-    def _modify_unquoted_segments(
-        self, input_string: str, unquoted_segment_handler: Callable[[str], str]
-    ) -> str:
-        pattern = re.compile(r'(".*?(?<!\\)")')
-        parts = pattern.split(input_string)
-
-        results: list[str] = []
-        for part in parts:
-            if part.startswith('"'):
-                assert part.endswith('"')
-                results.append(part)
-            else:
-                results.append(unquoted_segment_handler(part))
-
-        return "".join(results)
+    def _clean_segments(self, query: str, fixes: list[str]) -> str:
+        segments = Segments(query)
 
-    def _replace_invalid_characters(self, input_string: str) -> str:
-        valid_chars = pp.alphanums + pp.alphas8bit + "_-'() "
-
-        def handle_segment(segment: str) -> str:
-            return "".join(char for char in segment if char in valid_chars)
-
-        return self._modify_unquoted_segments(input_string, handle_segment)
-
-    def _clean_consecutive_operators(self, input_string) -> str:
-        pattern = r"((?:NOT|AND|OR)\b\s*)(?:(?:NOT|AND|OR)\b\s*)*(?:(?:AND|OR)\b\s*)+((?:NOT\b)*)"
-        return self._modify_unquoted_segments(input_string, lambda s: re.sub(pattern, r"\1\2", s))
-
-    def _clean_binary_operators_at_start_of_line(self, input_string: str) -> str:
-        pattern = r"^(\s*(AND|OR))+\s*"
-        cleaned_string = re.sub(pattern, r"", input_string)
-        return cleaned_string
+        if segments.modify_unquoted(
+            lambda s: "".join(char for char in s if char in VALID_UNQUOTED_CHARS)
+        ):
+            fixes.append("Fixed invalid characters")
+            # Removing invalid characters (like backslashes or line breaks) may change
+            # how the query is split into quoted and unquoted segments.
+            segments = Segments(str(segments))
 
-    def _clean_operators_at_end_of_line(self, input_string: str) -> str:
-        pattern = r"(\s*(NOT|AND|OR))+\s*$"
-        cleaned_string = re.sub(pattern, r"", input_string)
-        return cleaned_string
+        if segments.modify_unquoted(lambda s: CONSECUTIVE_OPERATORS_PATTERN.sub(r"\1\2", s)):
+            fixes.append("Fixed invalid consecutive operators")
 
-    def _clean_binary_operators_at_start_of_parens(self, input_string: str) -> str:
-        pattern = r"\((\s*(AND|OR))+\s*"
-        return self._modify_unquoted_segments(input_string, lambda s: re.sub(pattern, r"(", s))
+        if segments.modify_first(lambda s: BINARY_OPERATORS_AT_START_OF_LINE_PATTERN.sub("", s)):
+            fixes.append("Fixed invalid operators at start of line")
 
-    def _clean_operators_at_end_of_parens(self, input_string: str) -> str:
-        pattern = r"(\s*(NOT|AND|OR))+\s*\)"
-        return self._modify_unquoted_segments(input_string, lambda s: re.sub(pattern, r")", s))
+        if segments.modify_last(lambda s: OPERATORS_AT_END_OF_LINE_PATTERN.sub("", s)):
+            fixes.append("Fixed invalid operators at end of line")
 
-    def _clean_empty_parens(self, input_string: str) -> str:
-        pattern = r"\(\s*\)"
-        return self._modify_unquoted_segments(input_string, lambda s: re.sub(pattern, r"", s))
+        if segments.modify_unquoted(
+            lambda s: BINARY_OPERATORS_AT_START_OF_PARENS_PATTERN.sub("(", s)
+        ):
+            fixes.append("Fixed invalid operators at start of parentheses")
 
-    def _strip_trailing_spaces(self, input_string: str) -> str:
-        cleaned_string = input_string.strip()
-        return cleaned_string
+        if segments.modify_unquoted(lambda s: OPERATORS_AT_END_OF_PARENS_PATTERN.sub(")", s)):
+            fixes.append("Fixed invalid operators at end of parentheses")
 
-    def _delete_spaces_at_start_of_parens(self, input_string: str):
-        return self._modify_unquoted_segments(input_string, lambda s: re.sub(r"\(\s*", "(", s))
+        if segments.modify_unquoted(lambda s: EMPTY_PARENS_PATTERN.sub("", s)):
+            fixes.append("Fixed empty parentheses")
 
-    def _delete_spaces_at_end_of_parens(self, input_string: str) -> str:
-        return self._modify_unquoted_segments(input_string, lambda s: re.sub(r"\s*\)", ")", s))
+        # Normalizations that are not reported as fixes
+        segments.modify_first(lambda s: s.lstrip())
+        segments.modify_last(lambda s: s.rstrip())
+        segments.modify_unquoted(lambda s: SPACES_AT_START_OF_PARENS_PATTERN.sub("(", s))
+        segments.modify_unquoted(lambda s: SPACES_AT_END_OF_PARENS_PATTERN.sub(")", s))
+        segments.modify_unquoted(lambda s: SPACES_PATTERN.sub(" ", s))
 
-    def _reduce_spaces(self, input_string: str) -> str:
-        return self._modify_unquoted_segments(input_string, lambda s: re.sub(r"\s+", " ", s))
+        return str(segments)
 
     def _parse_string(self, input_string: str) -> QueryNode:
-        not_ = pp.Keyword("NOT")
-        and_ = pp.Keyword("AND")
-        or_ = pp.Keyword("OR")
-        lparen = pp.Literal("(")
-        rparen = pp.Literal(")")
-
-        word = ~(not_ | and_ | or_) + pp.Word(
-            pp.alphanums + pp.alphas8bit + "_-'"
-        ).set_parse_action(
-            lambda t: TermNode("WORD", t[0])  # type: ignore
-        )
-        phrase = pp.QuotedString(quoteChar='"', esc_char="\\").set_parse_action(
-            lambda t: TermNode("PHRASE", t[0])  # type: ignore
-        )
-        term = phrase | word
-
-        or_expression = pp.Forward()
-
-        parens_expression = pp.Forward()
-        parens_expression <<= (
-            pp.Suppress(lparen) + or_expression + pp.Suppress(rparen)
-        ).set_parse_action(lambda t: ParensNode(t[0])) | term  # type: ignore
-
-        not_expression = pp.Forward()
-        not_expression <<= (not_ + not_expression).set_parse_action(
-            lambda t: UnaryNode("NOT", t[1])  # type: ignore
-        ) | parens_expression
-
-        and_expression = pp.Forward()
-        and_expression <<= (
-            (not_expression + and_ + and_expression).set_parse_action(
-                lambda t: BinaryNode("AND", t[0], t[2])  # type: ignore
-            )
-            | (not_expression + and_expression).set_parse_action(
-                lambda t: BinaryNode("AND", t[0], t[1], implicit=True)  # type: ignore
-            )
-            | not_expression
-        )
+        return cast(QueryNode, GRAMMAR.parse_string(input_string, parse_all=True)[0])
 
-        or_expression <<= (and_expression + or_ + or_expression).set_parse_action(
-            lambda t: BinaryNode("OR", t[0], t[2])  # type: ignore
-        ) | and_expression
+    def parse(self, query: str) -> tuple[QueryNode | None, list[str]]:
+        """Parses (and fixes if necessary) a query.
 
-        return cast(QueryNode, or_expression.parse_string(input_string, parse_all=True)[0])
+        The parsed queries are cached, so the returned query nodes are shared
+        and must not be modified.
+        """
+        node, fixes = _parse_cached(query)
+        return node, list(fixes)
 
-    def parse(self, query: str) -> tuple[QueryNode | None, list[str]]:
+    def _parse(self, query: str) -> tuple[QueryNode | None, list[str]]:
         fixes: list[str] = []
 
         query_before = query
@@ -230,45 +280,7 @@ class QueryParser:
         if query_before != query_after:
             fixes.append("Fixed unbalanced parentheses")
 
-        query_before = query_after
-        query_after = self._replace_invalid_characters(query_before)
-        if query_before != query_after:
-            fixes.append("Fixed invalid characters")
-
-        query_before = query_after
-        query_after = self._clean_consecutive_operators(query_before)
-        if query_before != query_after:
-            fixes.append("Fixed invalid consecutive operators")
-
-        query_before = query_after
-        query_after = self._clean_binary_operators_at_start_of_line(query_before)
-        if query_before != query_after:
-            fixes.append("Fixed invalid operators at start of line")
-
-        query_before = query_after
-        query_after = self._clean_operators_at_end_of_line(query_before)
-        if query_before != query_after:
-            fixes.append("Fixed invalid operators at end of line")
-
-        query_before = query_after
-        query_after = self._clean_binary_operators_at_start_of_parens(query_before)
-        if query_before != query_after:
-            fixes.append("Fixed invalid operators at start of parentheses")
-
-        query_before = query_after
-        query_after = self._clean_operators_at_end_of_parens(query_before)
-        if query_before != query_after:
-            fixes.append("Fixed invalid operators at end of parentheses")
-
-        query_before = query_after
-        query_after = self._clean_empty_parens(query_before)
-        if query_before != query_after:
-            fixes.append("Fixed empty parentheses")
-
-        query_after = self._strip_trailing_spaces(query_after)
-        query_after = self._delete_spaces_at_start_of_parens(query_after)
-        query_after = self._delete_spaces_at_end_of_parens(query_after)
-        query_after = self._reduce_spaces(query_after)
+        query_after = self._clean_segments(query_after, fixes)
 
         if query_after == "":
             return None, fixes
@@ -298,3 +310,9 @@ class QueryParser:
             )
         else:
             raise ValueError(f"Unknown node type: {type(node)}")
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(query: str) -> tuple[QueryNode | None, tuple[str, ...]]:
+    node, fixes = QueryParser()._parse(query)
+    return node, tuple(fixes)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import time
+from dataclasses import asdict
+from typing import Callable, Iterable, Iterator
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from radis.reports.models import Report
+
+from ..site import Search, SearchResult
+from .query_parser import QueryParser
+
+logger = logging.getLogger(__name__)
+
+# How long (in seconds) a process uses the generation it read last, before it reads it
+# from the database again. So the entries cached by a process are invalidated by other
+# processes only after that time (but by the process itself at once).
+GENERATION_TTL = 2.0
+
+# The generation read last and when it expires
+_generation: tuple[int, float] | None = None
+
+
+def _get_cache():
+    return caches[settings.SEARCH_CACHE_ALIAS]
+
+
+def _set_generation(generation: int) -> None:
+    global _generation
+    _generation = (generation, time.monotonic() + GENERATION_TTL)
+
+
+def _get_generation() -> int:
+    # The generation is shared by all processes (see migration 0002), so that the entries
+    # cached by any process are invalidated (after at most GENERATION_TTL).
+    cached = _generation
+    if cached is not None and time.monotonic() < cached[1]:
+        return cached[0]
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT last_value FROM search_cache_generation")
+        row = cursor.fetchone()
+        assert row is not None
+        _set_generation(row[0])
+        return row[0]
+
+
+def _bump_generation() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval('search_cache_generation')")
+        row = cursor.fetchone()
+        assert row is not None
+        _set_generation(row[0])
+
+
+def _build_cache_key(kind: str, provider_name: str, search: Search) -> str:
+    filters = asdict(search.filters)
+    filters["modalities"] = sorted(filters["modalities"])
+    normalized = json.dumps(
+        {
+            "query": QueryParser.unparse(search.query),
+            "filters": filters,
+            "offset": search.offset,
+            "limit": search.limit,
+            "cursor": search.cursor,
+            "count_strategy": search.count_strategy,
+            "summary_options": search.summary_options,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha256(normalized.encode()).hexdigest()
+    return f"search:{_get_generation()}:{kind}:{provider_name}:{digest}"
+
+
+def cached_search(
+    provider_name: str, search: Callable[[Search], SearchResult]
+) -> Callable[[Search], SearchResult]:
+    """Puts the search cache in front of the search function of a search provider."""
+
+    def _search(s: Search) -> SearchResult:
+        key = _build_cache_key("search", provider_name, s)
+        result = _get_cache().get(key)
+        if result is None:
+            result = search(s)
+            _get_cache().set(key, result)
+        return result
+
+    return _search
+
+
+def cached_count(provider_name: str, count: Callable[[Search], int]) -> Callable[[Search], int]:
+    """Puts the search cache in front of the count function of a retrieval provider."""
+
+    def _count(s: Search) -> int:
+        key = _build_cache_key("count", provider_name, s)
+        total_count = _get_cache().get(key)
+        if total_count is None:
+            total_count = count(s)
+            _get_cache().set(key, total_count)
+        return total_count
+
+    return _count
+
+
+def cached_retrieve(
+    provider_name: str, retrieve: Callable[[Search], Iterable[str]]
+) -> Callable[[Search], Iterable[str]]:
+    """Puts the search cache in front of the retrieve function of a retrieval provider.
+
+    The retrieved document IDs are only cached if there are not more than
+    SEARCH_CACHE_MAX_RETRIEVE_SIZE of them (they are still streamed otherwise).
+    """
+
+    def _retrieve(s: Search) -> Iterator[str]:
+        key = _build_cache_key("retrieve", provider_name, s)
+        document_ids: list[str] | None = _get_cache().get(key)
+        if document_ids is not None:
+            yield from document_ids
+            return
+
+        collected: list[str] | None = []
+        for document_id in retrieve(s):
+            if collected is not None:
+                collected.append(document_id)
+                if len(collected) > settings.SEARCH_CACHE_MAX_RETRIEVE_SIZE:
+                    collected = None
+            yield document_id
+
+        if collected is not None:
+            _get_cache().set(key, collected)
+
+    return _retrieve
+
+
+def invalidate_search_cache(reports: list[Report]) -> None:
+    """Invalidates all cached search results (of all processes).
+
+    Called whenever reports are created, updated or deleted. Instead of deleting
+    the entries one by one, the generation that is part of each cache key is increased,
+    so the old entries are never hit again and get evicted over time. The generation is
+    only increased once the changes are committed, otherwise another process could cache
+    results without the changes under the new generation. Other processes see the new
+    generation after at most GENERATION_TTL.
+    """
+    transaction.on_commit(_bump_generation)
+
+    logger.debug("Search cache invalidated.")
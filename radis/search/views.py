@@ -1,16 +1,26 @@
 from typing import Any
 
 from adit_radis_shared.common.types import AuthenticatedHttpRequest
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.paginator import Paginator
 from django.http import Http404, HttpRequest
 from django.shortcuts import render
 from django.views import View
 
+from radis.reports.models import Report
+from radis.reports.utils.panel_utils import prefetch_report_panels
 from radis.search.forms import SearchForm
 from radis.search.utils.query_parser import QueryParser
 
-from .site import Search, SearchFilters, search_providers
+from .site import (
+    CountStrategy,
+    InvalidCursorError,
+    ReportDocument,
+    Search,
+    SearchFilters,
+    search_providers,
+)
 
 
 class SearchView(LoginRequiredMixin, UserPassesTestMixin, View):
@@ -44,7 +54,13 @@ class SearchView(LoginRequiredMixin, UserPassesTestMixin, View):
         page_number = self.get_page_number(request)
         page_size: int = self.get_page_size(request)
 
-        if page_size * page_number > search_provider.max_results:
+        # With a cursor (keyset pagination) we can go beyond the max results of the provider
+        cursor: str | None = None
+        if search_provider.supports_cursor:
+            cursor = request.GET.get("cursor") or None
+        context["cursor"] = cursor
+
+        if cursor is None and page_size * page_number > search_provider.max_results:
             # https://github.com/django/django/blob/6f7c0a4d66f36c59ae9eafa168b455e462d81901/django/views/generic/list.py#L76
             raise Http404(f"Invalid page {page_number}.")
 
@@ -77,8 +93,18 @@ class SearchView(LoginRequiredMixin, UserPassesTestMixin, View):
                 ),
                 offset=offset,
                 limit=page_size,
+                cursor=cursor,
+                count_strategy=CountStrategy(
+                    relation=settings.SEARCH_COUNT_RELATION,
+                    threshold=settings.SEARCH_COUNT_THRESHOLD,
+                ),
             )
-            result = search_provider.search(search)
+
+            try:
+                result = search_provider.search(search)
+            except InvalidCursorError:
+                raise Http404("Invalid cursor.")
+
             total_count = result.total_count
 
             if total_count is not None:
@@ -92,11 +118,39 @@ class SearchView(LoginRequiredMixin, UserPassesTestMixin, View):
                 context["paginator"] = paginator
                 context["page_obj"] = paginator.get_page(page_number)
 
+                # Offer a cursor link when paging beyond the numbered pages (the provider
+                # only returns a next cursor if there are more results, the total count
+                # may be capped by the count strategy)
+                if result.next_cursor and (cursor or page_size * page_number >= max_size):
+                    params = request.GET.copy()
+                    params["cursor"] = result.next_cursor
+                    params["page"] = str(page_number + 1)
+                    context["next_page_url"] = f"?{params.urlencode()}"
+
             context["form"] = form
             context["documents"] = result.documents
+            context["results"] = self.get_results_with_reports(result.documents)
 
         return render(request, "search/search.html", context)
 
+    def get_results_with_reports(
+        self, documents: list[ReportDocument]
+    ) -> list[tuple[ReportDocument, Report]]:
+        # Resolve the reports of the whole page (and the data of their panels) at once
+        # instead of querying it for each document while rendering.
+        reports = {
+            report.document_id: report
+            for report in Report.objects.filter(
+                document_id__in=[document.document_id for document in documents]
+            ).defer("body")
+        }
+        prefetch_report_panels(list(reports.values()), self.request.user)
+        return [
+            (document, reports[document.document_id])
+            for document in documents
+            if document.document_id in reports
+        ]
+
     def get_page_number(self, request: HttpRequest) -> int:
         page = request.GET.get("page") or 1
         try:
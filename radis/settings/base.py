@@ -290,10 +290,57 @@ DBBACKUP_CLEANUP_KEEP = 30
 # Used by django-filter
 FILTERS_EMPTY_CHOICE_LABEL = "Show All"
 
+# Reports
+# The number of reports that are staged and inserted within one transaction when bulk
+# importing reports (see reports/utils/bulk_import.py).
+REPORTS_BULK_IMPORT_BATCH_SIZE = 1000
+
+# The search cache is a local memory cache by default, which means each process caches its
+# own results. Invalidations (when reports are created, updated or deleted) still reach all
+# processes, as the generation that is part of the cache keys is stored in the database (see
+# search/utils/search_cache.py).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "search": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "search",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+}
+
+# Search
+# The cache (see CACHES) in front of the search, count and retrieve functions of the providers.
+SEARCH_CACHE_ALIAS = "search"
+# Retrieved document IDs are only cached when there are not more than this many of them.
+SEARCH_CACHE_MAX_RETRIEVE_SIZE = 10_000
+
+# How the total count of results is determined on the search page (see CountStrategy
+# in search/site.py). Counting all matches of broad queries can be slow, so by default
+# only up to the threshold is counted.
+SEARCH_COUNT_RELATION = "at_least"
+SEARCH_COUNT_THRESHOLD = 10_000
+
 # llama.cpp
 llamacpp_dev_port = env.int("LLAMACPP_DEV_PORT", default=8080)
 llamacpp_url = f"http://localhost:{llamacpp_dev_port}"
 LLAMACPP_URL = env.str("LLAMACPP_URL", default=llamacpp_url)
+# Multiple llama.cpp instances (serving the same model) can be used. Each request to the LLM
+# is routed to the instance with the fewest outstanding requests (see chats/utils/llm_router.py).
+LLAMACPP_URLS = env.list("LLAMACPP_URLS", default=[LLAMACPP_URL])
+# How long (in seconds) an instance is not used anymore after it was unreachable or after that
+# many requests to it failed in a row (an instance that is only busy is never ejected).
+LLAMACPP_EJECTION_TIME = 30
+LLAMACPP_EJECTION_FAILURES = 3
+# The prompts about a report start with the (static) instructions followed by the report and
+# end with the question(s), so llama.cpp can reuse the processed prefix of an earlier prompt
+# from its prompt cache. If the number of parallel slots of each instance (LLAMA_ARG_N_PARALLEL)
+# is set then all prompts about the same report are also sent to the same slot (and so are
+# likely to find its prefix in the cache). 0 lets llama.cpp choose the slot itself.
+LLAMACPP_CACHE_PROMPT = True
+LLAMACPP_SLOTS_PER_INSTANCE = env.int("LLAMACPP_SLOTS_PER_INSTANCE", default=0)
 
 # Chat
 CHAT_GENERATE_TITLE_SYSTEM_PROMPT = """
@@ -343,30 +390,119 @@ Question: $question
 Answer:
 """
 
+CHAT_REPORT_YES_NO_QUESTIONS_SYSTEM_PROMPT = """
+You are an AI medical assistant with extensive knowledge in radiology and general medicine.
+You have been trained on a wide range of medical literature, including the latest research
+and guidelines in radiological practices. You will be asked several numbered questions about a
+radiological report that you have to answer. The report and each question can be given in any
+language. Answer each question in English faithfully with "Yes" or "No" as a JSON object that
+maps the number of each question to its answer.
+
+Report: $report
+"""
+
+CHAT_REPORT_QUESTIONS_USER_PROMPT = """
+Questions:
+$questions
+Answers:
+"""
+
 CHAT_YES_NO_ANSWER_GRAMMAR = """
 root ::= Answer
 Answer ::= "Yes" | "No"
 """
 
+# The number of parallel requests the LLM can handle. This limit is enforced cluster wide
+# (across all workers) by the LLM governor (see chats/utils/llm_governor.py). Either the number
+# of HTTP Threads and number of parallel computing slots of the llama.cpp instances (summed up
+# over all LLAMACPP_URLS) should be set to match this number or the continuous batching
+# capability of the LLM or a combination of both should be used. The LLM workers must also
+# process enough tasks concurrently to use all slots (see LLM_WORKER_CONCURRENCY in the
+# docker compose files, which should be at least this number divided by the number of LLM
+# workers).
+LLM_CONCURRENCY_LIMIT = 6
+# How the LLM slots are shared between RAG and subscription jobs (by weight). Each share is
+# guaranteed its part of the slots (at least one), so that the jobs of one kind can't starve
+# the other ones, but may borrow the idle slots of the other shares. Interactive chats are not
+# limited.
+LLM_CONCURRENCY_SHARES = {"rag": 2, "subscriptions": 1}
+# Each worker process adapts how many LLM requests it has in flight (up to the above limit)
+# by the observed latency and errors (see chats/utils/adaptive_limiter.py). The window starts
+# at the initial size, grows as long as the latency stays within the tolerance (as a factor
+# of the baseline latency) and is multiplied by the backoff on timeouts or overload errors.
+LLM_ADAPTIVE_CONCURRENCY_INITIAL = 2
+LLM_ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE = 1.5
+LLM_ADAPTIVE_CONCURRENCY_BACKOFF = 0.5
+
+# The answers of the LLM to RAG and subscription jobs are cached in the database (unless
+# disabled for a job), so that the same report and question (e.g. of a retried task or a new
+# job reusing a question) is only sent once to the LLM. The model (as reported by llama.cpp)
+# is part of the cache key, answers are not cached at all if the model is unknown. Bump the
+# version to invalidate all cached answers (e.g. after changing a prompt in a way that
+# should not reuse the old answers).
+LLM_ANSWER_CACHE_VERSION = 1
+# Cached answers that were not used for this long (in seconds) are evicted, and the least
+# recently used ones if there are more than the maximum entries.
+LLM_ANSWER_CACHE_MAX_AGE = 90 * 24 * 60 * 60
+LLM_ANSWER_CACHE_MAX_ENTRIES = 1_000_000
+LLM_ANSWER_CACHE_EVICTION_CRON = "30 2 * * *"
+
+# Analysis jobs (RAG and subscription jobs) are prepared (their tasks created) in a task of
+# their own that is checkpointed after each chunk of created tasks. A running preparation
+# sends a heartbeat at the interval (in seconds). A preparation without a heartbeat for
+# longer than the timeout (in seconds) is considered stalled (e.g. the worker was
+# restarted) and retried, which resumes the preparation from its last checkpoint.
+PREPARATION_HEARTBEAT_INTERVAL = 30
+STALLED_PREPARATIONS_CRON = "*/5 * * * *"
+STALLED_PREPARATIONS_TIMEOUT = 5 * 60
+
 # RAG
+# The tasks of jobs with the same priority are interleaved so that each user gets a fair share
+# of the LLM queue (see core/utils/scheduling_utils.py), a higher priority (urgent jobs) is
+# still always processed first.
 RAG_DEFAULT_PRIORITY = 2
 RAG_URGENT_PRIORITY = 3
 
 # The number of RAG report instances that are processed within one task. There are multiple
 # questions associated with each report instance via the RagJob.
 RAG_TASK_BATCH_SIZE = 64
-# The number of parallel requests the LLM can handle. This limit is enforced within each task. When
-# having multiple workers, the total number of parallel requests is
-# RAG_LLM_CONCURRENCY_LIMIT * number of workers. Either the number of HTTP Threads and number of
-# parallel computing slots of the llama.cpp should be set to match this number or the continuous
-# batching capability of the LLM or a combination of both should be used.
-RAG_LLM_CONCURRENCY_LIMIT = 6
+# The number of RAG tasks that are created (and deferred) at once while preparing a RAG job.
+# The retrieved document IDs of all those tasks are resolved with a single query.
+RAG_TASK_CREATION_CHUNK_SIZE = 50
+
+# If all questions of a RAG or subscription job are asked about a report with a single request
+# to the LLM (so that the report has only to be processed once by the LLM) or with a separate
+# request per question.
+RAG_ASK_QUESTIONS_AT_ONCE = True
+# A report is only accepted if all questions accept it. So the questions can be asked in waves
+# of this size (ordered by their observed rejection rate, the most selective first) and the
+# remaining questions are not evaluated anymore once a question rejected the report. This
+# saves LLM requests if some questions are very selective, but splits the single request per
+# report (see RAG_ASK_QUESTIONS_AT_ONCE) into one per wave. None asks all questions in a single
+# wave.
+RAG_QUESTION_WAVE_SIZE = None
+# The maximum number of tokens of the reports (a report and its other reports) that are passed
+# to the LLM at once. Each slot of llama.cpp has a context of LLAMA_ARG_CTX_SIZE divided by
+# LLAMA_ARG_N_PARALLEL tokens (4096 in our setup) that must also fit the instructions, the
+# questions and the answer. If the reports exceed the budget they are split into chunks that
+# are asked about separately (and the answers combined).
+RAG_CONTEXT_TOKEN_BUDGET = 3072
+# The results of a RAG task are buffered and written in bulk at most every this many seconds
+# (and at the end of the task), see ResultBuffer in rag/utils/result_utils.py.
+RAG_RESULT_FLUSH_INTERVAL = 5
 
 START_RAG_JOB_UNVERIFIED = False
 
+# How the number of reports a RAG job will process is determined in the RAG job wizard
+# (see CountStrategy in search/site.py).
+RAG_RETRIEVAL_COUNT_RELATION = "approximately"
+RAG_RETRIEVAL_COUNT_THRESHOLD = 10_000
+
 
 # Subscription
 SUBSCRIPTION_DEFAULT_PRIORITY = 3
 SUBSCRIPTION_URGENT_PRIORITY = 4
-SUBSCRIPTION_CRON = "* * * * *"
 SUBSCRIPTION_REFRESH_TASK_BATCH_SIZE = 64
+# The number of subscription tasks that are created (and deferred) at once while preparing a
+# subscription job.
+SUBSCRIPTION_TASK_CREATION_CHUNK_SIZE = 50
@@ -10,3 +10,6 @@ if not DATABASES["default"]["NAME"].startswith("test_"):  # noqa: F405
     DATABASES["default"]["TEST"] = {"NAME": test_database}  # noqa: F405
 
 DEBUG_TOOLBAR_CONFIG = {"SHOW_TOOLBAR_CALLBACK": lambda request: False}
+
+# Reports created by factories don't invalidate the search cache
+CACHES["search"] = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}  # noqa: F405
@@ -15,6 +15,10 @@ class SubscriptionsConfig(AppConfig):
 def register_app():
     from adit_radis_shared.common.site import MainMenuItem, register_main_menu_item
 
+    from radis.reports.site import ReportsCreatedHandler, register_reports_created_handler
+
+    from .utils.matching_utils import enqueue_subscription_matching
+
     register_main_menu_item(
         MainMenuItem(
             url_name="subscription_list",
@@ -22,6 +26,10 @@ def register_app():
         )
     )
 
+    register_reports_created_handler(
+        ReportsCreatedHandler(name="Subscription matching", handle=enqueue_subscription_matching)
+    )
+
 
 def init_db(**kwargs):
     from .models import SubscriptionsAppSettings
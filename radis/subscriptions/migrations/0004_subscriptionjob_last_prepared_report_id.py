@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0003_alter_subscriptionsappsettings_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscriptionjob",
+            name="last_prepared_report_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
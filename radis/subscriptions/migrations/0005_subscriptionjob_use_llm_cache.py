@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0004_subscriptionjob_last_prepared_report_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscriptionjob",
+            name="use_llm_cache",
+            field=models.BooleanField(default=True),
+        ),
+    ]
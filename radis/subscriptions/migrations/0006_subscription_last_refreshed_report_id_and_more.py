@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+import radis.reports.utils.ingestion_utils
+
+# The existing subscriptions were refreshed up to the reports created until their last
+# refresh.
+INIT_WATERMARK_SQL = """
+UPDATE subscriptions_subscription s
+SET last_refreshed_report_id = COALESCE(
+    (SELECT MAX(r.id) FROM reports_report r WHERE r.created_at <= s.last_refreshed), 0
+)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0013_report_ingestion_lock"),
+        ("subscriptions", "0005_subscriptionjob_use_llm_cache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="last_refreshed_report_id",
+            field=models.BigIntegerField(
+                default=radis.reports.utils.ingestion_utils.get_last_report_id
+            ),
+        ),
+        migrations.RunSQL(INIT_WATERMARK_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddField(
+            model_name="subscriptionjob",
+            name="report_id_after",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="subscriptionjob",
+            name="report_id_till",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0006_subscription_last_refreshed_report_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscriptiontask",
+            index=models.Index(fields=["job", "status"], name="subscriptio_job_id_15d3d2_idx"),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0013_report_ingestion_lock"),
+        ("subscriptions", "0007_subscriptiontask_job_status_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscriptionjob",
+            name="matched_reports",
+            field=models.ManyToManyField(blank=True, related_name="+", to="reports.report"),
+        ),
+    ]
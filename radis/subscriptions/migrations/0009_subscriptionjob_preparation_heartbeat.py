@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0008_subscriptionjob_matched_reports"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscriptionjob",
+            name="preparation_heartbeat",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
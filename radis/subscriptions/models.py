@@ -10,8 +10,11 @@ from procrastinate.contrib.django import app
 from procrastinate.contrib.django.models import ProcrastinateJob
 
 from radis.core.models import AnalysisJob, AnalysisTask
+from radis.core.utils.procrastinate_utils import defer_many
+from radis.core.utils.scheduling_utils import get_fair_share_priorities
 from radis.core.validators import validate_patient_sex
 from radis.reports.models import Language, Modality, Report
+from radis.reports.utils.ingestion_utils import get_last_report_id
 
 
 class SubscriptionsAppSettings(AppSettings):
@@ -27,6 +30,7 @@ class Subscription(models.Model):
     )
 
     provider = models.CharField(max_length=100, blank=True)
+    group_id: int
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="+")
     patient_id = models.CharField(max_length=100, blank=True)
     query = models.CharField(max_length=200, blank=True)
@@ -46,6 +50,9 @@ class Subscription(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     last_refreshed = models.DateTimeField(auto_now_add=True)
+    # The watermark of the refreshes, i.e. the reports up to this ID were already
+    # refreshed (or created before the subscription).
+    last_refreshed_report_id = models.BigIntegerField(default=get_last_report_id)
 
     items: models.QuerySet["SubscribedItem"]
     questions: models.QuerySet["SubscriptionQuestion"]
@@ -104,7 +111,17 @@ class SubscriptionJob(AnalysisJob):
     queued_job = models.OneToOneField(
         ProcrastinateJob, null=True, on_delete=models.SET_NULL, related_name="+"
     )
+    subscription_id: int
     subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name="jobs")
+    # The range of reports (by ID) the job refreshes, claimed from the watermark of the
+    # subscription when the preparation starts (so that a resumed preparation refreshes
+    # the same reports and the jobs of a subscription never overlap).
+    report_id_after = models.BigIntegerField(null=True, blank=True)
+    report_id_till = models.BigIntegerField(null=True, blank=True)
+    # The new reports that matched the subscription (see match_new_reports), so that the
+    # job does not have to search them again. A job without matched reports searches the
+    # claimed range of reports instead.
+    matched_reports = models.ManyToManyField(Report, blank=True, related_name="+")
 
     tasks: models.QuerySet["SubscriptionTask"]
 
@@ -135,10 +152,23 @@ class SubscriptionTask(AnalysisTask):
         return f"SubscriptionTask of {self.job.subscription} [{self.pk}]"
 
     def delay(self) -> None:
-        queued_job_id = app.configure_task(
-            "radis.subscriptions.tasks.process_subscription_task",
-            allow_unknown=False,
-            priority=self.job.urgent_priority if self.job.urgent else self.job.default_priority,
-        ).defer(task_id=self.pk)
+        task_name = "radis.subscriptions.tasks.process_subscription_task"
+        (priority,) = get_fair_share_priorities(task_name, self.job, 1)
+        queued_job_id = app.configure_task(task_name, allow_unknown=False, priority=priority).defer(
+            task_id=self.pk
+        )
         self.queued_job_id = queued_job_id
         self.save()
+
+    @classmethod
+    def delay_many(cls, job: SubscriptionJob, tasks: list["SubscriptionTask"]) -> None:
+        """Defers many tasks of the same job with a constant number of queries."""
+        task_name = "radis.subscriptions.tasks.process_subscription_task"
+        queued_job_ids = defer_many(
+            task_name,
+            priorities=get_fair_share_priorities(task_name, job, len(tasks)),
+            task_kwargs=[{"task_id": task.pk} for task in tasks],
+        )
+        for task, queued_job_id in zip(tasks, queued_job_ids):
+            task.queued_job_id = queued_job_id
+        SubscriptionTask.objects.bulk_update(tasks, ["queued_job_id"])
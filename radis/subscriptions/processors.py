@@ -1,17 +1,17 @@
 import asyncio
 import logging
-from asyncio import Semaphore
-from typing import List
 
 from adit_radis_shared.accounts.models import Group
 from adit_radis_shared.common.types import User
 from channels.db import database_sync_to_async
-from django import db
 from django.conf import settings
-from django.db.models import QuerySet
 
+from radis.chats.utils.adaptive_limiter import log_limiter_state
 from radis.chats.utils.chat_client import AsyncChatClient
+from radis.chats.utils.llm_governor import get_llm_governor
+from radis.chats.utils.llm_router import log_backend_stats
 from radis.core.processors import AnalysisTaskProcessor
+from radis.rag.utils.evaluation_utils import RejectionRates, evaluate_questions
 from radis.reports.models import Report
 
 from .models import Answer, RagResult, SubscribedItem, SubscriptionQuestion, SubscriptionTask
@@ -20,51 +20,59 @@ logger = logging.getLogger(__name__)
 
 
 class SubscriptionTaskProcessor(AnalysisTaskProcessor):
-    def process_task(self, task: SubscriptionTask) -> None:
+    async def process_task(self, task: SubscriptionTask) -> None:
+        task = await SubscriptionTask.objects.select_related(
+            "job__owner", "job__subscription"
+        ).aget(pk=task.pk)
         user: User = task.job.owner
-        active_group = user.active_group
+        active_group: Group | None = await database_sync_to_async(lambda: user.active_group)()
 
-        asyncio.run(self.process_task_async(task, active_group))
-
-    async def process_task_async(self, task: SubscriptionTask, active_group: Group | None) -> None:
-        client = AsyncChatClient()
-        sem = Semaphore(settings.RAG_LLM_CONCURRENCY_LIMIT)
-
-        questions = task.job.subscription.questions.all()
+        questions = [question async for question in task.job.subscription.questions.order_by("pk")]
+        # Subscriptions don't store the results of single questions, so the rejection rates
+        # are only observed within the task.
+        rates = RejectionRates()
 
+        client = AsyncChatClient(
+            get_llm_governor("subscriptions"),
+            use_answer_cache=task.job.use_llm_cache,
+            pooled=True,
+        )
         await asyncio.gather(
             *[
-                self.process_report(task, report, questions, sem, client)
+                self.process_report(task, report, questions, client, rates)
                 async for report in task.reports.filter(groups=active_group)
             ]
         )
-        await database_sync_to_async(db.close_old_connections)()
+        log_backend_stats()
+        log_limiter_state()
 
     async def process_report(
         self,
         task: SubscriptionTask,
         report: Report,
-        questions: QuerySet[SubscriptionQuestion],
-        sem: Semaphore,
+        questions: list[SubscriptionQuestion],
         client: AsyncChatClient,
+        rates: RejectionRates,
     ) -> None:
-        num_questions = await questions.acount()
-        if num_questions > 0:
-            async with sem:
-                results: List[RagResult] = await asyncio.gather(
+        async def ask(questions: list[SubscriptionQuestion]) -> list[bool]:
+            if settings.RAG_ASK_QUESTIONS_AT_ONCE:
+                results = await self.process_yes_or_no_questions(report.body, questions, client)
+            else:
+                results = await asyncio.gather(
                     *[
                         self.process_yes_or_no_question(report.body, question, client)
-                        async for question in questions
+                        for question in questions
                     ]
                 )
+            return [result == RagResult.ACCEPTED for result in results]
 
-            overall_result = (
-                RagResult.ACCEPTED
-                if all([result == RagResult.ACCEPTED for result in results])
-                else RagResult.REJECTED
-            )
-        else:
-            overall_result = RagResult.ACCEPTED
+        accepted, _ = await evaluate_questions(
+            questions,
+            ask,
+            rates,
+            settings.RAG_QUESTION_WAVE_SIZE,
+        )
+        overall_result = RagResult.ACCEPTED if accepted else RagResult.REJECTED
 
         if overall_result == RagResult.ACCEPTED:
             await SubscribedItem.objects.acreate(
@@ -81,7 +89,23 @@ class SubscriptionTaskProcessor(AnalysisTaskProcessor):
         client: AsyncChatClient,
     ) -> RagResult:
         llm_answer = await client.ask_report_yes_no_question(report_body, question.question)
+        return self.get_rag_result(question, llm_answer)
+
+    async def process_yes_or_no_questions(
+        self,
+        report_body: str,
+        questions: list[SubscriptionQuestion],
+        client: AsyncChatClient,
+    ) -> list[RagResult]:
+        llm_answers = await client.ask_report_yes_no_questions(
+            report_body, [question.question for question in questions]
+        )
+        return [
+            self.get_rag_result(question, llm_answer)
+            for question, llm_answer in zip(questions, llm_answers)
+        ]
 
+    def get_rag_result(self, question: SubscriptionQuestion, llm_answer: str) -> RagResult:
         if llm_answer == "yes":
             answer = Answer.YES
         elif llm_answer == "no":
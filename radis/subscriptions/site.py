@@ -1,6 +1,7 @@
 from typing import Callable, Iterable, NamedTuple
 
 from radis.search.site import SearchFilters
+from radis.search.utils.query_parser import QueryNode
 
 
 class FilterProvider(NamedTuple):
@@ -10,7 +11,7 @@ class FilterProvider(NamedTuple):
     - name (str): The name of the filter provider.
     - count (Callable[[RagSearch], int]): A function that counts the number of results for a search.
     - filter (Callable[[RagSearch], Iterable[str]]): A function that returns the document IDs
-      for a filter.
+      for a filter (ordered by the internal report ID, see RetrievalProvider).
     - max_results (int | None): The maximum number of results that can be returned by this
       provider, or None if there is no limit.
     """
@@ -25,3 +26,27 @@ filter_providers: dict[str, FilterProvider] = {}
 
 def register_filter_provider(filter_provider: FilterProvider):
     filter_providers[filter_provider.name] = filter_provider
+
+
+class PercolateProvider(NamedTuple):
+    """A class representing a percolate provider (a reverse search).
+
+    Attributes:
+    - name (str): The name of the percolate provider (the same as of the retrieval provider
+      that searches the reports of a subscription with a query).
+    - percolate (Callable[[dict[int, QueryNode], list[int]], dict[int, set[int]]]): A function
+      that matches many queries (by their subscription ID) at once against the reports with
+      the given (internal) report IDs and returns the IDs of the matched reports per
+      subscription ID (subscriptions without a match can be left out). A query that can't
+      be evaluated must be skipped (and logged) without failing the other queries.
+    """
+
+    name: str
+    percolate: Callable[[dict[int, QueryNode], list[int]], dict[int, set[int]]]
+
+
+percolate_providers: dict[str, PercolateProvider] = {}
+
+
+def register_percolate_provider(percolate_provider: PercolateProvider):
+    percolate_providers[percolate_provider.name] = percolate_provider
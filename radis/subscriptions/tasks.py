@@ -1,34 +1,34 @@
 import logging
-from datetime import datetime
-from itertools import batched
+from typing import Iterable
 
 from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
-from pebble import asynchronous
 from procrastinate.contrib.django import app
 
+from radis.core.utils.preparation_utils import (
+    finish_preparation,
+    prepare_tasks,
+    retry_stalled_preparations,
+)
 from radis.rag.site import retrieval_providers
 from radis.reports.models import Report
+from radis.reports.utils.ingestion_utils import get_committed_report_id
 from radis.search.site import Search, SearchFilters
 from radis.search.utils.query_parser import QueryParser
 
 from .models import Subscription, SubscriptionJob, SubscriptionTask
 from .processors import SubscriptionTaskProcessor
-from .site import filter_providers
+from .site import filter_providers, percolate_providers
+from .utils.matching_utils import match_subscriptions
 
 logger = logging.getLogger(__name__)
 
 
 @app.task(queue="llm")
 async def process_subscription_task(task_id: int) -> None:
-    @asynchronous.thread
-    def _process_subscription_task(task_id: int) -> None:
-        task = SubscriptionTask.objects.get(id=task_id)
-        processor = SubscriptionTaskProcessor(task)
-        processor.start()
-
-    await _process_subscription_task(task_id) # type: ignore
+    task = await SubscriptionTask.objects.aget(id=task_id)
+    await SubscriptionTaskProcessor(task).start_async()
 
     task = await SubscriptionTask.objects.aget(id=task_id)
     task.queued_job_id = None
@@ -42,8 +42,58 @@ def process_subscription_job(job_id: int) -> None:
     logger.info("Start processing job %s", job)
     assert job.status == SubscriptionJob.Status.PREPARING
 
+    if job.report_id_till is None:
+        _claim_new_reports(job)
+    assert job.report_id_after is not None and job.report_id_till is not None
+
     logger.debug("Collecting tasks for job %s", job)
 
+    new_document_ids: Iterable[str]
+    if job.matched_reports.exists():
+        # The reports were already matched against the subscription (see match_new_reports)
+        new_document_ids = (
+            job.matched_reports.order_by("id").values_list("document_id", flat=True).iterator()
+        )
+    elif Report.objects.filter(id__gt=job.report_id_after, id__lte=job.report_id_till).exists():
+        new_document_ids = _search_new_reports(job)
+    else:
+        logger.debug("No new reports for job %s", job)
+        new_document_ids = []
+
+    if not prepare_tasks(
+        job,
+        new_document_ids,
+        batch_size=settings.SUBSCRIPTION_REFRESH_TASK_BATCH_SIZE,
+        chunk_size=settings.SUBSCRIPTION_TASK_CREATION_CHUNK_SIZE,
+        create_tasks=_create_subscription_tasks,
+    ):
+        return
+
+    logger.debug("Starting SubscriptionTasks done.")
+
+    SubscriptionJob.objects.filter(pk=job.pk).update(queued_job_id=None)
+    finish_preparation(job)
+
+
+def _claim_new_reports(job: SubscriptionJob) -> None:
+    # The reports after the watermark of the subscription up to the last committed report
+    # are refreshed by this job and the watermark is moved forward in the same transaction.
+    with transaction.atomic():
+        # Lock the job first, so that no more matched reports are added (see
+        # match_new_reports) once the job claimed its reports.
+        SubscriptionJob.objects.select_for_update().get(pk=job.pk)
+        subscription = Subscription.objects.select_for_update().get(pk=job.subscription_id)
+        job.report_id_after = subscription.last_refreshed_report_id
+        job.report_id_till = max(get_committed_report_id(), job.report_id_after)
+        job.save(update_fields=["report_id_after", "report_id_till"])
+
+        subscription.last_refreshed_report_id = job.report_id_till
+        subscription.last_refreshed = timezone.now()
+        subscription.save(update_fields=["last_refreshed_report_id", "last_refreshed"])
+
+
+def _search_new_reports(job: SubscriptionJob) -> Iterable[str]:
+    assert job.report_id_after is not None
     language_code = ""
     if job.subscription.language and job.subscription.query != "":
         language_code = job.subscription.language.code
@@ -56,7 +106,9 @@ def process_subscription_job(job_id: int) -> None:
         patient_sex=job.subscription.patient_sex,
         patient_age_from=job.subscription.age_from,
         patient_age_till=job.subscription.age_till,
-        created_after=job.subscription.last_refreshed,
+        # Resume an interrupted preparation from its checkpoint
+        report_id_after=max(job.report_id_after, job.last_prepared_report_id or 0),
+        report_id_till=job.report_id_till,
     )
 
     if job.subscription.query != "":
@@ -80,51 +132,81 @@ def process_subscription_job(job_id: int) -> None:
             filters=filters,
         )
 
-        new_document_ids = retrieval_provider.retrieve(search)
+        return retrieval_provider.retrieve(search)
 
-    else:
-        logger.debug("Searching new reports with filters for job %s", job)
-
-        provider = job.subscription.provider
-        filter_provider = filter_providers[provider]
-        new_document_ids = filter_provider.filter(filters)
+    logger.debug("Searching new reports with filters for job %s", job)
 
-    for document_ids in batched(new_document_ids, settings.SUBSCRIPTION_REFRESH_TASK_BATCH_SIZE):
-        logger.debug("Creating SubscriptionTask for document IDs: %s", document_ids)
-        task = SubscriptionTask.objects.create(job=job, status=SubscriptionTask.Status.PENDING)
-        for document_id in document_ids:
-            task.reports.add(Report.objects.get(document_id=document_id))
+    provider = job.subscription.provider
+    filter_provider = filter_providers[provider]
+    return filter_provider.filter(filters)
 
-        task.delay()
 
-    logger.debug("Starting SubscriptionTasks done.")
-
-    job.subscription.last_refreshed = timezone.now()
-    job.subscription.save()
+def _create_subscription_tasks(job: SubscriptionJob, batches: list[tuple[int, ...]]) -> None:
+    tasks = SubscriptionTask.objects.bulk_create(
+        [SubscriptionTask(job=job, status=SubscriptionTask.Status.PENDING) for _ in batches]
+    )
+    SubscriptionTask.reports.through.objects.bulk_create(
+        [
+            SubscriptionTask.reports.through(subscriptiontask_id=task.pk, report_id=report_id)
+            for task, batch in zip(tasks, batches)
+            for report_id in batch
+        ]
+    )
+    SubscriptionTask.delay_many(job, tasks)
 
-    job.status = SubscriptionJob.Status.PENDING
-    job.queued_job_id = None
-    job.save()
 
+@app.periodic(cron=settings.STALLED_PREPARATIONS_CRON)
+@app.task
+async def retry_stalled_subscription_job_preparations(timestamp: int) -> None:
+    await retry_stalled_preparations(
+        SubscriptionJob,
+        "radis.subscriptions.tasks.process_subscription_job",
+        settings.STALLED_PREPARATIONS_TIMEOUT,
+    )
 
-@app.periodic(cron=settings.SUBSCRIPTION_CRON)
-@app.task()
-def subscription_launcher(timestamp: int):
-    logger.info("Launching SubscriptionJobs (Timestamp %s)", datetime.fromtimestamp(timestamp))
-    subscriptions = Subscription.objects.all()
 
-    for subscription in subscriptions:
-        logger.debug(
-            "Creating SubscriptionJob for Subscription %s of user %s",
-            subscription.name,
-            subscription.owner,
-        )
-        job = SubscriptionJob.objects.create(
-            subscription=subscription,
-            status=SubscriptionJob.Status.PREPARING,
-            owner=subscription.owner,
-            owner_id=subscription.owner_id,
-            send_finished_mail=subscription.send_finished_mail,
-        )
-        job.save()
-        transaction.on_commit(job.delay)
+@app.task
+def match_new_reports(report_ids: list[int]) -> None:
+    matches = match_subscriptions(report_ids)
+    logger.debug("%d new reports matched %d subscriptions.", len(report_ids), len(matches))
+    if not matches:
+        return
+
+    for subscription in Subscription.objects.filter(pk__in=matches.keys()).select_related("owner"):
+        # Without a query or with a percolate provider the matched reports are final,
+        # otherwise the job has to search its claimed range of reports.
+        matched = subscription.query == "" or subscription.provider in percolate_providers
+
+        with transaction.atomic():
+            # A job that did not claim its reports yet gets the new reports, too
+            waiting_job = (
+                SubscriptionJob.objects.select_for_update()
+                .filter(
+                    subscription=subscription,
+                    status=SubscriptionJob.Status.PREPARING,
+                    report_id_till__isnull=True,
+                )
+                .first()
+            )
+            if waiting_job:
+                if not matched:
+                    waiting_job.matched_reports.clear()
+                elif waiting_job.matched_reports.exists():
+                    waiting_job.matched_reports.add(*matches[subscription.pk])
+                # A waiting job without matched reports will search the new reports anyway
+                continue
+
+            logger.debug(
+                "Creating SubscriptionJob for Subscription %s of user %s",
+                subscription.name,
+                subscription.owner,
+            )
+            job = SubscriptionJob.objects.create(
+                subscription=subscription,
+                status=SubscriptionJob.Status.PREPARING,
+                owner=subscription.owner,
+                send_finished_mail=subscription.send_finished_mail,
+            )
+            if matched:
+                job.matched_reports.add(*matches[subscription.pk])
+            transaction.on_commit(job.delay)
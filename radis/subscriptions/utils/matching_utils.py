@@ -0,0 +1,141 @@
+import logging
+from typing import NamedTuple
+
+from django.conf import settings
+from procrastinate.contrib.django import app
+
+from radis.reports.models import Report
+from radis.search.utils.query_parser import QueryNode, QueryParser
+
+from ..models import Subscription
+from ..site import percolate_providers
+
+logger = logging.getLogger(__name__)
+
+
+class _CompiledSubscription(NamedTuple):
+    id: int
+    provider: str
+    query: QueryNode | None
+    group_id: int
+    language_code: str
+    modalities: set[str]
+    study_description: str
+    patient_sex: str
+    age_from: int | None
+    age_till: int | None
+
+    def accepts(self, report: Report) -> bool:
+        """Checks if the report passes the filters of the subscription (the same filters
+        the refresh applies, see process_subscription_job)."""
+        if self.group_id not in {group.pk for group in report.groups.all()}:
+            return False
+        if self.language_code and report.language.code != self.language_code:
+            return False
+        if self.modalities and not self.modalities & {
+            modality.code for modality in report.modalities.all()
+        }:
+            return False
+        if self.study_description and (
+            self.study_description not in report.study_description.lower()
+        ):
+            return False
+        if self.patient_sex and report.patient_sex != self.patient_sex:
+            return False
+        if self.age_from is not None and report.patient_age < self.age_from:
+            return False
+        if self.age_till is not None and report.patient_age > self.age_till:
+            return False
+        return True
+
+
+def _compile_subscriptions() -> list[_CompiledSubscription]:
+    compiled: list[_CompiledSubscription] = []
+    subscriptions = Subscription.objects.select_related("language").prefetch_related("modalities")
+    for subscription in subscriptions:
+        query: QueryNode | None = None
+        if subscription.query != "":
+            # The parsed queries are cached (see QueryParser.parse)
+            query, _ = QueryParser().parse(subscription.query)
+            if query is None:
+                logger.warning("Skipping %s with an invalid query.", subscription)
+                continue
+
+        language_code = ""
+        if subscription.language and subscription.query != "":
+            language_code = subscription.language.code
+
+        compiled.append(
+            _CompiledSubscription(
+                id=subscription.pk,
+                provider=subscription.provider,
+                query=query,
+                group_id=subscription.group_id,
+                language_code=language_code,
+                modalities={modality.code for modality in subscription.modalities.all()},
+                study_description=subscription.study_description.lower(),
+                patient_sex=subscription.patient_sex,
+                age_from=subscription.age_from,
+                age_till=subscription.age_till,
+            )
+        )
+    return compiled
+
+
+def match_subscriptions(report_ids: list[int]) -> dict[int, set[int]]:
+    """Matches new reports against all subscriptions at once (a reverse search).
+
+    The filters of the subscriptions are evaluated in memory and the queries of all
+    subscriptions (of the same provider) are matched against the reports with a single
+    percolate call (see PercolateProvider).
+
+    Returns: The IDs of the matched reports per ID of each matched subscription.
+    """
+    reports = list(
+        Report.objects.filter(pk__in=report_ids)
+        .select_related("language")
+        .prefetch_related("groups", "modalities")
+        .defer("body")
+    )
+    if not reports:
+        return {}
+
+    matches: dict[int, set[int]] = {}
+    queries: dict[str, dict[int, QueryNode]] = {}
+    candidates: dict[int, set[int]] = {}
+    for subscription in _compile_subscriptions():
+        accepted = {report.pk for report in reports if subscription.accepts(report)}
+        if not accepted:
+            continue
+
+        if subscription.query is None:
+            matches[subscription.id] = accepted
+        elif subscription.provider not in percolate_providers:
+            # Without a percolate provider we can't tell, so the refresh has to search
+            matches[subscription.id] = accepted
+        else:
+            queries.setdefault(subscription.provider, {})[subscription.id] = subscription.query
+            candidates[subscription.id] = accepted
+
+    for provider, provider_queries in queries.items():
+        candidate_ids = set().union(*(candidates[id] for id in provider_queries))
+        percolated = percolate_providers[provider].percolate(provider_queries, list(candidate_ids))
+        for subscription_id, matched_ids in percolated.items():
+            matched_ids &= candidates[subscription_id]
+            if matched_ids:
+                matches[subscription_id] = matched_ids
+
+    return matches
+
+
+def enqueue_subscription_matching(reports: list[Report]) -> None:
+    """Handles newly created reports by matching them against the subscriptions in a
+    background task (see match_new_reports)."""
+    if not reports or not Subscription.objects.exists():
+        return
+
+    app.configure_task(
+        "radis.subscriptions.tasks.match_new_reports",
+        allow_unknown=False,
+        priority=settings.SUBSCRIPTION_DEFAULT_PRIORITY,
+    ).defer(report_ids=[report.pk for report in reports])